@@ -6,7 +6,26 @@ pytexit
 from __future__ import absolute_import
 
 from .core import *
-from .pytexit import for2py, for2tex, py2tex, multi2tex
+from .pytexit import (
+    ast2tex,
+    column2tex,
+    for2py,
+    for2tex,
+    forfile2tex,
+    module2tex,
+    multi2tex,
+    py2docx,
+    py2tex,
+)
+from .template import compile_template
+
+
+def load_ipython_extension(ipython):
+    """``%load_ext pytexit`` registers the ``%%py2tex`` cell magic. See
+    :mod:`~pytexit.magic`"""
+    from .magic import load_ipython_extension
+
+    load_ipython_extension(ipython)
 
 
 def __get_version__():
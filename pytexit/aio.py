@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio API: convert formulas without blocking the event loop
+
+Conversions run in an executor (the default thread pool of the loop, or any
+:class:`concurrent.futures.Executor`), with a bounded number of conversions
+at once.
+
+Examples
+--------
+
+::
+
+    from pytexit.aio import apy2tex, apy2tex_many
+
+    async def preview(expr):
+        return await apy2tex(expr, timeout=1)
+
+    async def report(exprs):
+        return await apy2tex_many(exprs, concurrency=4)
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import asyncio
+import functools
+
+from .core.cost import estimate_cost, largest_first
+from .pytexit import py2tex
+
+
+async def apy2tex(expr, executor=None, semaphore=None, timeout=None, **kwargs):
+    """Convert a formula in an executor. See :func:`~pytexit.pytexit.py2tex`
+
+    Parameters
+    ----------
+
+    expr: str
+        Python formula
+
+    executor: :class:`concurrent.futures.Executor`, or ``None``
+        where the conversion runs. If ``None``, the default executor of the
+        loop (a thread pool). With a
+        :class:`~concurrent.futures.ProcessPoolExecutor`, a pathological
+        formula can't slow down the process of the loop, but options must be
+        picklable (ex: no ``memo``).
+
+    semaphore: :class:`asyncio.Semaphore`, or ``None``
+        if given, limits the number of conversions running at once. Share it
+        between the calls to bound the load.
+
+    timeout: float, or ``None``
+        if given, raise :class:`asyncio.TimeoutError` after ``timeout``
+        seconds.
+
+    Other Parameters
+    ----------------
+
+    kwargs: dict
+        forwarded to :func:`~pytexit.pytexit.py2tex`. Formulas are not printed
+        unless ``print_formula=True``. Caches (``cache``, ``memo``) are shared
+        with synchronous conversions.
+
+    Notes
+    -----
+
+    Cancelling the task (or a timeout) returns at once. A conversion already
+    started runs to completion in the background, and its result is dropped.
+    It keeps its semaphore until then: the semaphore bounds the conversions
+    that are running, not the tasks waiting for them.
+
+    """
+    kwargs.setdefault("print_latex", False)
+    kwargs.setdefault("print_formula", False)
+    loop = asyncio.get_running_loop()
+    call = functools.partial(py2tex, expr, **kwargs)
+
+    if semaphore is None:
+        return await asyncio.wait_for(loop.run_in_executor(executor, call), timeout)
+    await semaphore.acquire()
+    try:
+        future = loop.run_in_executor(executor, call)
+    except BaseException:
+        semaphore.release()
+        raise
+    future.add_done_callback(functools.partial(_release, semaphore))
+    # shield: a timeout or a cancellation doesn't cancel the future, that is
+    # done (and releases the semaphore) when the conversion ends
+    return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+
+def _release(semaphore, future):
+    """Release the semaphore of a finished conversion. Its exception is
+    retrieved, if nobody waits for it anymore"""
+    semaphore.release()
+    if not future.cancelled():
+        future.exception()
+
+
+async def apy2tex_many(
+    exprs, executor=None, concurrency=8, timeout=None, return_exceptions=False, **kwargs
+):
+    """Convert many formulas, ``concurrency`` at a time
+
+    Parameters
+    ----------
+
+    exprs: list of str
+        Python formulas (or any input of :func:`~pytexit.pytexit.py2tex`)
+
+    executor: :class:`concurrent.futures.Executor`, or ``None``
+        see :func:`~pytexit.aio.apy2tex`
+
+    concurrency: int
+        maximum number of conversions at once
+
+    timeout: float, or ``None``
+        timeout of each conversion, see :func:`~pytexit.aio.apy2tex`
+
+    return_exceptions: bool
+        if ``True``, formulas that can't be converted return their exception
+        instead of stopping all conversions
+
+    Other Parameters
+    ----------------
+
+    kwargs: dict
+        forwarded to :func:`~pytexit.pytexit.py2tex`
+
+    Returns
+    -------
+
+    list of converted formulas, in the order of ``exprs``. Conversions start
+    from the most expensive formula (see
+    :func:`~pytexit.core.cost.estimate_cost`). Cancelling cancels all the
+    conversions that did not start yet.
+
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    exprs = list(exprs)
+    # Start the most expensive conversions first (the semaphore is fair), so
+    # that a long formula doesn't run alone at the end. Functions and parsed
+    # formulas have no estimate
+    order = largest_first(
+        [estimate_cost(expr) if isinstance(expr, str) else 0 for expr in exprs]
+    )
+    results = await asyncio.gather(
+        *[
+            apy2tex(
+                exprs[i],
+                executor=executor,
+                semaphore=semaphore,
+                timeout=timeout,
+                **kwargs
+            )
+            for i in order
+        ],
+        return_exceptions=return_exceptions
+    )
+    out = [None] * len(exprs)
+    for i, result in zip(order, results):
+        out[i] = result
+    return out
@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental build of a LaTeX appendix from formula sources
+
+Sources are plain formula lists (``.txt``, one formula per line), Python
+modules (``.py``, see :func:`~pytexit.pytexit.module2tex`) and FORTRAN files
+(``.f``, ``.f90``..., see :func:`~pytexit.pytexit.forfile2tex`). Each source
+is converted to a LaTeX fragment, and the document is assembled from the
+fragments.
+
+The build directory keeps a manifest with the modification time, size and
+content hash of each source, and the options used. On the next build,
+sources with the same modification time and size are not read again, sources
+with the same content are not converted again, and only the changed
+statements of changed sources are converted.
+
+Examples
+--------
+
+::
+
+    from pytexit.build import build
+    build(["model.py", "rates/"], "appendix.tex")
+
+or in a Terminal::
+
+    py2tex --build model.py --build rates/ -o appendix.tex
+
+:func:`~pytexit.build.watch` builds again whenever the sources change
+(``py2tex --watch``).
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+import uuid
+
+from .core.fortran import fixed_form_extensions
+from .pytexit import forfile2tex, module2tex, py2tex, tex_outputs
+
+tex_special_characters = {
+    "\\": r"\textbackslash{}",
+    "<": r"\textless{}",
+    ">": r"\textgreater{}",
+    "~": r"\textasciitilde{}",
+    "^": r"\textasciicircum{}",
+}
+
+# Source types, by file extension
+formula_list_extensions = (".txt",)
+fortran_extensions = fixed_form_extensions + (".f90", ".f95", ".f03", ".f08")
+source_extensions = formula_list_extensions + (".py",) + fortran_extensions
+
+
+def escape_tex(text):
+    """Escape LaTeX special characters of a text"""
+    return re.sub(
+        r"[\\_%&#$<>{}~^]",
+        lambda m: tex_special_characters.get(m.group(0), "\\" + m.group(0)),
+        text,
+    )
+
+
+def appendix(formulas, title=None):
+    """Write formulas as a LaTeX fragment, grouped by function
+
+    Parameters
+    ----------
+
+    formulas: list of dict
+        as returned by :func:`~pytexit.pytexit.module2tex` or
+        :func:`~pytexit.pytexit.forfile2tex`, converted with
+        ``tex_enclosure=''``
+
+    title: str
+        section title (ex: the module name)
+
+    """
+    lines = []
+    if title is not None:
+        lines.append(r"\section*{%s}" % escape_tex(title))
+    name = None
+    for f in formulas:
+        if f["name"] != name:
+            name = f["name"]
+            if name:
+                lines.append(r"\paragraph{%s}" % escape_tex(name))
+        lines.append("% line {0}: {1}".format(f["lineno"], f["source"].splitlines()[0]))
+        if f["output"] is None:
+            lines.append("% could not be converted: {0}".format(f.get("error")))
+            continue
+        lines.append(r"\begin{equation}")
+        lines.append(f["output"])
+        lines.append(r"\end{equation}")
+    return "\n".join(lines) + "\n"
+
+
+def list2tex(path, known=None, **kwargs):
+    """Convert a plain list of formulas, one per line. Empty lines and
+    ``#`` comments are ignored
+
+    Parameters
+    ----------
+
+    path: str
+        text file
+
+    known: dict
+        see :func:`~pytexit.pytexit.module2tex`
+
+    Other Parameters
+    ----------------
+
+    kwargs: dict
+        forwarded to :func:`~pytexit.pytexit.py2tex`
+
+    Returns
+    -------
+
+    list of dict, see :func:`~pytexit.pytexit.forfile2tex`. Kind is
+    ``'formula'``.
+
+    """
+    formulas = []
+    with io.open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            formula = {
+                "name": "",
+                "lineno": lineno,
+                "kind": "formula",
+                "source": line,
+                "output": known.get(("", "formula", line)) if known else None,
+            }
+            if formula["output"] is None:
+                try:
+                    formula["output"] = py2tex(
+                        line, print_latex=False, print_formula=False, **kwargs
+                    )
+                except (SyntaxError, ValueError) as err:
+                    formula["error"] = str(err)
+            formulas.append(formula)
+    return formulas
+
+
+def convert_source(path, known=None, **kwargs):
+    """Convert all the formulas of a source file, according to its type
+
+    Returns
+    -------
+
+    list of dict, see :func:`~pytexit.pytexit.forfile2tex`
+
+    """
+    if path.lower().endswith(formula_list_extensions):
+        return list2tex(path, known=known, **kwargs)
+    elif path.lower().endswith(".py"):
+        try:
+            return module2tex(path, known=known, **kwargs)
+        except SyntaxError as err:
+            return [
+                {
+                    "name": "",
+                    "lineno": err.lineno or 0,
+                    "kind": "module",
+                    "source": path,
+                    "output": None,
+                    "error": str(err),
+                }
+            ]
+    elif path.lower().endswith(fortran_extensions):
+        return forfile2tex(path, known=known, **kwargs)
+    raise ValueError("Unexpected source: {0}".format(path))
+
+
+def find_sources(paths):
+    """Source files of ``paths`` (files, or directories searched
+    recursively), in a stable order"""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for name in sorted(files):
+                    if name.lower().endswith(source_extensions):
+                        sources.append(os.path.join(root, name))
+        else:
+            sources.append(path)
+    return sources
+
+
+def write_atomic(path, data):
+    """Write a file in one go: readers see the old or the new content, never
+    a partially written file. The file keeps its permissions (new files get
+    the default permissions, as with :func:`open`)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except OSError:  # new file: created by open(), with the umask
+        mode = None
+    while True:
+        tmp = os.path.join(directory, ".tmp-" + uuid.uuid4().hex)
+        try:
+            f = io.open(tmp, "x", encoding="utf-8")
+        except FileExistsError:
+            continue
+        break
+    try:
+        with f:
+            f.write(data)
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def formula_key(formula):
+    """Key of a converted formula in the ``known`` conversions of
+    :func:`~pytexit.pytexit.module2tex`"""
+    return (formula["name"], formula["kind"], formula["source"])
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def build(paths, output_file, build_dir=None, output="tex", verbose=False, **kwargs):
+    """Build a LaTeX appendix from formula sources, converting only what
+    changed since the last build
+
+    Parameters
+    ----------
+
+    paths: list of str
+        source files or directories. See :mod:`~pytexit.build` for the
+        supported sources.
+
+    output_file: str
+        LaTeX document, assembled from the fragments of all sources
+
+    build_dir: str
+        where fragments and the manifest are kept between builds. Default
+        ``output_file + '.d'``
+
+    output: ``'tex'`` or ``'compact'``
+        see :func:`~pytexit.pytexit.py2tex`
+
+    Other Parameters
+    ----------------
+
+    kwargs: dict
+        conversion options, see :func:`~pytexit.pytexit.py2tex`. Changing
+        them converts everything again.
+
+    Returns
+    -------
+
+    dict, with the list of ``converted``, ``reused`` and ``removed``
+    sources, and the number of ``formulas`` and of ``rendered`` formulas
+
+    """
+    from . import __version__
+
+    if output not in tex_outputs:
+        raise ValueError(
+            "Unexpected output: {0}. Use one of {1}".format(output, tex_outputs)
+        )
+    if build_dir is None:
+        build_dir = output_file + ".d"
+    if not os.path.exists(build_dir):
+        os.makedirs(build_dir)
+
+    options = dict(kwargs, output=output, version=__version__)
+    manifest_path = os.path.join(build_dir, "manifest.json")
+    try:
+        with io.open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (IOError, ValueError):
+        manifest = {}
+    same_options = manifest.get("options") == options
+    previous = manifest.get("sources", {}) if same_options else {}
+
+    report = {"converted": [], "reused": [], "removed": [], "formulas": 0}
+    report["rendered"] = 0
+    sources = {}
+    fragments = []
+    for path in find_sources(paths):
+        name = hashlib.sha1(path.encode("utf-8")).hexdigest()[:12]
+        fragment = os.path.join(build_dir, name + ".tex")
+        formulas_path = os.path.join(build_dir, name + ".json")
+        entry = previous.get(path)
+        st = os.stat(path)
+        stamp = [st.st_mtime, st.st_size]
+        if entry and entry.get("stamp") == stamp:
+            digest = entry["hash"]  # not read again
+        else:
+            digest = file_hash(path)
+
+        if entry and entry["hash"] == digest and os.path.exists(fragment):
+            report["reused"].append(path)
+            report["formulas"] += entry["formulas"]
+            entry = dict(entry, stamp=stamp)
+        else:
+            # Conversions of the previous version of the source
+            known = {}
+            if entry and os.path.exists(formulas_path):
+                with io.open(formulas_path, encoding="utf-8") as f:
+                    known = {
+                        formula_key(formula): formula["output"]
+                        for formula in json.load(f)
+                        if formula["output"] is not None
+                    }
+            formulas = convert_source(
+                path, known=known, output=output, tex_enclosure="", **kwargs
+            )
+            write_atomic(formulas_path, json.dumps(formulas))
+            write_atomic(fragment, appendix(formulas, title=path))
+            report["converted"].append(path)
+            report["formulas"] += len(formulas)
+            report["rendered"] += sum(
+                formula_key(formula) not in known for formula in formulas
+            )
+            entry = {"hash": digest, "stamp": stamp, "formulas": len(formulas)}
+            if verbose:
+                print("converted {0}".format(path))
+
+        sources[path] = entry
+        fragments.append(fragment)
+
+    # Sources that are gone
+    for path in manifest.get("sources", {}):
+        if path not in sources:
+            report["removed"].append(path)
+            name = hashlib.sha1(path.encode("utf-8")).hexdigest()[:12]
+            for ext in [".tex", ".json"]:
+                if os.path.exists(os.path.join(build_dir, name + ext)):
+                    os.remove(os.path.join(build_dir, name + ext))
+
+    # Assemble the document
+    document = []
+    for fragment in fragments:
+        with io.open(fragment, encoding="utf-8") as f:
+            document.append(f.read())
+    write_atomic(output_file, "\n".join(document))
+
+    write_atomic(
+        manifest_path,
+        json.dumps({"options": options, "sources": sources}, indent=1),
+    )
+    return report
+
+
+def snapshot(paths):
+    """Modification time and size of the source files of ``paths``"""
+    state = {}
+    for path in find_sources(paths):
+        try:
+            st = os.stat(path)
+        except OSError:  # removed meanwhile
+            continue
+        state[path] = (st.st_mtime, st.st_size)
+    return state
+
+
+def watch(
+    paths, output_file, interval=0.5, debounce=0.3, callback=None, stop=None, **kwargs
+):
+    """Build the appendix, then build it again whenever the sources change
+
+    Sources are polled (no dependency on a file system notification
+    library). A burst of changes (ex: an editor saving several files) gives
+    a single build: the build starts once the sources have not changed for
+    ``debounce`` seconds. Each build only converts the changed statements,
+    see :func:`~pytexit.build.build`. A failed build (ex: a source that can't
+    be read) is reported on stderr, and the sources are still watched.
+
+    Parameters
+    ----------
+
+    paths: list of str
+        source files or directories
+
+    output_file: str
+        LaTeX document
+
+    interval: float
+        polling interval, in seconds
+
+    debounce: float
+        quiet period before building, in seconds
+
+    callback: function
+        called with the report of each build. Default: print a summary.
+
+    stop: function
+        returns ``True`` to stop watching (checked after each poll). Default:
+        watch until interrupted (Ctrl+C)
+
+    Other Parameters
+    ----------------
+
+    kwargs: dict
+        forwarded to :func:`~pytexit.build.build`
+
+    """
+    if callback is None:
+
+        def callback(report):
+            print(
+                "{0}: {1} formulas rendered in {2}".format(
+                    output_file,
+                    report["rendered"],
+                    ", ".join(report["converted"] + report["removed"]) or "-",
+                )
+            )
+
+    def run():
+        try:
+            report = build(paths, output_file, **kwargs)
+        except Exception as err:  # built again at the next change
+            print(
+                "{0}: build failed: {1}: {2}".format(
+                    output_file, type(err).__name__, err
+                ),
+                file=sys.stderr,
+            )
+        else:
+            callback(report)
+
+    state = snapshot(paths)
+    run()
+    while not (stop is not None and stop()):
+        time.sleep(interval)
+        current = snapshot(paths)
+        if current == state:
+            continue
+        # Debounce: wait until the sources stop changing
+        while True:
+            time.sleep(debounce)
+            latest = snapshot(paths)
+            if latest == current:
+                break
+            current = latest
+        state = current
+        run()
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Fault-tolerant bulk conversion, with checkpoints and resume
+
+Converts a (very) long list of formulas to an append-only JSON Lines file,
+one record per formula::
+
+    {"line": 1, "latex": "$$x=2\\sqrt{...}$$"}
+    {"line": 2, "formula": "x = (a", "error": "SyntaxError: ..."}
+
+Formulas that can't be converted are recorded with their error, and the
+conversion goes on. The position in the input is checkpointed periodically;
+if the job dies (bad input, out of memory, preemption), running it again
+resumes from the last checkpoint. Records written after the last checkpoint
+are discarded, so that no formula is written twice.
+
+Examples
+--------
+
+::
+
+    from pytexit.bulk import run_bulk
+    run_bulk("formulas.txt", "formulas.jsonl")
+
+or in a Terminal::
+
+    py2tex --bulk formulas.txt -o formulas.jsonl
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+import json
+import os
+import time
+
+from .build import write_atomic
+from .pytexit import py2tex
+
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_path(output_file):
+    """Default checkpoint of ``output_file``"""
+    return output_file + ".checkpoint"
+
+
+def read_checkpoint(path):
+    """Returns the checkpoint, or ``None`` if there is none"""
+    try:
+        with io.open(path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (IOError, OSError):
+        return None
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(
+            "{0} was written by another version of pytexit: remove it (and "
+            "the output file) to start again".format(path)
+        )
+    return checkpoint
+
+
+def _job_options(source, kwargs):
+    """What must not change between a job and its resume"""
+    return {
+        "source": source if isinstance(source, str) else None,
+        "options": {
+            k: v
+            for k, v in sorted(kwargs.items())
+            if isinstance(v, (str, int, float, bool, type(None)))
+        },
+    }
+
+
+def _input_lines(source, offset):
+    """Yields ``(line, offset after the line)`` of a formula file, from
+    byte ``offset``"""
+    with open(source, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            offset += len(line)
+            yield line.decode("utf-8"), offset
+
+
+def run_bulk(
+    source,
+    output_file,
+    checkpoint_file=None,
+    checkpoint_every=1000,
+    checkpoint_interval=30.0,
+    verbose=False,
+    **kwargs
+):
+    """Convert many formulas to a JSON Lines file, and resume where the last
+    run stopped
+
+    Parameters
+    ----------
+
+    source: str, or iterable of str
+        a text file with one formula per line (empty lines and ``#`` comments
+        are skipped, but counted in the line numbers), or formulas. An
+        iterable must yield the same formulas, in the same order, when the
+        job is resumed.
+
+    output_file: str
+        JSON Lines file. Each record has the ``line`` of the formula (1 for
+        the first), and its ``latex``, or the ``formula`` and its ``error``.
+
+    checkpoint_file: str, or ``None``
+        where the position of the job is saved. Default: ``output_file`` +
+        ``'.checkpoint'``.
+
+    checkpoint_every: int
+        save a checkpoint every ``checkpoint_every`` formulas...
+
+    checkpoint_interval: float
+        ... or every ``checkpoint_interval`` seconds, whichever comes first.
+        A checkpoint is also saved when the job stops (end, error,
+        ``KeyboardInterrupt``).
+
+    Other Parameters
+    ----------------
+
+    kwargs: dict
+        forwarded to :func:`~pytexit.pytexit.py2tex`. Options that are
+        strings or numbers must be the same when the job is resumed.
+
+    Returns
+    -------
+
+    dict: number of formulas ``converted`` and of ``errors`` by this run,
+    ``resumed`` position (lines already done by previous runs), ``total``
+    number of lines done.
+
+    Notes
+    -----
+
+    The output file is flushed to disk before each checkpoint. After a crash,
+    at most ``checkpoint_every`` formulas are converted again.
+
+    If the job dies again before its first checkpoint, the next runs save a
+    checkpoint after each formula, for ``checkpoint_every`` formulas. A
+    formula that kills the job twice this way is recorded as an error, and
+    skipped.
+
+    Examples
+    --------
+
+    ::
+
+        from pytexit.bulk import run_bulk
+        from pytexit import RenderBudget
+
+        run_bulk("formulas.txt", "formulas.jsonl",
+                 budget=RenderBudget(max_time=1))
+
+    """
+    kwargs.setdefault("print_latex", False)
+    kwargs.setdefault("print_formula", False)
+    if checkpoint_file is None:
+        checkpoint_file = checkpoint_path(output_file)
+    job = _job_options(source, kwargs)
+
+    checkpoint = read_checkpoint(checkpoint_file)
+    if checkpoint is None:
+        if os.path.exists(output_file) and os.path.getsize(output_file):
+            raise ValueError(
+                "{0} already exists, and has no checkpoint ({1}): remove it "
+                "to start a new job".format(output_file, checkpoint_file)
+            )
+        checkpoint = dict(job, version=CHECKPOINT_VERSION)
+        checkpoint.update(position=0, input_offset=0, output_offset=0, done=False)
+    elif (checkpoint["source"], checkpoint["options"]) != (
+        job["source"],
+        job["options"],
+    ):
+        raise ValueError(
+            "{0} is the checkpoint of another job ({1}, {2}): remove it and "
+            "{3} to start a new job".format(
+                checkpoint_file,
+                checkpoint["source"],
+                checkpoint["options"],
+                output_file,
+            )
+        )
+    resumed = checkpoint["position"]
+    report = {"converted": 0, "errors": 0, "resumed": resumed, "total": resumed}
+    if checkpoint["done"]:
+        return report
+
+    # A job that dies again before its first checkpoint may be killed by one
+    # of the next formulas (ex: out of memory). The next run saves a
+    # checkpoint after each formula to find it, and skips it if it kills the
+    # job again
+    after_careful_run = resumed < checkpoint.get("careful_until", 0)
+    if checkpoint.get("started_at") == resumed:
+        checkpoint["retries"] = checkpoint.get("retries", 0) + 1
+        checkpoint["careful_until"] = max(
+            checkpoint.get("careful_until", 0), resumed + checkpoint_every
+        )
+    else:
+        checkpoint["started_at"], checkpoint["retries"] = resumed, 0
+    careful_until = checkpoint.get("careful_until", 0)
+    skip_first = checkpoint["retries"] and after_careful_run
+
+    # Discard the records written after the last checkpoint
+    mode = "r+b" if os.path.exists(output_file) else "wb"
+    with open(output_file, mode) as out:
+        out.truncate(checkpoint["output_offset"])
+        out.seek(checkpoint["output_offset"])
+
+        def save(done=False):
+            out.flush()
+            os.fsync(out.fileno())
+            checkpoint["done"] = done
+            write_atomic(checkpoint_file, json.dumps(checkpoint))
+
+        save()
+        if isinstance(source, str):
+            lines = _input_lines(source, checkpoint["input_offset"])
+        else:
+            lines = ((expr, None) for i, expr in enumerate(source) if i >= resumed)
+
+        position = resumed
+        since_checkpoint, last_checkpoint = 0, time.time()
+        try:
+            for line, input_offset in lines:
+                position += 1
+                expr = line.strip()
+                if expr and not expr.startswith("#"):
+                    if skip_first and position == resumed + 1:
+                        record = {
+                            "line": position,
+                            "formula": expr,
+                            "error": "the conversion of this formula stopped "
+                            "the job twice: skipped",
+                        }
+                        report["errors"] += 1
+                    else:
+                        try:
+                            record = {
+                                "line": position,
+                                "latex": py2tex(expr, **kwargs),
+                            }
+                            report["converted"] += 1
+                        except Exception as err:
+                            record = {
+                                "line": position,
+                                "formula": expr,
+                                "error": "{0}: {1}".format(type(err).__name__, err),
+                            }
+                            report["errors"] += 1
+                    out.write(
+                        (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+                    )
+                # the line is done: this is a valid position to resume from
+                checkpoint["position"] = position
+                checkpoint["output_offset"] = out.tell()
+                if input_offset is not None:
+                    checkpoint["input_offset"] = input_offset
+                since_checkpoint += 1
+                if (
+                    since_checkpoint >= checkpoint_every
+                    or position <= careful_until
+                    or time.time() - last_checkpoint > checkpoint_interval
+                ):
+                    save()
+                    since_checkpoint, last_checkpoint = 0, time.time()
+                    if verbose:
+                        print("checkpoint: {0} lines done".format(position))
+        except BaseException:
+            save()
+            raise
+        save(done=True)
+
+    report["total"] = checkpoint["position"]
+    return report
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent on-disk cache of conversions, for repeated builds of the same
+reports
+
+Conversions are stored in a SQLite database, keyed by the (canonical)
+formula, the conversion options and the ``pytexit`` version. The database can
+be shared by concurrent processes.
+
+Examples
+--------
+
+::
+
+    from pytexit import py2tex
+    from pytexit.cache import DiskCache
+
+    cache = DiskCache()  # default location: ~/.cache/pytexit/cache.sqlite
+    py2tex('x = 2*sqrt(2*pi*k*T_e/m_e)', cache=cache)
+
+Inspect or prune the cache from a Terminal::
+
+    py2tex --cache-info
+    py2tex --cache-prune 50M
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Access times are only updated once per period (seconds): warm builds are
+# (mostly) read-only
+ACCESS_PERIOD = 3600
+
+_word_spaces = re.compile(r"(?<=\w)\s+(?=\w)")
+_spaces = re.compile(r"(?<!\w)\s+|\s+(?!\w)")
+_sizes = re.compile(r"^\s*(\d+(?:\.\d*)?)\s*([kKmMgG]?)[bB]?\s*$")
+
+
+def parse_size(size):
+    """Read a size in bytes. Ex: ``'50M'``, ``'1.5G'``, ``1000``"""
+    if isinstance(size, int):
+        return size
+    m = _sizes.match(size)
+    if m is None:
+        raise ValueError("Unexpected size: {0}".format(size))
+    factor = {"": 1, "k": 1e3, "m": 1e6, "g": 1e9}[m.group(2).lower()]
+    return int(float(m.group(1)) * factor)
+
+
+def default_path():
+    """Default location of the cache: ``$PYTEXIT_CACHE``, or
+    ``$XDG_CACHE_HOME/pytexit/cache.sqlite`` (``~/.cache`` if not defined)"""
+    if os.environ.get("PYTEXIT_CACHE"):
+        return os.environ["PYTEXIT_CACHE"]
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(root, "pytexit", "cache.sqlite")
+
+
+def canonical(expr):
+    """Canonical form of a formula: formulas that differ only by whitespace
+    have the same key (ex: ``a*2``, ``a * 2``). Formulas with strings are
+    kept as they are"""
+    if "'" in expr or '"' in expr:
+        return expr.strip()
+    # keep one space between words only (ex: 'not x', 'x if y else z')
+    expr = _word_spaces.sub(" ", expr.strip())
+    return _spaces.sub("", expr)
+
+
+class DiskCache(object):
+    """Persistent cache of conversions
+
+    Parameters
+    ----------
+
+    path: str, or ``None``
+        SQLite database. If ``None``, see
+        :func:`~pytexit.cache.default_path`.
+
+    maxsize: int, or str
+        maximum size of the stored conversions, in bytes (ex: ``'100M'``).
+        Least recently used conversions are evicted beyond.
+
+    See Also
+    --------
+
+    :func:`~pytexit.pytexit.py2tex`
+
+    """
+
+    def __init__(self, path=None, maxsize="100M"):
+        from . import __version__
+
+        self.path = path or default_path()
+        self.maxsize = parse_size(maxsize)
+        self.version = __version__
+        self.hits = 0
+        self.misses = 0
+        self._inserted = 0  # since the last size check
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.exists(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:  # created by a concurrent process
+                pass
+        # Concurrent processes: each opens its own connection, SQLite locks
+        # the database while writing. Writers wait up to `timeout` seconds.
+        self.connection = sqlite3.connect(
+            self.path, timeout=60, check_same_thread=False, isolation_level=None
+        )
+        with self._lock:
+            try:
+                self.connection.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.OperationalError:  # ex: network file systems
+                pass
+            # A cache can lose its last conversions on power loss, but must
+            # not wait for the disk at each insert
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS conversions ("
+                "key TEXT PRIMARY KEY, output TEXT, size INTEGER, accessed REAL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS conversions_accessed "
+                "ON conversions (accessed)"
+            )
+
+    def key(self, kind, expr, options):
+        """Key of a conversion
+
+        Parameters
+        ----------
+
+        kind: str
+            conversion function (ex: ``'py2tex'``)
+
+        expr: str
+            formula
+
+        options: dict
+            conversion options
+
+        """
+        data = json.dumps(
+            [kind, canonical(expr), sorted(options.items()), self.version],
+            sort_keys=True,
+        )
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the stored conversion (JSON decoded), or ``None``"""
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT output, accessed FROM conversions WHERE key=?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            now = time.time()
+            if row[1] < now - ACCESS_PERIOD:
+                self.connection.execute(
+                    "UPDATE conversions SET accessed=? WHERE key=?", (now, key)
+                )
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """Store a conversion (any JSON serializable value)"""
+        output = json.dumps(value)
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO conversions VALUES (?, ?, ?, ?)",
+                (key, output, len(output) + len(key), time.time()),
+            )
+            self._inserted += 1
+            check = self._inserted >= 1000
+        if check:
+            self.prune()
+
+    def size(self):
+        """Size of the stored conversions, in bytes"""
+        with self._lock:
+            return self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM conversions"
+            ).fetchone()[0]
+
+    def prune(self, maxsize=None):
+        """Evict the least recently used conversions until the cache is
+        smaller than ``maxsize`` (default: the ``maxsize`` of the cache)
+
+        Returns
+        -------
+
+        number of conversions evicted
+
+        """
+        maxsize = self.maxsize if maxsize is None else parse_size(maxsize)
+        with self._lock:
+            self._inserted = 0
+            total = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM conversions"
+            ).fetchone()[0]
+            if total <= maxsize:
+                return 0
+            # Find the access time above which the most recent conversions fit
+            excess, threshold = total - maxsize, None
+            for accessed, size in self.connection.execute(
+                "SELECT accessed, size FROM conversions ORDER BY accessed"
+            ):
+                excess -= size
+                if excess <= 0:
+                    threshold = accessed
+                    break
+            return self.connection.execute(
+                "DELETE FROM conversions WHERE accessed<=?", (threshold,)
+            ).rowcount
+
+    def clear(self):
+        """Remove all conversions"""
+        with self._lock:
+            self.connection.execute("DELETE FROM conversions")
+            self.hits = self.misses = 0
+
+    def info(self):
+        """Returns a dictionary with the ``path``, number of ``entries`` and
+        ``size`` of the cache, and the ``hits`` / ``misses`` of this session"""
+        with self._lock:
+            entries = self.connection.execute(
+                "SELECT COUNT(*) FROM conversions"
+            ).fetchone()[0]
+        return {
+            "path": self.path,
+            "entries": entries,
+            "size": self.size(),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+    def __len__(self):
+        return self.info()["entries"]
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Command line interface of the ``py2tex`` script
+
+Examples
+--------
+
+Convert formulas::
+
+    py2tex 'x = 2*sqrt(2*pi*k*T_e/m_e)'
+
+Convert all the formulas of a Python module, or all the assignments of a
+FORTRAN file, in a LaTeX appendix::
+
+    py2tex --module model.py -o appendix.tex
+    py2tex --fortran rates.f90 -o appendix.tex
+
+Build an appendix from many sources (directories, formula lists, modules,
+FORTRAN files), converting only what changed since the last build (see
+:mod:`~pytexit.build`)::
+
+    py2tex --build formulas/ --build model.py -o appendix.tex
+
+and keep it up to date while the sources are edited::
+
+    py2tex --build formulas/ --watch -o appendix.tex
+
+Convert millions of formulas, one per line, to a JSON Lines file, with
+checkpoints (see :mod:`~pytexit.bulk`). Run the same command again to resume
+an interrupted job::
+
+    py2tex --bulk formulas.txt -o formulas.jsonl
+
+Print the memory used to convert a file of formulas, by pipeline stage, and
+the size of the caches (see :mod:`~pytexit.memory`)::
+
+    py2tex --memory-report formulas.txt --cache
+
+Write the formula appendix of each Jupyter notebook of a directory, in
+parallel, converting only the notebooks that changed (see
+:mod:`~pytexit.notebook`)::
+
+    py2tex --notebooks analysis/ -o appendices/ --processes 4 --markdown
+
+Use, inspect or prune the persistent cache of conversions (see
+:class:`~pytexit.cache.DiskCache`)::
+
+    py2tex --cache 'x = 2*sqrt(2*pi*k*T_e/m_e)'
+    py2tex --cache-info
+    py2tex --cache-prune 50M
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import io
+import sys
+
+from .build import appendix, build, watch
+from .bulk import run_bulk
+from .cache import DiskCache
+from .memory import format_memory_report, memory_report
+from .notebook import scan_notebooks
+from .pytexit import forfile2tex, module2tex, py2tex, tex_outputs, uprint, visitors
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="py2tex", description="Convert Python formulas to LaTeX"
+    )
+    parser.add_argument("formulas", nargs="*", help="Python formulas")
+    parser.add_argument(
+        "--module",
+        action="append",
+        default=[],
+        metavar="FILE",
+        help="convert all formulas of a Python module",
+    )
+    parser.add_argument(
+        "--fortran",
+        action="append",
+        default=[],
+        metavar="FILE",
+        help="convert all assignments of a FORTRAN (.f, .f90) file",
+    )
+    parser.add_argument(
+        "--build",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help="build the output file (-o) from source files or directories, "
+        "converting only what changed since the last build",
+    )
+    parser.add_argument(
+        "--bulk",
+        metavar="FILE",
+        help="convert a file of formulas (one per line) to a JSON Lines file "
+        "(-o), with checkpoints: run again to resume an interrupted job",
+    )
+    parser.add_argument(
+        "--memory-report",
+        metavar="FILE",
+        help="convert a file of formulas (one per line) and print the memory "
+        "used by each stage, the size of the caches and the largest results",
+    )
+    parser.add_argument(
+        "--notebooks",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help="write the formula appendix of each Jupyter notebook (or each "
+        "notebook of a directory) in the output directory (-o), converting "
+        "only the notebooks that changed",
+    )
+    parser.add_argument(
+        "--markdown",
+        action="store_true",
+        help="with --notebooks: write Markdown instead of LaTeX appendices",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        metavar="N",
+        help="with --notebooks: convert notebooks in N worker processes",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="with --build: build again whenever the sources change",
+    )
+    parser.add_argument(
+        "--output",
+        choices=sorted(visitors),
+        default="tex",
+        help="output format (default: tex)",
+    )
+    parser.add_argument(
+        "-o", "--output-file", metavar="FILE", help="write to FILE instead of stdout"
+    )
+    cache = parser.add_argument_group("persistent cache")
+    cache.add_argument(
+        "--cache", action="store_true", help="read / store conversions in the cache"
+    )
+    cache.add_argument(
+        "--cache-file",
+        metavar="FILE",
+        help="cache database (default: $PYTEXIT_CACHE, or "
+        "~/.cache/pytexit/cache.sqlite)",
+    )
+    cache.add_argument(
+        "--cache-info", action="store_true", help="print the size of the cache"
+    )
+    cache.add_argument(
+        "--cache-prune",
+        metavar="SIZE",
+        help="evict the least recently used conversions beyond SIZE (ex: 50M)",
+    )
+    cache.add_argument(
+        "--cache-clear", action="store_true", help="remove all conversions"
+    )
+    options = parser.parse_args(args)
+
+    if (options.build or options.watch) and options.output not in tex_outputs:
+        parser.error("--build writes LaTeX: use --output tex or compact")
+    if options.notebooks and options.output not in tex_outputs:
+        parser.error("--notebooks writes LaTeX: use --output tex or compact")
+
+    if options.watch:
+        if not (options.build and options.output_file):
+            parser.error("--watch requires sources (--build) and an output file (-o)")
+        try:
+            watch(options.build, options.output_file, output=options.output)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if options.bulk:
+        if not options.output_file:
+            parser.error("--bulk requires an output file (-o)")
+        report = run_bulk(
+            options.bulk, options.output_file, output=options.output, verbose=True
+        )
+        print(
+            "{0}: {1} formulas converted, {2} errors ({3} lines done, {4} by "
+            "previous runs)".format(
+                options.output_file,
+                report["converted"],
+                report["errors"],
+                report["total"],
+                report["resumed"],
+            )
+        )
+        return 0
+
+    if options.memory_report:
+        with io.open(options.memory_report, encoding="utf-8") as f:
+            exprs = [
+                line.strip()
+                for line in f
+                if line.strip() and not line.strip().startswith("#")
+            ]
+        disk_cache = None
+        if options.cache or options.cache_file:
+            disk_cache = DiskCache(options.cache_file)
+        report = memory_report(exprs, output=options.output, cache=disk_cache)
+        uprint(format_memory_report(report))
+        return 0
+
+    if options.notebooks:
+        if not options.output_file:
+            parser.error("--notebooks requires an output directory (-o)")
+        report = scan_notebooks(
+            options.notebooks,
+            options.output_file,
+            format="markdown" if options.markdown else "tex",
+            processes=options.processes,
+            output=options.output,
+            verbose=True,
+        )
+        print(
+            "{0}: {1} formulas, {2} notebooks converted, {3} up to date, "
+            "{4} removed, {5} errors".format(
+                options.output_file,
+                report["formulas"],
+                len(report["converted"]),
+                len(report["skipped"]),
+                len(report["removed"]),
+                len(report["errors"]),
+            )
+        )
+        return 0
+
+    if options.build:
+        if not options.output_file:
+            parser.error("--build requires an output file (-o)")
+        report = build(options.build, options.output_file, output=options.output)
+        print(
+            "{0}: {1} formulas, {2} sources converted ({3} formulas rendered), "
+            "{4} up to date".format(
+                options.output_file,
+                report["formulas"],
+                len(report["converted"]),
+                report["rendered"],
+                len(report["reused"]),
+            )
+        )
+        return 0
+
+    maintenance = options.cache_info or options.cache_prune or options.cache_clear
+    if not (options.formulas or options.module or options.fortran or maintenance):
+        parser.print_usage()
+        return 1
+
+    disk_cache = None
+    if options.cache or options.cache_file or maintenance:
+        disk_cache = DiskCache(options.cache_file)
+    if options.cache_clear:
+        disk_cache.clear()
+    if options.cache_prune:
+        evicted = disk_cache.prune(options.cache_prune)
+        print("{0} conversions evicted".format(evicted))
+    if options.cache_info:
+        for k, v in sorted(disk_cache.info().items()):
+            print("{0}: {1}".format(k, v))
+    if not (options.cache or options.cache_file):
+        disk_cache = None
+
+    out = []
+    for e in options.formulas:
+        out.append(
+            py2tex(
+                e,
+                output=options.output,
+                print_latex=False,
+                print_formula=False,
+                cache=disk_cache,
+            )
+        )
+    for path in options.module:
+        formulas = module2tex(path, output=options.output, tex_enclosure="")
+        out.append(appendix(formulas, title=path))
+    for path in options.fortran:
+        formulas = forfile2tex(path, output=options.output, tex_enclosure="")
+        out.append(appendix(formulas, title=path))
+
+    if not out:  # cache maintenance only
+        return 0
+    if options.output_file:
+        with io.open(options.output_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(out) + "\n")
+    else:
+        for s in out:
+            uprint(s)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,12 @@
 
 """
 
+from .budget import BudgetExceeded, RenderBudget
+from .compact import CompactVisitor
 from .core import LatexVisitor, simplify, uprint
-from .docx import WordVisitor
+from .cost import estimate_cost
+from .docx import DocxWriter, OMMLVisitor, WordVisitor
 from .fortran import for2py
+from .guard import FormulaGuard, FormulaRejected
+from .mathml import MathMLVisitor
+from .memo import SubexpressionMemo
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Rendering budget, to convert untrusted formulas with a predictable cost
+
+Deeply nested formulas, or repeated divisions, can take much longer to
+render than usual formulas. With a :class:`~pytexit.core.budget.RenderBudget`,
+rendering stops as soon as a limit is exceeded::
+
+    from pytexit import py2tex, RenderBudget, BudgetExceeded
+
+    try:
+        py2tex(expr, budget=RenderBudget(max_nodes=10000, max_time=0.1))
+    except BudgetExceeded as err:
+        print(err.limit, err.used)
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+try:
+    from time import perf_counter as clock
+except ImportError:  # Python 2
+    from time import time as clock
+
+
+class BudgetExceeded(ValueError):
+    """Raised when rendering a formula exceeds its
+    :class:`~pytexit.core.budget.RenderBudget`
+
+    Attributes
+    ----------
+
+    limit: str
+        the limit exceeded: ``'max_nodes'``, ``'max_length'`` or ``'max_time'``
+
+    used: dict
+        what was used when rendering stopped: ``nodes`` visited, ``length``
+        of the longest output, ``time`` in seconds
+
+    budget: :class:`~pytexit.core.budget.RenderBudget`
+
+    """
+
+    def __init__(self, limit, used, budget):
+        self.limit = limit
+        self.used = used
+        self.budget = budget
+        super(BudgetExceeded, self).__init__(
+            "Rendering budget exceeded ({0}={1}): {2} nodes visited, output of "
+            "{3} characters, {4:.3f}s".format(
+                limit,
+                getattr(budget, limit),
+                used["nodes"],
+                used["length"],
+                used["time"],
+            )
+        )
+
+
+class RenderBudget(object):
+    """Limits of the rendering of a formula. Limits left to ``None`` are not
+    checked
+
+    Parameters
+    ----------
+
+    max_nodes: int
+        maximum number of nodes visited. Note that some nodes are visited
+        more than once (ex: the terms of divisions).
+
+    max_length: int
+        maximum length of the output (checked for every subexpression)
+
+    max_time: float
+        maximum rendering time, in seconds
+
+    Notes
+    -----
+
+    The budget applies to each rendering: with several outputs
+    (``py2tex(output=[...])``), each output has the full budget. A budget can
+    be shared by concurrent conversions.
+
+    See Also
+    --------
+
+    :meth:`~pytexit.core.core.LatexVisitor.visit`
+
+    """
+
+    def __init__(self, max_nodes=None, max_length=None, max_time=None):
+        self.max_nodes = max_nodes
+        self.max_length = max_length
+        self.max_time = max_time
+
+    def start(self):
+        """Returns the usage of a new rendering"""
+        return BudgetUsage(self)
+
+    def __repr__(self):
+        return "RenderBudget(max_nodes={0}, max_length={1}, max_time={2})".format(
+            self.max_nodes, self.max_length, self.max_time
+        )
+
+
+class BudgetUsage(object):
+    """What a rendering used of its budget"""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.nodes = 0
+        self.length = 0
+        self.start = clock()
+
+    def used(self):
+        return {
+            "nodes": self.nodes,
+            "length": self.length,
+            "time": clock() - self.start,
+        }
+
+    def visit(self):
+        """Count a visited node. Raises
+        :class:`~pytexit.core.budget.BudgetExceeded` if out of budget"""
+        self.nodes += 1
+        budget = self.budget
+        if budget.max_nodes is not None and self.nodes > budget.max_nodes:
+            raise BudgetExceeded("max_nodes", self.used(), budget)
+        if budget.max_time is not None and clock() - self.start > budget.max_time:
+            raise BudgetExceeded("max_time", self.used(), budget)
+
+    def output(self, s):
+        """Check the length of a rendered subexpression"""
+        if s is not None and len(s) > self.length:
+            self.length = len(s)
+            if (
+                self.budget.max_length is not None
+                and self.length > self.budget.max_length
+            ):
+                raise BudgetExceeded("max_length", self.used(), self.budget)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Compact LaTeX output, for client-side renderers (KaTeX, MathJax)
+
+The :class:`~pytexit.core.compact.CompactVisitor` emits the shortest LaTeX
+that renders the same as the :class:`~pytexit.core.core.LatexVisitor` output:
+plain parenthesis when no delimiter sizing is needed, no redundant braces,
+and built-in operator names instead of ``\\operatorname{...}``.
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import re
+
+from .core import LatexVisitor
+
+# Operator names that have a built-in LaTeX command
+builtin_operators = [
+    "arg",
+    "cot",
+    "coth",
+    "csc",
+    "deg",
+    "det",
+    "dim",
+    "gcd",
+    "hom",
+    "ker",
+    "lg",
+    "lim",
+    "max",
+    "min",
+    "sec",
+    "sup",
+]
+
+# Constructs that are taller than a line of text: delimiters around them
+# must be sized with \left( \right)
+tall_constructs = [r"\frac", r"\sum", r"\int", r"\sqrt", r"\left", r"\lfloor"]
+
+_control_word = re.compile(r"^\\[a-zA-Z]+$")
+# Numbers in parenthesis (ex: the argument of \ln(2))
+_number_in_parenthesis = re.compile(r"\(([\d\.]+)\)")
+
+
+def is_enclosed(expr, opening="(", closing=")"):
+    """Returns ``True`` if ``expr`` is entirely enclosed in a single pair of
+    ``opening`` / ``closing`` delimiters. Ex::
+
+        (a+b)      -> True
+        (a)+(b)    -> False
+    """
+    if not (expr.startswith(opening) and expr.endswith(closing)):
+        return False
+    depth = 0
+    i = 0
+    while i < len(expr):
+        if expr.startswith(opening, i):
+            depth += 1
+            i += len(opening)
+        elif expr.startswith(closing, i):
+            depth -= 1
+            i += len(closing)
+            if depth == 0 and i < len(expr):
+                return False
+        else:
+            i += 1
+    return depth == 0
+
+
+class CompactVisitor(LatexVisitor):
+    """A variant of the LatexVisitor that minimizes the size of the LaTeX
+    output. Ex::
+
+        LatexVisitor:   \\frac{x}{\\left(a+b\\right)^2}
+        CompactVisitor: \\frac x{(a+b)^2}
+
+    See Also
+    --------
+
+    :class:`~pytexit.core.core.LatexVisitor`
+
+    """
+
+    def is_atom(self, expr):
+        """Returns ``True`` if ``expr`` is a single TeX token, or a group
+        already enclosed in parenthesis"""
+        return (
+            len(expr) == 1
+            or _control_word.match(expr) is not None
+            or is_enclosed(expr, "(", ")")
+            or is_enclosed(expr, r"\left(", r"\right)")
+        )
+
+    def argument(self, expr):
+        """Argument of a TeX macro (\\frac, \\sqrt): braces only if needed"""
+        if len(expr) == 1:
+            # a letter would merge with the macro name: \fracab -> \frac ab
+            return " " + expr if expr.isalpha() else expr
+        return self.brackets(expr)
+
+    # LaTeX blocs
+    def group(self, expr):
+        """Returns expr, add brackets only if it is not a single token"""
+        if self.is_atom(expr):
+            return expr
+        return self.brackets(expr)
+
+    def parenthesis(self, expr):
+        """Use \\left( \\right) only around tall constructs"""
+        if any(t in expr for t in tall_constructs):
+            return super(CompactVisitor, self).parenthesis(expr)
+        return "({0})".format(expr)
+
+    def division(self, up, down):
+        # no space needed before the denominator: \frac ab
+        down = down if len(down) == 1 else self.brackets(down)
+        return r"\frac{0}{1}".format(self.argument(up), down)
+
+    def sqrt(self, args):
+        return r"\sqrt{0}".format(self.argument(args))
+
+    def simplify(self, s):
+        """Same as :func:`~pytexit.core.core.simplify`: no parenthesis around
+        numbers (ex: \\ln2), which are plain parenthesis here"""
+        s = super(CompactVisitor, self).simplify(s)
+        return _number_in_parenthesis.sub(r"\1", s)
+
+    def operator(self, func, args=None):
+        if func in builtin_operators:
+            if args is None:
+                return r"\{0}".format(func)
+            else:
+                return r"\{0}{1}".format(func, self.parenthesis(args))
+        return super(CompactVisitor, self).operator(func, args)
@@ -64,17 +64,47 @@ clear_modules = [
     "df",  # not a module, but useful to clear pandas dataframe for readability
 ]
 
+# Functions written as a prefix operator: Python name -> LaTeX name. Shared
+# by all backends (the MathML name is the LaTeX name without backslash).
+# Note: by default log refers to log10 in Python. Unless people import it as ln
+prefix_functions = {
+    "cos": "cos",
+    "sin": "sin",
+    "tan": "tan",
+    "cosh": "cosh",
+    "sinh": "sinh",
+    "tanh": "tanh",
+    "log": r"\ln",
+    "ln": r"\ln",
+    "log10": r"\log",
+    "arccos": r"\arccos",
+    "acos": r"\arccos",
+    "arcsin": r"\arcsin",
+    "asin": r"\arcsin",
+    "atan": r"\arctan",
+    "arctan": r"\arctan",
+}
+
+# Inverse hyperbolic functions, written f^{-1}
+inverse_functions = {
+    "arcsinh": r"\sinh",
+    "arccosh": r"\cosh",
+    "arctanh": r"\tanh",
+}
+
 # % Printing & encoding
 
 
 def uprint(*expr):
-    """Deals with encoding problems"""
+    """Deals with encoding problems. The line is written at once, so that
+    lines printed by concurrent threads don't interleave"""
 
+    line = " ".join("{0}".format(e) for e in expr) + "\n"
     try:
-        print(*expr)
+        sys.stdout.write(line)
     except UnicodeEncodeError:
-        f = lambda expr: expr.encode(sys.stdout.encoding, errors="replace")
-        print(*list(map(f, expr)))
+        encoding = sys.stdout.encoding or "ascii"
+        sys.stdout.write(line.encode(encoding, errors="replace").decode(encoding))
 
 
 class LatexVisitor(ast.NodeVisitor):
@@ -100,6 +130,16 @@ class LatexVisitor(ast.NodeVisitor):
         see :meth:`~pytexit.core.core.LatexVisitor.visit_BinOp` for more
         information. Default ``False``.
 
+    memo: :class:`~pytexit.core.memo.SubexpressionMemo`, or ``None``
+        if given, rendered subexpressions are stored in ``memo``, and
+        subexpressions already rendered (in this formula or others) are
+        reused. See :meth:`~pytexit.core.core.LatexVisitor.visit`.
+
+    budget: :class:`~pytexit.core.budget.RenderBudget`, or ``None``
+        if given, rendering a formula raises
+        :class:`~pytexit.core.budget.BudgetExceeded` as soon as it exceeds
+        the budget.
+
     """
 
     def __init__(
@@ -112,6 +152,8 @@ class LatexVisitor(ast.NodeVisitor):
         simplify_fractions,
         simplify_ints,
         tex_multiplier,
+        memo=None,
+        budget=None,
     ):
 
         super(LatexVisitor, self).__init__()
@@ -127,6 +169,14 @@ class LatexVisitor(ast.NodeVisitor):
         self.simplify_ints = simplify_ints
         self.tex_multiplier = tex_multiplier
 
+        self.memo = memo
+        # structural keys of the nodes of the formula being rendered
+        self._memo_keys = None
+
+        self.budget = budget
+        # usage of the budget by the formula being rendered
+        self._usage = None
+
         self.precdic = {
             "Pow": 700,
             "Div": 400,
@@ -149,6 +199,66 @@ class LatexVisitor(ast.NodeVisitor):
             "Name": 1000,
         }
 
+    def memo_context(self):
+        """Options that change the rendering of a subexpression: a memo can be
+        shared by visitors of different backends / options"""
+        return (
+            self.__class__,
+            self.dummy_var,
+            self.upper,
+            self.lower,
+            self.simplify_multipliers,
+            self.simplify_fractions,
+            self.simplify_ints,
+            self.tex_multiplier,
+        )
+
+    def visit(self, node):
+        """Visit a node. If the visitor has a ``memo``, expressions and
+        statements are looked up in the memo first. If the visitor has a
+        ``budget``, nodes visited, output length and time are checked at
+        every node
+
+        Note: the rendering of a node does not depend on its parent (parents
+        add the parenthesis they need), so that a subexpression can be reused
+        wherever it appears.
+        """
+        if self.budget is None:
+            return self.visit_memo(node)
+
+        top = self._usage is None
+        if top:
+            self._usage = self.budget.start()
+        try:
+            self._usage.visit()
+            s = self.visit_memo(node)
+            self._usage.output(s)
+            return s
+        finally:
+            if top:
+                self._usage = None
+
+    def visit_memo(self, node):
+        """Visit a node, looking it up in the ``memo`` first"""
+        if self.memo is None or not isinstance(node, (ast.expr, ast.stmt)):
+            return super(LatexVisitor, self).visit(node)
+
+        top = self._memo_keys is None
+        if top:
+            self._memo_keys = {}
+            self._memo_context = self.memo_context()
+        try:
+            key = self.memo.key(node, self._memo_keys)
+            s = self.memo.get(self._memo_context, key)
+            if s is None:
+                s = super(LatexVisitor, self).visit(node)
+                self.memo.set(self._memo_context, key, s)
+            return s
+        finally:
+            if top:
+                self._memo_keys = None
+                self.memo.collect()
+
     def looks_like_int(self, a):
         """Check if the input ``a`` looks like an integer"""
 
@@ -227,28 +337,12 @@ class LatexVisitor(ast.NodeVisitor):
             args = ", ".join(map(self.visit, n.args))
 
         # Usual math functions
-        if func in ["cos", "sin", "tan", "cosh", "sinh", "tanh"]:
-            return "{0}{1}".format(func, self.parenthesis(args))
+        if func in prefix_functions:
+            return prefix_functions[func] + self.parenthesis(args)
+        elif func in inverse_functions:
+            return r"%s^{-1}%s" % (inverse_functions[func], self.parenthesis(args))
         elif func == "sqrt":
             return self.sqrt(args)
-        # by default log refers to log10 in Python. Unless people import it as
-        # ln
-        elif func in ["log", "ln"]:
-            return r"\ln%s" % self.parenthesis(args)
-        elif func in ["log10"]:
-            return r"\log%s" % self.parenthesis(args)
-        elif func in ["arccos", "acos"]:
-            return r"\arccos%s" % self.parenthesis(args)
-        elif func in ["arcsin", "asin"]:
-            return r"\arcsin%s" % self.parenthesis(args)
-        elif func in ["atan", "arctan"]:
-            return r"\arctan%s" % self.parenthesis(args)
-        elif func in ["arcsinh"]:
-            return r"\sinh^{-1}%s" % self.parenthesis(args)
-        elif func in ["arccosh"]:
-            return r"\cosh^{-1}%s" % self.parenthesis(args)
-        elif func in ["arctanh"]:
-            return r"\tanh^{-1}%s" % self.parenthesis(args)
         elif func in ["power", "pow"]:
             args = [arg.strip() for arg in args.split(",")]
             if "+" in args[0] or "-" in args[0]:
@@ -313,72 +407,72 @@ class LatexVisitor(ast.NodeVisitor):
             if self.verbose:
                 warn("Only one upperscript character supported per identifier")
 
-        def build_tree(expr, level=1):
-            """Builds a tree out of a valid Python identifier, according to the
-            following proposed formalism:
+        return self.read_tree(self.build_tree(n.id))
 
-            Formalism
-            ----------
-                Python -> Real
+    def build_tree(self, expr, level=1):
+        """Builds a tree out of a valid Python identifier, according to the
+        following proposed formalism:
 
-                k_i_j  -> k_i,j
-                k_i__j -> k_(i_j)
-                k_iˆj -> k_i^j
-                k_iˆˆj -> k_(i^j)
-                k_i__1_i__2ˆj__1ˆˆj__2 -> k_(i_1,i_2)^(j_1,j_2)
+        Formalism
+        ----------
+            Python -> Real
 
-            Even if one may agree that this last expression isn't a very
-            readable variable name.
+            k_i_j  -> k_i,j
+            k_i__j -> k_(i_j)
+            k_iˆj -> k_i^j
+            k_iˆˆj -> k_(i^j)
+            k_i__1_i__2ˆj__1ˆˆj__2 -> k_(i_1,i_2)^(j_1,j_2)
 
-            The idea behind this is that I want my Python formula to be the
-            same objects as the LaTeX formula I write in my reports / papers
+        Even if one may agree that this last expression isn't a very
+        readable variable name.
 
-            It allows me to:
-            - gain time
-            - check my Python formula (once printed LaTeX is much more readable
-            that a multiline Python expression)
+        The idea behind this is that I want my Python formula to be the
+        same objects as the LaTeX formula I write in my reports / papers
 
-            """
+        It allows me to:
+        - gain time
+        - check my Python formula (once printed LaTeX is much more readable
+        that a multiline Python expression)
 
-            #            sep0 = '[{0}][{1}]'.format(self.lower,self.upper)
-            sep = "[{0}{1}]".format(self.lower, self.upper)
-            s = re.split(
-                r"(?<!{0})({0}{{{1}}})(?!{0})".format(sep, level), expr
-            )  # Also returns the pattern n
-            t = {}  # build tree
-            if self.verbose:
-                uprint("  " * (level - 1), "val:", self.convert_symbols(s[0]))
-            t["val"] = self.convert_symbols(s[0])
-            t["low"] = []
-            t["up"] = []
-            for i in range(1, len(s), 2):
-                p = s[i]
-                if p == self.lower * level:
-                    if self.verbose:
-                        uprint("  " * (level - 1), "low:", s[i + 1])
-                    t["low"].append(build_tree(s[i + 1], level + 1))
-                elif p == self.upper * level:
-                    if self.verbose:
-                        uprint("  " * (level - 1), "up:", s[i + 1])
-                    t["up"].append(build_tree(s[i + 1], level + 1))
-                else:
-                    raise ValueError("Undetected separator")
-            return t
-
-        def read_tree(t):
-            """Write a LaTeX readable name"""
-            r = t["val"]
-            if t["low"]:
-                #                child = [self.group(read_tree(tc)) for tc in t['low']]
-                child = [read_tree(tc) for tc in t["low"]]
-                r += "_{0}".format(self.group(",".join(child)))
-            if t["up"]:
-                #                child = [self.group(read_tree(tc)) for tc in t['up']]
-                child = [read_tree(tc) for tc in t["up"]]
-                r += "^{0}".format(self.group(",".join(child)))
-            return r
-
-        return read_tree(build_tree(n.id))
+        """
+
+        #            sep0 = '[{0}][{1}]'.format(self.lower,self.upper)
+        sep = "[{0}{1}]".format(self.lower, self.upper)
+        s = re.split(
+            r"(?<!{0})({0}{{{1}}})(?!{0})".format(sep, level), expr
+        )  # Also returns the pattern n
+        t = {}  # build tree
+        if self.verbose:
+            uprint("  " * (level - 1), "val:", self.convert_symbols(s[0]))
+        t["val"] = self.convert_symbols(s[0])
+        t["low"] = []
+        t["up"] = []
+        for i in range(1, len(s), 2):
+            p = s[i]
+            if p == self.lower * level:
+                if self.verbose:
+                    uprint("  " * (level - 1), "low:", s[i + 1])
+                t["low"].append(self.build_tree(s[i + 1], level + 1))
+            elif p == self.upper * level:
+                if self.verbose:
+                    uprint("  " * (level - 1), "up:", s[i + 1])
+                t["up"].append(self.build_tree(s[i + 1], level + 1))
+            else:
+                raise ValueError("Undetected separator")
+        return t
+
+    def read_tree(self, t):
+        """Write a LaTeX readable name"""
+        r = t["val"]
+        if t["low"]:
+            #                child = [self.group(self.read_tree(tc)) for tc in t['low']]
+            child = [self.read_tree(tc) for tc in t["low"]]
+            r += "_{0}".format(self.group(",".join(child)))
+        if t["up"]:
+            #                child = [self.group(self.read_tree(tc)) for tc in t['up']]
+            child = [self.read_tree(tc) for tc in t["up"]]
+            r += "^{0}".format(self.group(",".join(child)))
+        return r
 
     #    def convert_underscores(self, expr):
     #
@@ -626,6 +720,8 @@ class LatexVisitor(ast.NodeVisitor):
                 return ">="
             elif isinstance(op, ast.Eq):
                 return "="
+            elif isinstance(op, ast.NotEq):
+                return r"\neq "
             else:
                 raise ValueError("Unknown comparator", op.__class__)
 
@@ -639,6 +735,21 @@ class LatexVisitor(ast.NodeVisitor):
             ),
         )
 
+    def visit_BoolOp(self, n):
+        """Rewrite BoolOp function (and / or)"""
+        return self.visit(n.op).join(
+            self.parenthesis(self.visit(v))
+            if isinstance(v, ast.BoolOp)
+            else self.visit(v)
+            for v in n.values
+        )
+
+    def visit_And(self, n):
+        return r"\land "
+
+    def visit_Or(self, n):
+        return r"\lor "
+
     # Default
     def generic_visit(self, n):
         if isinstance(n, ast.AST):
@@ -683,6 +794,11 @@ class LatexVisitor(ast.NodeVisitor):
         else:
             return r"\operatorname{{{0}}}{1}".format(func, self.parenthesis(args))
 
+    # Post-processing
+    def simplify(self, s):
+        """Clean the output, see :func:`~pytexit.core.core.simplify`"""
+        return simplify(s)
+
 
 def preprocessing(expr):
     """Pre-process a string."""
@@ -703,30 +819,208 @@ def preprocessing(expr):
     return expr
 
 
+_line_end = re.compile(r"\r\n|\r|\n")
+
+
+def source_lines(source):
+    """Lines of ``source``, with their line ends, split as the ``ast`` parser
+    does. See :func:`~pytexit.core.core.source_segment`"""
+    lines, start = [], 0
+    for m in _line_end.finditer(source):
+        lines.append(source[start : m.end()])
+        start = m.end()
+    if start < len(source):
+        lines.append(source[start:])
+    return lines
+
+
+def source_segment(lines, node):
+    """Source code of ``node``, as :func:`ast.get_source_segment`, from the
+    :func:`~pytexit.core.core.source_lines` of the source. The source is
+    split once, instead of once per node. Returns ``None`` if the node has
+    no position information"""
+    try:
+        lineno, end_lineno = node.lineno - 1, node.end_lineno - 1
+        col, end_col = node.col_offset, node.end_col_offset
+    except (AttributeError, TypeError):
+        return None
+    if end_col is None:
+        return None
+    # offsets are in bytes of the UTF-8 encoded line
+    if lineno == end_lineno:
+        return lines[lineno].encode("utf-8")[col:end_col].decode("utf-8")
+    first = lines[lineno].encode("utf-8")[col:].decode("utf-8")
+    last = lines[end_lineno].encode("utf-8")[:end_col].decode("utf-8")
+    return "".join([first] + lines[lineno + 1 : end_lineno] + [last])
+
+
+class ASTPreprocessor(ast.NodeTransformer):
+    """Equivalent of :func:`~pytexit.core.core.preprocessing` and
+    :func:`~pytexit.core.core.replace_scientific` on an already parsed
+    expression. See :func:`~pytexit.core.core.preprocessing_ast`
+
+    Nodes are copied on write: the input tree is never modified, and
+    unchanged subtrees are shared with the output tree."""
+
+    def __init__(self, source=None, scientific=True):
+        super(ASTPreprocessor, self).__init__()
+        self.source = source
+        self.scientific = scientific
+        self._lines = None
+
+    def generic_visit(self, n):
+        changed = {}
+        for field, old in ast.iter_fields(n):
+            if isinstance(old, list):
+                new = [self.visit(x) if isinstance(x, ast.AST) else x for x in old]
+                if any(a is not b for a, b in zip(new, old)):
+                    changed[field] = new
+            elif isinstance(old, ast.AST):
+                new = self.visit(old)
+                if new is not old:
+                    changed[field] = new
+        if not changed:
+            return n
+        fields = dict(ast.iter_fields(n))
+        fields.update(changed)
+        return ast.copy_location(n.__class__(**fields), n)
+
+    def visit_Attribute(self, n):
+        # remove unnecessary calls to libraries: np.exp -> exp
+        if dotted_name(n.value) in clear_modules:
+            return ast.copy_location(ast.Name(id=n.attr, ctx=n.ctx), n)
+        return self.generic_visit(n)
+
+    def visit_Name(self, n):
+        # replace unicode values
+        name = n.id
+        for u in unicode_tbl:
+            name = name.replace(u, unicode_tbl[u])
+        if name != n.id:
+            return ast.copy_location(ast.Name(id=name, ctx=n.ctx), n)
+        return n
+
+    def visit_Constant(self, n):
+        # replace scientific notation with power of 10. The ast parser replaced
+        # 1e3 with 1000.0, so the literal is read back from the source
+        if self.scientific and self.source is not None:
+            if self._lines is None:
+                self._lines = source_lines(self.source)
+            literal = source_segment(self._lines, n)
+            if literal and literal[0].isdigit() and "e" in literal.lower():
+                new = ast.parse(replace_scientific(literal), mode="eval").body
+                return ast.copy_location(new, n)
+        return n
+
+
+def dotted_name(n):
+    """Returns the dotted name of an Attribute chain (ex: ``scipy.integrate``),
+    or ``None`` if the node isn't one"""
+    if isinstance(n, ast.Name):
+        return n.id
+    elif isinstance(n, ast.Attribute):
+        base = dotted_name(n.value)
+        if base is not None:
+            return base + "." + n.attr
+    return None
+
+
+def preprocessing_ast(node, source=None, scientific=True):
+    """Pre-process a parsed expression: removes unicode, module calls, etc.
+    See :func:`~pytexit.core.core.preprocessing`
+
+    Returns a new tree: ``node`` is not modified.
+
+    Parameters
+    ----------
+
+    node: ast.AST
+        parsed expression
+
+    source: str
+        source code ``node`` was parsed from. Used to read the original
+        scientific notation of numbers, that is lost in the parsed tree.
+
+    scientific: bool
+        if ``True`` and ``source`` is given, replace scientific notation with
+        power of 10. See :func:`~pytexit.core.core.replace_scientific`
+
+    """
+    return ASTPreprocessor(source=source, scientific=scientific).visit(node)
+
+
+# Scientific notation: 'NUMBER e NUMBER'. Compiled once, at import. The
+# lookahead only lets the regex engine skip faster to digits and dots
+_scientific = re.compile(r"(?=[\d.])(\d*\.?\d+)[eE]([-+]?\d*\.?\d+)")
+
+
+def _power_of_10(match):
+    prefactor, exponent = match.groups()
+    if float(prefactor) == 1.0:
+        return r"10**{}".format(exponent)
+    else:
+        return r"{}*10**{}".format(prefactor, exponent)
+
+
 def replace_scientific(s):
     """Replace 'NUMBER e NUMBER' with powers of 10"""
 
-    regexp = re.compile(r"(\d*\.?\d+)[eE]([-+]?\d*\.?\d+)")
+    return _scientific.sub(_power_of_10, s)
 
-    matches = regexp.findall(s)
-    splits = regexp.split(s)
-    assert len(splits) == (len(matches) + 1) + (2 * len(matches))
-    #                     splitted groups             prefactor, exponent
 
-    new_s = ""
-    # loop over all match and replace
-    # ... I didnt find any better way to do that given that we want a conditional
-    # ... replace (.sub wouldnt work)
-    for i, (prefactor, exponent) in enumerate(matches):
-        new_s += splits[3 * i]
+# Separates the formulas of a batch in preprocessing_many(). Formulas can't
+# contain it (the parser rejects null bytes)
+_batch_separator = "\x00"
 
-        if float(prefactor) == 1.0:
-            new_s += r"10**{}".format(exponent)
-        else:
-            new_s += r"{}*10**{}".format(prefactor, exponent)
-    if len(splits) % 3 == 1:  # add last ones
-        new_s += splits[-1]
-    return new_s
+
+def preprocessing_many(exprs, scientific=True):
+    """Pre-process a batch of formulas at once
+
+    Same as :func:`~pytexit.core.core.preprocessing`, followed by
+    :func:`~pytexit.core.core.replace_scientific` if ``scientific``, on each
+    formula. The formulas are joined in one buffer and each replacement runs
+    once on the buffer, with patterns compiled once per batch, rather than
+    once per formula.
+
+    Parameters
+    ----------
+
+    exprs: list of str
+        formulas
+
+    scientific: bool
+        replace scientific notation with powers of 10
+
+    Returns
+    -------
+
+    list of str: pre-processed formulas, in the same order
+
+    """
+    exprs = list(exprs)
+    if any(_batch_separator in expr for expr in exprs):  # can't be joined
+        if scientific:
+            return [replace_scientific(preprocessing(expr)) for expr in exprs]
+        return [preprocessing(expr) for expr in exprs]
+    buffer = _batch_separator.join(exprs)
+
+    # replace unicode values: all the characters in one pass, then the words
+    chars = [u for u in unicode_tbl if len(u) == 1]
+    if chars:
+        pattern = re.compile("|".join(re.escape(u) for u in chars))
+        buffer = pattern.sub(lambda m: unicode_tbl[m.group()], buffer)
+    for u in unicode_tbl:
+        if len(u) > 1:
+            buffer = buffer.replace(u, unicode_tbl[u])
+
+    # remove unnecessary calls to libraries (in the same order as preprocessing)
+    for m in clear_modules:
+        buffer = buffer.replace(m + ".", "")
+
+    if scientific:
+        buffer = _scientific.sub(_power_of_10, buffer)
+
+    return [expr.strip() for expr in buffer.split(_batch_separator)]
 
 
 def simplify(s):
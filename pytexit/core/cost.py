@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Estimate the rendering cost of formulas, to schedule large batches
+
+Formulas of a batch range from one identifier to multi-kilobyte fits. The
+cost of a formula is estimated from a scan of its tokens (no parsing), and
+used to convert the most expensive formulas first and to balance the chunks
+of the workers::
+
+    from pytexit.core.cost import balance, estimate_cost
+
+    costs = [estimate_cost(expr) for expr in exprs]
+    chunks = balance(costs, 8)   # 8 lists of indices of exprs
+
+:func:`~pytexit.pytexit.column2tex` and :func:`~pytexit.aio.apy2tex_many`
+schedule their conversions this way.
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import heapq
+import timeit
+
+from .guard import _token
+
+# Rendering time, in µs, per unit of each feature of cost_features() (and a
+# base time per formula). Calibrated with calibrate() on the test corpus and
+# on synthetic formulas (long sums, nested divisions), CPython 3.11. Only the
+# relative costs matter for scheduling.
+cost_coefficients = {"base": 12.0, "work": 1.1, "tokens": 1.1, "chars": 0.55}
+
+
+def cost_features(expr):
+    """Features of the rendering cost of a formula, from a scan of its tokens
+
+    Returns
+    -------
+
+    dict with:
+
+    - ``work``: number of tokens, weighted by the number of times they are
+      rendered. Both terms of a division are rendered twice, so the cost of
+      nested divisions doubles at each level.
+    - ``tokens``: number of tokens
+    - ``chars``: number of characters of the names and numbers
+    - ``divisions``: number of divisions
+
+    """
+    work = 0  # of the current bracket group
+    stack = []  # enclosing groups: (work, preceded by a division)
+    last = 0  # work of the last operand, doubled if followed by a division
+    after_division = False
+    tokens = chars = divisions = 0
+    for m in _token.finditer(expr):
+        kind = m.lastgroup
+        if kind == "space":
+            continue
+        tokens += 1
+        if kind == "open":
+            stack.append((work, after_division))
+            work, last, after_division = 1, 0, False
+        elif kind == "close":
+            group = work + 1
+            if stack:
+                work, doubled = stack.pop()
+                if doubled:
+                    group *= 2
+            else:  # unbalanced: ignored
+                work = 0
+            work += group
+            last, after_division = group, False
+        elif kind == "operator":
+            work += 1
+            after_division = m.group() in ("/", "//", "÷")
+            if after_division:
+                work += last
+                divisions += 1
+            last = 0
+        else:
+            chars += m.end() - m.start()
+            last = 2 if after_division else 1
+            work += last
+            after_division = False
+    for enclosing, _ in stack:  # unclosed brackets
+        work += enclosing
+    return {"work": work, "tokens": tokens, "chars": chars, "divisions": divisions}
+
+
+def estimate_cost(expr, coefficients=None):
+    """Estimated rendering time of a formula (in µs, with the default
+    coefficients)
+
+    Parameters
+    ----------
+
+    expr: str
+        Python formula
+
+    coefficients: dict, or ``None``
+        cost per unit of each feature of
+        :func:`~pytexit.core.cost.cost_features`, and ``base`` cost. If
+        ``None``, :data:`~pytexit.core.cost.cost_coefficients`. See
+        :func:`~pytexit.core.cost.calibrate`.
+
+    """
+    if coefficients is None:
+        coefficients = cost_coefficients
+    cost = coefficients.get("base", 0)
+    for feature, value in cost_features(expr).items():
+        cost += coefficients.get(feature, 0) * value
+    return cost
+
+
+def calibrate(exprs, number=10, **kwargs):
+    """Fit the cost coefficients to the rendering times of ``exprs`` on this
+    machine (least squares on relative errors). Requires NumPy.
+
+    Parameters
+    ----------
+
+    exprs: list of str
+        formulas, preferably of very different costs
+
+    number: int
+        number of conversions timed per formula (the best of 3 is kept)
+
+    Other Parameters
+    ----------------
+
+    kwargs: dict
+        options of :func:`~pytexit.pytexit.py2tex`
+
+    Returns
+    -------
+
+    dict: coefficients, to use with :func:`~pytexit.core.cost.estimate_cost`
+
+    """
+    import numpy as np
+
+    from ..pytexit import py2tex
+
+    kwargs.setdefault("print_latex", False)
+    kwargs.setdefault("print_formula", False)
+    names = ["base", "work", "tokens", "chars"]
+    rows, times = [], []
+    for expr in exprs:
+        t = min(timeit.repeat(lambda: py2tex(expr, **kwargs), number=number, repeat=3))
+        features = cost_features(expr)
+        rows.append([1] + [features[name] for name in names[1:]])
+        times.append(t / number * 1e6)
+    A, y = np.array(rows, dtype=float), np.array(times)
+    coefs = np.linalg.lstsq(A / y[:, None], np.ones(len(y)), rcond=None)[0]
+    return dict(zip(names, coefs.tolist()))
+
+
+def largest_first(costs):
+    """Indices of ``costs``, from the largest to the smallest cost"""
+    return sorted(range(len(costs)), key=costs.__getitem__, reverse=True)
+
+
+def balance(costs, n):
+    """Split items into ``n`` chunks of about the same total cost
+
+    Items are assigned largest first, each to the chunk with the lowest total
+    cost so far (LPT scheduling).
+
+    Parameters
+    ----------
+
+    costs: list of float
+        cost of each item
+
+    n: int
+        number of chunks
+
+    Returns
+    -------
+
+    list of chunks (lists of indices of ``costs``), from the most to the least
+    expensive. Each chunk is ordered largest first. Empty chunks are dropped.
+
+    """
+    heap = [(0, i, []) for i in range(max(1, n))]
+    for index in largest_first(costs):
+        total, i, chunk = heapq.heappop(heap)
+        chunk.append(index)
+        heapq.heappush(heap, (total + costs[index], i, chunk))
+    return [chunk for _, _, chunk in sorted(heap, reverse=True) if chunk]
@@ -2,6 +2,11 @@
 """
 Tools to deal with Word equations format
 
+- :class:`~pytexit.core.docx.WordVisitor` creates linear-format equations, to
+  be pasted in the Word equation tool
+- :class:`~pytexit.core.docx.OMMLVisitor` creates Office Math (OMML) equations,
+  that :class:`~pytexit.core.docx.DocxWriter` writes in a ``.docx`` document
+
 
 See Also
 --------
@@ -13,7 +18,11 @@ package although equations are not yet supported.
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import zipfile
+from xml.sax.saxutils import escape
+
 from .core import LatexVisitor
+from .mathml import MathMLVisitor
 
 
 class WordVisitor(LatexVisitor):
@@ -59,3 +68,163 @@ class WordVisitor(LatexVisitor):
             return r"{0}".format(func)
         else:
             return r"{0}({1})".format(func, args)
+
+
+class OMMLVisitor(MathMLVisitor):
+    """A variant of the MathMLVisitor to create Office Math (OMML) equations,
+    the native equation format of Word documents.
+
+    See Also
+    --------
+
+    :class:`~pytexit.core.docx.DocxWriter`, :func:`~pytexit.pytexit.py2docx`
+
+    """
+
+    namespace = "http://schemas.openxmlformats.org/officeDocument/2006/math"
+
+    # OMML elements
+    def math(self, expr):
+        """Root element"""
+        return '<m:oMath xmlns:m="{0}">{1}</m:oMath>'.format(self.namespace, expr)
+
+    def identifier(self, name):
+        return "<m:r><m:t>{0}</m:t></m:r>".format(escape(name))
+
+    def function_name(self, name):
+        """Name of a function (upright)"""
+        return '<m:r><m:rPr><m:sty m:val="p"/></m:rPr><m:t>{0}</m:t></m:r>'.format(
+            escape(name)
+        )
+
+    def number(self, value):
+        return self.identifier(value)
+
+    def symbol(self, op):
+        return self.identifier(op)
+
+    def text(self, expr):
+        return self.function_name(expr)
+
+    def row(self, *items):
+        return "".join(items)
+
+    def group(self, expr):
+        return expr
+
+    def brackets(self, expr):
+        return expr
+
+    def parenthesis(self, expr):
+        return "<m:d><m:e>{0}</m:e></m:d>".format(expr)
+
+    def power(self, expr, power):
+        return "<m:sSup><m:e>{0}</m:e><m:sup>{1}</m:sup></m:sSup>".format(expr, power)
+
+    def subscript(self, expr, sub):
+        return "<m:sSub><m:e>{0}</m:e><m:sub>{1}</m:sub></m:sSub>".format(expr, sub)
+
+    def subsup(self, expr, sub, sup):
+        return (
+            "<m:sSubSup><m:e>{0}</m:e><m:sub>{1}</m:sub><m:sup>{2}</m:sup></m:sSubSup>"
+        ).format(expr, sub, sup)
+
+    def underover(self, expr, under, over):
+        return (
+            "<m:limUpp><m:e><m:limLow><m:e>{0}</m:e><m:lim>{1}</m:lim></m:limLow>"
+            "</m:e><m:lim>{2}</m:lim></m:limUpp>"
+        ).format(expr, under, over)
+
+    def division(self, up, down):
+        return "<m:f><m:num>{0}</m:num><m:den>{1}</m:den></m:f>".format(up, down)
+
+    def sqrt(self, args):
+        return (
+            '<m:rad><m:radPr><m:degHide m:val="1"/></m:radPr><m:deg/>'
+            "<m:e>{0}</m:e></m:rad>"
+        ).format(args)
+
+
+class DocxWriter(object):
+    """Write OMML equations in a Word ``.docx`` document, one paragraph per
+    equation.
+
+    The document is streamed to the archive: memory use doesn't depend on the
+    number of equations. Only the standard library is used. Ex::
+
+        with DocxWriter("report.docx") as doc:
+            for expr in formulas:
+                doc.add(py2tex(expr, output="omml"))
+
+    Parameters
+    ----------
+
+    path: str or file-like object
+        output ``.docx`` file
+
+    See Also
+    --------
+
+    :func:`~pytexit.pytexit.py2docx`, :class:`~pytexit.core.docx.OMMLVisitor`
+
+    """
+
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" '
+        'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        "</Types>"
+    )
+
+    relationships = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+        "</Relationships>"
+    )
+
+    document_start = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+        'xmlns:m="http://schemas.openxmlformats.org/officeDocument/2006/math">'
+        "<w:body>"
+    )
+
+    document_end = "<w:sectPr/></w:body></w:document>"
+
+    def __init__(self, path):
+        self.archive = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        self.archive.writestr("[Content_Types].xml", self.content_types)
+        self.archive.writestr("_rels/.rels", self.relationships)
+        self.document = self.archive.open("word/document.xml", "w", force_zip64=True)
+        self._write(self.document_start)
+
+    def _write(self, s):
+        self.document.write(s.encode("utf-8"))
+
+    def add(self, equation, text=None):
+        """Add an OMML equation (as returned by ``py2tex(..., output='omml')``)
+        in a new paragraph, optionally preceded by a paragraph of ``text``"""
+        if text is not None:
+            self._write(
+                '<w:p><w:r><w:t xml:space="preserve">{0}</w:t></w:r></w:p>'.format(
+                    escape(text)
+                )
+            )
+        self._write("<w:p><m:oMathPara>{0}</m:oMathPara></w:p>".format(equation))
+
+    def close(self):
+        self._write(self.document_end)
+        self.document.close()
+        self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
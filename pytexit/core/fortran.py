@@ -1,16 +1,118 @@
 # -*- coding: utf-8 -*-
 """
 Tools to work with FORTRAN formula
+
+- :func:`~pytexit.core.fortran.for2py` converts a FORTRAN formula to Python
+- :func:`~pytexit.core.fortran.iter_statements` reads the statements of a
+  FORTRAN source file (fixed or free form), and
+  :func:`~pytexit.core.fortran.iter_assignments` its assignments. See
+  :func:`~pytexit.pytexit.forfile2tex` to convert them all.
+
 """
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import io
 import re
 
+# Regular expressions are compiled once, at import
+
+# Remove d0 with Python format (ex: 3.2d0 -> 3.2)
+_double0 = re.compile(r"(?<![\w.])(\d+\.?\d*|\.\d+)[dD]0(?!\d)")
+# Replace Fortran double (ex: 1.0d-2) with Python format (ex: 1.0e-2)
+_double = re.compile(r"(?<![\w.])(\d+\.?\d*|\.\d+)[dD]([-+]?\d+)")
+
+# Logical and relational operators
+fortran_operators = {
+    ".and.": " and ",
+    ".or.": " or ",
+    ".not.": " not ",
+    ".eq.": "==",
+    ".ne.": "!=",
+    ".lt.": "<",
+    ".le.": "<=",
+    ".gt.": ">",
+    ".ge.": ">=",
+    ".true.": "True",
+    ".false.": "False",
+    "/=": "!=",
+}
+_operators = re.compile(
+    "|".join(re.escape(op) for op in fortran_operators), flags=re.IGNORECASE
+)
+
+# Intrinsic functions: FORTRAN name -> Python name
+intrinsics = {
+    "exp": "exp",
+    "dexp": "exp",
+    "sqrt": "sqrt",
+    "dsqrt": "sqrt",
+    "log": "log",
+    "alog": "log",
+    "dlog": "log",
+    "log10": "log10",
+    "alog10": "log10",
+    "dlog10": "log10",
+    "abs": "abs",
+    "dabs": "abs",
+    "sin": "sin",
+    "dsin": "sin",
+    "cos": "cos",
+    "dcos": "cos",
+    "tan": "tan",
+    "dtan": "tan",
+    "asin": "arcsin",
+    "dasin": "arcsin",
+    "acos": "arccos",
+    "dacos": "arccos",
+    "atan": "arctan",
+    "datan": "arctan",
+    "sinh": "sinh",
+    "dsinh": "sinh",
+    "cosh": "cosh",
+    "dcosh": "cosh",
+    "tanh": "tanh",
+    "dtanh": "tanh",
+    "max": "max",
+    "amax1": "max",
+    "dmax1": "max",
+    "min": "min",
+    "amin1": "min",
+    "dmin1": "min",
+}
+_intrinsics = re.compile(
+    r"\b({0})\s*\(".format("|".join(intrinsics)), flags=re.IGNORECASE
+)
+
+# Assignment statement: (label) variable(indices) = expression
+_assignment = re.compile(
+    r"^\s*(?:\d+\s+)?([A-Za-z]\w*(?:\s*\([^()]*\))?)\s*=(?![=>])\s*(.+)$"
+)
+_element = re.compile(r"^([A-Za-z]\w*)\s*\(([^()]*)\)$")
+_index = re.compile(r"^\w+$")
+# Start and end of a program unit
+_unit_start = re.compile(
+    r"^\s*(?:[\w*()]+\s+)*(?:subroutine|function|program|module)\s+(\w+)",
+    flags=re.IGNORECASE,
+)
+# (not the end of a block: end if, end do, enddo...)
+_unit_end = re.compile(
+    r"^\s*end\s*(?:(?:subroutine|function|program|module)(?:\s+\w+)?)?\s*$",
+    flags=re.IGNORECASE,
+)
+# Start of a logical IF statement: (label) if (condition) action
+_if_start = re.compile(r"^\s*(?:\d+\s+)?if\s*\(", flags=re.IGNORECASE)
+
+# File extensions of fixed-form FORTRAN
+fixed_form_extensions = (".f", ".for", ".ftn", ".f77")
+
 
 def for2py(a):
     """Converts FORTRAN formula to Python Formula
 
+    Also converts logical and relational operators (``.and.``, ``.lt.``, etc.)
+    and the intrinsic functions (``dexp``, ``dsqrt``, ``dlog``, etc.)
+
     Examples
     --------
 
@@ -19,17 +121,218 @@ def for2py(a):
         py2tex(for2py($FORTRAN_FORMULA))
 
     """
+    # Logical and relational operators (first, so that numbers are separated
+    # from them: 1.eq.2d0 -> 1==2d0)
+    a = _operators.sub(lambda m: fortran_operators[m.group(0).lower()], a)
+
     # Remove d0 with Python format
-    regexp = re.compile(r"(\d*\.?\d+)[dD]0")
-    a = regexp.sub(r"\1", a)
+    a = _double0.sub(r"\1", a)
 
     # Replace Fortran double (ex: 1.0d-2) with Python format (ex: 1.0e-2)
-    regexp = re.compile(r"(\d*\.?\d+)[dD]([-+]?\d+)")
-    a = regexp.sub(r"\1e\2", a)
+    # Note: leading zeros of exponents are not valid Python (ex: 1d05)
+    a = _double.sub(lambda m: "{0}e{1}".format(m.group(1), int(m.group(2))), a)
+
+    # Intrinsic functions
+    a = _intrinsics.sub(lambda m: intrinsics[m.group(1).lower()] + "(", a)
 
     return a
 
 
+def split_logical_if(statement):
+    """Split a logical IF statement ``IF (condition) action``
+
+    Returns
+    -------
+
+    ``(condition, action)``, or ``None`` if ``statement`` is not a logical IF
+    (block IFs ``IF (condition) THEN`` are not)
+
+    """
+    m = _if_start.match(statement)
+    if m is None:
+        return None
+    depth = 1
+    for i in range(m.end(), len(statement)):
+        if statement[i] == "(":
+            depth += 1
+        elif statement[i] == ")":
+            depth -= 1
+            if depth == 0:
+                action = statement[i + 1 :].strip()
+                # Note: 'if(i) = 1' assigns an array named 'if'
+                if not action or action.lower() == "then" or action[0] == "=":
+                    return None
+                return statement[m.end() : i].strip(), action
+    return None
+
+
+def assignment2py(statement):
+    """Converts a FORTRAN assignment to a Python assignment
+
+    For a logical IF (``IF (c) x = ...``), its assignment is converted.
+
+    Array elements assigned on the left-hand side are written with the
+    subscript formalism of :meth:`~pytexit.core.core.LatexVisitor.build_tree`.
+    Ex::
+
+        k(i,2) = 1.0d-2*T  ->  k_i_2 = 1.0e-2*T
+
+    """
+    logical_if = split_logical_if(statement)
+    if logical_if is not None:
+        statement = logical_if[1]
+    m = _assignment.match(statement)
+    if m is None:
+        raise ValueError("Not an assignment: {0}".format(statement))
+    target, value = m.group(1), m.group(2)
+    element = _element.match(target)
+    if element:
+        indices = [i.strip() for i in element.group(2).split(",")]
+        if all(_index.match(i) for i in indices):
+            target = "_".join([element.group(1)] + indices)
+    return "{0} = {1}".format(target.strip(), for2py(value).strip())
+
+
+def strip_comment(line):
+    """Remove a ``!`` comment at the end of a line (outside strings)"""
+    if "!" not in line:
+        return line
+    quote = None
+    for i, c in enumerate(line):
+        if quote:
+            if c == quote:
+                quote = None
+        elif c in "'\"":
+            quote = c
+        elif c == "!":
+            return line[:i]
+    return line
+
+
+def iter_statements(lines, fixed_form=False):
+    """Read the statements of FORTRAN source lines, joining continuation
+    lines and removing comments. Lines are read one at a time: ``lines`` can
+    be an open file.
+
+    Parameters
+    ----------
+
+    lines: iterable of str
+        FORTRAN source
+
+    fixed_form: bool
+        if ``True``, fixed form (FORTRAN 77: comments in column 1,
+        continuation character in column 6). Else, free form (FORTRAN 90:
+        ``!`` comments, ``&`` continuation)
+
+    Returns
+    -------
+
+    yields ``(lineno, statement)``, with ``lineno`` the (1-based) line number
+    where the statement starts
+
+    """
+    statement, start = None, None
+    for lineno, line in enumerate(lines, 1):
+        line = line.rstrip("\r\n")
+        if fixed_form:
+            if not line.strip() or line[0] in "cC*!":
+                continue
+            text = strip_comment(line[6:72])
+            if len(line) > 5 and line[5] not in " 0":  # continuation line
+                if statement is not None:
+                    statement += text.strip()
+                continue
+            if statement is not None:
+                yield start, statement.strip()
+            statement, start = text, lineno
+        else:
+            text = strip_comment(line).strip()
+            if not text:
+                continue
+            if statement is not None:  # continuation of the previous line
+                if text.startswith("&"):  # continues the last token
+                    statement += text[1:].strip()
+                else:
+                    statement += " " + text
+            else:
+                statement, start = text, lineno
+            if statement.endswith("&"):
+                statement = statement[:-1]
+                continue
+            for s in statement.split(";"):
+                if s.strip():
+                    yield start, s.strip()
+            statement = None
+    if statement is not None:
+        yield start, statement.strip()
+
+
+def iter_assignments(lines, fixed_form=False):
+    """Find the assignments of FORTRAN source lines
+
+    Parameters
+    ----------
+
+    lines: iterable of str
+        FORTRAN source. See :func:`~pytexit.core.fortran.iter_statements`
+
+    fixed_form: bool
+        see :func:`~pytexit.core.fortran.iter_statements`
+
+    Returns
+    -------
+
+    yields ``(name, lineno, statement)`` tuples, with ``name`` the name of the
+    subroutine / function / program the assignment is defined in (``''``
+    outside of them). Logical IFs that assign a variable (``IF (c) x = ...``)
+    are yielded too, see :func:`~pytexit.core.fortran.split_logical_if`.
+
+    """
+    name = ""
+    for lineno, statement in iter_statements(lines, fixed_form=fixed_form):
+        if _unit_end.match(statement):
+            name = ""
+            continue
+        unit = _unit_start.match(statement)
+        if unit:
+            name = unit.group(1)
+            continue
+        logical_if = split_logical_if(statement)
+        if logical_if is not None:
+            if _assignment.match(logical_if[1]):
+                yield name, lineno, statement
+        elif _assignment.match(statement):
+            yield name, lineno, statement
+
+
+def read_assignments(path, fixed_form=None):
+    """Find the assignments of a FORTRAN source file
+
+    Parameters
+    ----------
+
+    path: str
+        ``.f`` / ``.f90`` file
+
+    fixed_form: bool, or ``None``
+        if ``None``, guessed from the file extension. See
+        :func:`~pytexit.core.fortran.iter_statements`
+
+    Returns
+    -------
+
+    yields ``(name, lineno, statement)``. See
+    :func:`~pytexit.core.fortran.iter_assignments`
+
+    """
+    if fixed_form is None:
+        fixed_form = path.lower().endswith(fixed_form_extensions)
+    with io.open(path, encoding="utf-8", errors="replace") as f:
+        for assignment in iter_assignments(f, fixed_form=fixed_form):
+            yield assignment
+
+
 if __name__ == "__main__":
 
     from pytexit.test.test_fortran import test_for2py, test_for2tex
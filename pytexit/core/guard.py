@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-parse guard: reject pathological formulas before they are parsed
+
+:func:`ast.parse` can take a lot of time, memory or stack on very long or
+deeply nested input. A :class:`~pytexit.core.guard.FormulaGuard` scans the
+formula with a single regular expression, and checks its length, bracket
+depth, number of tokens, keywords and names. It returns a
+:class:`~pytexit.core.guard.Verdict`::
+
+    from pytexit.core.guard import FormulaGuard
+
+    guard = FormulaGuard(max_length=2000, max_depth=20)
+    verdict = guard.check("x = (((a)))")
+    if not verdict:
+        print(verdict.reason, verdict.position)
+
+or, with :func:`~pytexit.pytexit.py2tex`::
+
+    py2tex(expr, guard=guard)   # raises FormulaRejected
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import keyword
+import re
+
+# Tokens of Python formulas. Compiled once, at import
+_token = re.compile(
+    r"""
+     (?P<continuation>\\\r?\n)
+    |(?P<space>\s+)
+    |(?P<number>(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?[jJ]?)
+    |(?P<string>[rRbBuUfF]{0,2}(?:'[^'\\\n]*(?:\\.[^'\\\n]*)*'|"[^"\\\n]*(?:\\.[^"\\\n]*)*"))
+    |(?P<name>[^\W\d]\w*)
+    |(?P<open>[(\[{])
+    |(?P<close>[)\]}])
+    |(?P<operator>\*\*|//|<<|>>|[<>=!]=|[-+*/%@&|^~<>=.,:;÷])
+    """,
+    re.VERBOSE | re.UNICODE,
+)
+
+_closing = {"(": ")", "[": "]", "{": "}"}
+
+# Keywords that can appear in formulas (boolean operators, comprehensions,
+# conditional expressions, constants)
+formula_keywords = {"and", "or", "not", "in", "is", "for", "if", "else"}
+formula_keywords |= {"True", "False", "None"}
+
+
+class FormulaRejected(ValueError):
+    """Raised by :func:`~pytexit.pytexit.py2tex` when a formula is rejected
+    by its :class:`~pytexit.core.guard.FormulaGuard`
+
+    Attributes
+    ----------
+
+    verdict: :class:`~pytexit.core.guard.Verdict`
+
+    """
+
+    def __init__(self, verdict):
+        self.verdict = verdict
+        super(FormulaRejected, self).__init__(
+            "Formula rejected: {0} (at character {1})".format(
+                verdict.reason, verdict.position
+            )
+        )
+
+
+class Verdict(object):
+    """Result of :meth:`~pytexit.core.guard.FormulaGuard.check`. True if the
+    formula is accepted
+
+    Attributes
+    ----------
+
+    ok: bool
+
+    reason: str, or ``None``
+        why the formula is rejected
+
+    position: int, or ``None``
+        where the formula is rejected (index of the character)
+
+    length, tokens, depth: int
+        length, number of tokens and maximum bracket depth of the formula
+        (of the part scanned, if rejected)
+
+    """
+
+    __slots__ = ("ok", "reason", "position", "length", "tokens", "depth")
+
+    def __init__(self, ok, reason=None, position=None, length=0, tokens=0, depth=0):
+        self.ok = ok
+        self.reason = reason
+        self.position = position
+        self.length = length
+        self.tokens = tokens
+        self.depth = depth
+
+    def __bool__(self):
+        return self.ok
+
+    __nonzero__ = __bool__  # Python 2
+
+    def __repr__(self):
+        if self.ok:
+            return "<Verdict ok: {0} characters, {1} tokens, depth {2}>".format(
+                self.length, self.tokens, self.depth
+            )
+        return "<Verdict rejected: {0} (at character {1})>".format(
+            self.reason, self.position
+        )
+
+
+class FormulaGuard(object):
+    """Checks formulas before they are parsed
+
+    Parameters
+    ----------
+
+    max_length: int
+        maximum number of characters
+
+    max_depth: int
+        maximum nesting of brackets
+
+    max_tokens: int
+        maximum number of tokens (names, numbers, operators, brackets)
+
+    allowed_names: set of str, or ``None``
+        if given, the only names (identifiers, attributes, functions) that
+        can be used
+
+    allowed_keywords: set of str
+        Python keywords that can be used. Default
+        :data:`~pytexit.core.guard.formula_keywords`: no ``lambda``,
+        ``import``, ``yield``...
+
+    allow_strings: bool
+        if ``False``, strings are rejected
+
+    allow_statements: bool
+        if ``False``, several statements (``;``, or new lines outside of
+        brackets, unless continued with a backslash) are rejected
+
+    Notes
+    -----
+
+    Only the characters of Python formulas are accepted (and ``÷``, see
+    :func:`~pytexit.core.core.preprocessing`): other symbols, such as ``×``
+    or ``·``, are rejected as unexpected characters, as the parser would do.
+
+    """
+
+    def __init__(
+        self,
+        max_length=5000,
+        max_depth=50,
+        max_tokens=2000,
+        allowed_names=None,
+        allowed_keywords=formula_keywords,
+        allow_strings=False,
+        allow_statements=False,
+    ):
+        self.max_length = max_length
+        self.max_depth = max_depth
+        self.max_tokens = max_tokens
+        self.allowed_names = allowed_names
+        self.allowed_keywords = allowed_keywords
+        self.allow_strings = allow_strings
+        self.allow_statements = allow_statements
+
+    def check(self, expr):
+        """Check a formula
+
+        Returns
+        -------
+
+        :class:`~pytexit.core.guard.Verdict`
+
+        """
+        length = len(expr)
+        if length > self.max_length:
+            return Verdict(
+                False,
+                "too long: {0} characters (max_length={1})".format(
+                    length, self.max_length
+                ),
+                self.max_length,
+                length,
+            )
+
+        tokens, depth, max_depth = 0, 0, 0
+        stack = []
+        pos = 0
+        newline = False  # a new line, outside brackets: a new statement
+        match = _token.match
+        while pos < length:
+            m = match(expr, pos)
+            if m is None:
+                return Verdict(
+                    False,
+                    "unexpected character {0!r}".format(expr[pos]),
+                    pos,
+                    length,
+                    tokens,
+                    max_depth,
+                )
+            kind = m.lastgroup
+            if kind == "continuation":  # '\\' at the end of a line
+                pass
+            elif kind == "space":
+                newline = newline or (depth == 0 and tokens and "\n" in m.group())
+            else:
+                tokens += 1
+                reason = None
+                if newline and not self.allow_statements:
+                    reason = "several statements are not allowed"
+                elif tokens > self.max_tokens:
+                    reason = "too many tokens (max_tokens={0})".format(self.max_tokens)
+                elif kind == "open":
+                    stack.append(_closing[m.group()])
+                    depth += 1
+                    if depth > max_depth:
+                        max_depth = depth
+                        if depth > self.max_depth:
+                            reason = "too deeply nested (max_depth={0})".format(
+                                self.max_depth
+                            )
+                elif kind == "close":
+                    if not stack or stack.pop() != m.group():
+                        reason = "unbalanced {0!r}".format(m.group())
+                    depth -= 1
+                elif kind == "name":
+                    name = m.group()
+                    if keyword.iskeyword(name) or name in formula_keywords:
+                        if name not in self.allowed_keywords:
+                            reason = "keyword not allowed: {0}".format(name)
+                    elif (
+                        self.allowed_names is not None
+                        and name not in self.allowed_names
+                    ):
+                        reason = "name not allowed: {0}".format(name)
+                elif kind == "string" and not self.allow_strings:
+                    reason = "strings are not allowed"
+                elif m.group() == ";" and not self.allow_statements:
+                    reason = "several statements are not allowed"
+                if reason is not None:
+                    return Verdict(False, reason, pos, length, tokens, max_depth)
+            pos = m.end()
+
+        if stack:
+            return Verdict(False, "unclosed bracket", length, length, tokens, max_depth)
+        return Verdict(True, None, None, length, tokens, max_depth)
@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+"""
+Tools to output Presentation MathML
+
+The :class:`~pytexit.core.mathml.MathMLVisitor` renders the formula directly
+from the Python syntax tree, so that web pages can embed native MathML without
+any client-side typesetting.
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import ast
+import re
+from xml.sax.saxutils import escape
+
+from six.moves import map, range
+
+from .core import LatexVisitor, fracs, inverse_functions, prefix_functions
+
+# LaTeX symbols returned by convert_symbols(), and their Unicode equivalent
+symbols = {
+    "alpha": "α",
+    "beta": "β",
+    "gamma": "γ",
+    "delta": "δ",
+    "epsilon": "ϵ",
+    "zeta": "ζ",
+    "eta": "η",
+    "theta": "θ",
+    "iota": "ι",
+    "kappa": "κ",
+    "lambda": "λ",
+    "mu": "μ",
+    "nu": "ν",
+    "xi": "ξ",
+    "pi": "π",
+    "rho": "ρ",
+    "sigma": "σ",
+    "tau": "τ",
+    "phi": "ϕ",
+    "chi": "χ",
+    "psi": "ψ",
+    "omega": "ω",
+    "Gamma": "Γ",
+    "Delta": "Δ",
+    "Theta": "Θ",
+    "Lambda": "Λ",
+    "Xi": "Ξ",
+    "Pi": "Π",
+    "Sigma": "Σ",
+    "Upsilon": "Υ",
+    "Phi": "Φ",
+    "Psi": "Ψ",
+    "Omega": "Ω",
+    "infty": "∞",
+}
+
+# Multiplication operators (see the ``tex_multiplier`` parameter of py2tex)
+multipliers = {
+    r"\times": "×",
+    r"{\times}": "×",
+    r"\cdot": "·",
+    r"{\cdot}": "·",
+}
+
+_symbol = re.compile(r"\\([a-zA-Z]+) ?")
+
+
+class MathMLVisitor(LatexVisitor):
+    """A variant of the LatexVisitor to create Presentation MathML
+
+    Precedence rules, identifier names (see
+    :meth:`~pytexit.core.core.LatexVisitor.build_tree`) and function names
+    are the same as in the LaTeX output. All elements are created with the
+    builder methods (:meth:`identifier`, :meth:`number`, :meth:`symbol`,
+    :meth:`row`, :meth:`power`, etc.) that can be overwritten by other XML
+    backends.
+
+    See Also
+    --------
+
+    :class:`~pytexit.core.core.LatexVisitor`
+
+    """
+
+    namespace = "http://www.w3.org/1998/Math/MathML"
+
+    # MathML elements
+    def math(self, expr):
+        """Root element"""
+        return '<math xmlns="{0}" display="block">{1}</math>'.format(
+            self.namespace, expr
+        )
+
+    def identifier(self, name):
+        return "<mi>{0}</mi>".format(escape(name))
+
+    def function_name(self, name):
+        """Name of a function (upright)"""
+        return self.identifier(name)
+
+    def number(self, value):
+        return "<mn>{0}</mn>".format(escape(value))
+
+    def symbol(self, op):
+        return "<mo>{0}</mo>".format(escape(op))
+
+    def text(self, expr):
+        return "<mtext>{0}</mtext>".format(escape(expr))
+
+    def row(self, *items):
+        return "<mrow>{0}</mrow>".format("".join(items))
+
+    def group(self, expr):
+        return self.row(expr)
+
+    def brackets(self, expr):
+        return self.row(expr)
+
+    def parenthesis(self, expr):
+        return self.row(self.symbol("("), expr, self.symbol(")"))
+
+    def power(self, expr, power):
+        return "<msup>{0}{1}</msup>".format(self.group(expr), self.group(power))
+
+    def subscript(self, expr, sub):
+        return "<msub>{0}{1}</msub>".format(self.group(expr), self.group(sub))
+
+    def subsup(self, expr, sub, sup):
+        return "<msubsup>{0}{1}{2}</msubsup>".format(
+            self.group(expr), self.group(sub), self.group(sup)
+        )
+
+    def underover(self, expr, under, over):
+        return "<munderover>{0}{1}{2}</munderover>".format(
+            self.group(expr), self.group(under), self.group(over)
+        )
+
+    def division(self, up, down):
+        return "<mfrac>{0}{1}</mfrac>".format(self.group(up), self.group(down))
+
+    def sqrt(self, args):
+        return "<msqrt>{0}</msqrt>".format(args)
+
+    def operator(self, func, args=None):
+        if args is None:
+            return self.function_name(func)
+        else:
+            return self.row(self.function_name(func), self.parenthesis(args))
+
+    def join(self, items):
+        """Comma separated list of items"""
+        return self.symbol(",").join(items)
+
+    # Identifiers
+    def convert_symbols(self, expr):
+        m = super(MathMLVisitor, self).convert_symbols(expr)
+        return _symbol.sub(lambda match: symbols.get(match.group(1), match.group(0)), m)
+
+    def read_tree(self, t):
+        """Write a MathML identifier"""
+        r = self.identifier(t["val"])
+        low = self.join([self.read_tree(tc) for tc in t["low"]])
+        up = self.join([self.read_tree(tc) for tc in t["up"]])
+        if low and up:
+            return self.subsup(r, low, up)
+        elif low:
+            return self.subscript(r, low)
+        elif up:
+            return self.power(r, up)
+        return r
+
+    # Operators
+    def visit_Sub(self, n):
+        return self.symbol("-")
+
+    def visit_Add(self, n):
+        return self.symbol("+")
+
+    def visit_Mult(self, n):
+        return self.symbol("\u2062")  # invisible times
+
+    def visit_Mod(self, n):
+        return self.symbol("mod")
+
+    def visit_Not(self, n):
+        return self.symbol("¬")
+
+    def visit_UAdd(self, n):
+        return self.symbol("+")
+
+    def visit_And(self, n):
+        return self.symbol("∧")
+
+    def visit_Or(self, n):
+        return self.symbol("∨")
+
+    def visit_USub(self, n):
+        return self.symbol("-")
+
+    def visit_Constant(self, n):
+        if self.simplify_fractions:
+            if any([n.value == key for key in fracs.keys()]):
+                sign, up, down = fracs[n.value]
+                frac = self.division(self.number(str(up)), self.number(str(down)))
+                return self.symbol(sign) + frac if sign else frac
+        if n.value == 2146136747:  # Magic number to handle ÷ symbol
+            return self.symbol("÷")
+        if isinstance(n.value, str):
+            return self.text(n.value)
+        if self.looks_like_int(n.value):
+            return self.number("%d" % n.value)
+        return self.number(str(n.value))
+
+    def is_number(self, n):
+        """Returns ``True`` if node ``n`` is rendered as a number (the
+        equivalent of ``looks_like_float`` in LatexVisitor.visit_BinOp)"""
+        if isinstance(n, ast.Constant):
+            return isinstance(n.value, (int, float)) and not isinstance(n.value, bool)
+        if isinstance(n, ast.UnaryOp) and isinstance(n.op, (ast.USub, ast.UAdd)):
+            return self.is_number(n.operand)
+        if isinstance(n, ast.BinOp) and isinstance(n.op, ast.Pow):
+            return self.is_number(n.left)
+        return False
+
+    def starts_with_number(self, n):
+        """Returns ``True`` if the rendering of node ``n`` starts with a number"""
+        if isinstance(n, ast.Constant):
+            return self.is_number(n)
+        if isinstance(n, ast.UnaryOp):
+            return self.starts_with_number(n.operand)
+        if isinstance(n, ast.BinOp) and not isinstance(n.op, (ast.Div, ast.FloorDiv)):
+            return self.prec(n.op) <= self.prec(n.left) and self.starts_with_number(
+                n.left
+            )
+        return False
+
+    def visit_UnaryOp(self, n):
+        # Note: Unary operator followed by a power needs no parenthesis
+        if self.prec(n.op) > self.prec(n.operand) and not (
+            hasattr(n.operand, "op") and isinstance(n.operand.op, ast.Pow)
+        ):
+            return self.row(self.visit(n.op), self.parenthesis(self.visit(n.operand)))
+        else:
+            return self.row(self.visit(n.op), self.visit(n.operand))
+
+    def visit_BinOp(self, n):
+        if self.prec(n.op) > self.prec(n.left):
+            left = self.parenthesis(self.visit(n.left))
+        elif isinstance(n.op, ast.Pow) and self.prec(n.op) == self.prec(n.left):
+            # Special case for power, which needs parentheses when combined to the left
+            left = self.parenthesis(self.visit(n.left))
+        else:
+            left = self.visit(n.left)
+
+        # Special binary operators
+        if isinstance(n.op, ast.Div):
+            return self.division(self.visit(n.left), self.visit(n.right))
+        elif isinstance(n.op, ast.FloorDiv):
+            return self.row(
+                self.symbol("⌊"),
+                self.division(self.visit(n.left), self.visit(n.right)),
+                self.symbol("⌋"),
+            )
+        elif isinstance(n.op, ast.Pow):
+            return self.power(left, self.visit(n.right))
+
+        if self.prec(n.op) > self.prec(n.right):
+            right = self.parenthesis(self.visit(n.right))
+        elif isinstance(n.op, ast.Sub) and self.prec(n.op) == self.prec(n.right):
+            # Keep parenthesis around subtracted term, for instance: a-(b-c)
+            right = self.parenthesis(self.visit(n.right))
+        else:
+            right = self.visit(n.right)
+
+        if isinstance(n.op, ast.Mult):
+            left_is_float = self.is_number(n.left)
+            right_is_float = self.is_number(n.right)
+
+            # Get multiplication operator. Force x if floats are involved
+            if left_is_float or right_is_float:
+                operator = self.symbol(
+                    multipliers.get(self.tex_multiplier, self.tex_multiplier)
+                )
+            else:  # get standard Mult operator (see visit_Mult)
+                operator = self.visit(n.op)
+
+            if self.simplify_multipliers:
+                # ... simplify (a*2 --> 2a)
+                if right_is_float and not self.starts_with_number(n.left):
+                    return self.row(right, left)
+                # ... simplify (2*a --> 2a)
+                elif left_is_float and not self.starts_with_number(n.right):
+                    return self.row(left, right)
+            return self.row(left, operator, right)
+        else:
+            return self.row(left, self.visit(n.op), right)
+
+    def visit_Assign(self, n):
+        return self.row(self.visit(n.targets[0]), self.symbol("="), self.visit(n.value))
+
+    def visit_Compare(self, n):
+        ops = {
+            ast.Lt: "<",
+            ast.LtE: "≤",
+            ast.Gt: ">",
+            ast.GtE: "≥",
+            ast.Eq: "=",
+            ast.NotEq: "≠",
+        }
+        items = [self.visit(n.left)]
+        for op, comparator in zip(n.ops, n.comparators):
+            if op.__class__ not in ops:
+                raise ValueError("Unknown comparator", op.__class__)
+            items += [self.symbol(ops[op.__class__]), self.visit(comparator)]
+        return self.row(*items)
+
+    def visit_ListComp(self, n, kwout=False):
+        """Analyse a list comprehension. See
+        :meth:`~pytexit.core.core.LatexVisitor.visit_ListComp`"""
+
+        kw = {}
+        comp = n.generators[0]
+        kw["iterator"] = self.visit(comp.target)
+        range_args = comp.iter.args
+        if len(range_args) > 1:
+            kw["min"] = self.visit(range_args[0])
+            end = range_args[1]
+        else:
+            kw["min"] = self.number("0")
+            end = range_args[0]
+        # Remove 1 for range max
+        if isinstance(end, ast.Constant) and isinstance(end.value, int):
+            kw["max"] = self.number(str(end.value - 1))
+        elif (
+            isinstance(end, ast.BinOp)
+            and isinstance(end.op, ast.Add)
+            and isinstance(end.right, ast.Constant)
+            and end.right.value == 1
+        ):
+            # write 'sum([... range(N+1)])' as (sum^N)
+            kw["max"] = self.visit(end.left)
+        else:
+            # write 'sum([... range(N)])' as (sum^N-1)
+            kw["max"] = self.row(self.visit(end), self.symbol("-"), self.number("1"))
+        kw["content"] = self.visit(n.elt)
+
+        args = self.row(
+            kw["content"],
+            self.symbol(","),
+            kw["iterator"],
+            self.symbol("="),
+            kw["min"],
+            self.symbol(".."),
+            kw["max"],
+        )
+
+        if kwout:
+            return args, kw
+        else:
+            return args
+
+    def visit_Call(self, n):
+        """Same functions as :meth:`~pytexit.core.core.LatexVisitor.visit_Call`"""
+        if isinstance(n.func, ast.Name):
+            func = n.func.id
+        else:
+            func = None
+
+        # Deal with list comprehension and complex formats
+        blist = len(n.args) > 0 and isinstance(n.args[0], ast.ListComp)
+        if blist:
+            args, kwargs = self.visit_ListComp(n.args[0], kwout=True)
+        else:
+            args = self.join(list(map(self.visit, n.args)))
+
+        # Usual math functions
+        if func in prefix_functions:
+            return self.row(
+                self.function_name(prefix_functions[func].lstrip("\\")),
+                self.parenthesis(args),
+            )
+        elif func in inverse_functions:
+            return self.row(
+                self.power(
+                    self.function_name(inverse_functions[func].lstrip("\\")),
+                    self.row(self.symbol("-"), self.number("1")),
+                ),
+                self.parenthesis(args),
+            )
+        elif func == "sqrt":
+            return self.sqrt(args)
+        elif func in ["power", "pow"]:
+            base = self.visit(n.args[0])
+            if self.prec(n.args[0]) < self.precdic["Pow"]:
+                base = self.parenthesis(base)
+            return self.power(base, self.visit(n.args[1]))
+        elif func in ["divide"]:
+            return self.division(self.visit(n.args[0]), self.visit(n.args[1]))
+        elif func in ["abs", "fabs"]:
+            return self.row(self.symbol("|"), args, self.symbol("|"))
+        elif func in ["exp"]:
+            return self.power(self.identifier("e"), args)
+
+        # Additional functions (convention names, not in numpy library)
+        elif func in ["kronecher", "kron"]:
+            return self.subscript(self.identifier("δ"), args)
+
+        # Integrals
+        elif func in ["quad"]:
+            (f, a, b) = list(map(self.visit, n.args))
+            u = self.identifier(self.dummy_var)
+            return self.row(
+                self.subsup(self.symbol("∫"), a, b),
+                f,
+                self.parenthesis(u),
+                self.identifier("d"),
+                u,
+            )
+
+        # Sum
+        elif func in ["sum"]:
+            if blist:
+                return self.row(
+                    self.underover(
+                        self.symbol("∑"),
+                        self.row(kwargs["iterator"], self.symbol("="), kwargs["min"]),
+                        kwargs["max"],
+                    ),
+                    kwargs["content"],
+                )
+            else:
+                return self.row(self.symbol("∑"), args)
+
+        elif func is None:
+            return self.row(self.visit(n.func), self.parenthesis(args))
+        else:
+            return self.operator(func, args)
+
+    # Default
+    def generic_visit(self, n):
+        return self.text(super(MathMLVisitor, self).generic_visit(n))
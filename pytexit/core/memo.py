@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Memoization of the rendered subexpressions of a batch of formulas
+
+Formulas of a batch often share large subtrees (ex: Arrhenius factors,
+``sqrt(2*pi*k*T_e/m_e)``). With a :class:`~pytexit.core.memo.SubexpressionMemo`,
+each distinct subtree is rendered once::
+
+    from pytexit import py2tex
+    from pytexit.core.memo import SubexpressionMemo
+
+    memo = SubexpressionMemo()
+    for expr in exprs:
+        py2tex(expr, memo=memo)
+    memo.stats()
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import ast
+import threading
+from collections import OrderedDict
+
+
+class SubexpressionMemo(object):
+    """Rendered subexpressions, keyed by the structure of their AST subtree
+    and by the rendering context (backend and options of the visitor)
+
+    Subtrees are identified by structural keys: two subtrees have the same
+    key if they have the same node types, fields and children, wherever they
+    come from. Keys are computed bottom-up, once per node.
+
+    A memo can be shared by visitors running in different threads.
+
+    Parameters
+    ----------
+
+    maxsize: int
+        maximum number of rendered subexpressions kept. The least recently
+        used are evicted first.
+
+    See Also
+    --------
+
+    :meth:`~pytexit.core.core.LatexVisitor.visit`
+
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.rendered = OrderedDict()
+        # node structure -> structural key (an int). Keys are never reused,
+        # so that keys computed before a collect() can't match new structures
+        self.structures = {}
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, node, keys):
+        """Structural key of ``node``
+
+        Parameters
+        ----------
+
+        node: ast.AST
+
+        keys: dict
+            keys already computed for the nodes of the current tree,
+            ``{id(node): key}``. Valid as long as the tree is alive.
+
+        """
+        k = keys.get(id(node))
+        if k is None:
+            fields = []
+            for _, value in ast.iter_fields(node):
+                if isinstance(value, ast.AST):
+                    value = self.key(value, keys)
+                elif isinstance(value, list):
+                    value = tuple(
+                        self.key(v, keys) if isinstance(v, ast.AST) else v
+                        for v in value
+                    )
+                else:
+                    # 1, 1.0 and True are equal but are not rendered the same
+                    value = (type(value), value)
+                fields.append(value)
+            structure = (node.__class__, tuple(fields))
+            with self._lock:
+                k = self.structures.get(structure)
+                if k is None:
+                    k = self.structures[structure] = self._next_key
+                    self._next_key += 1
+            keys[id(node)] = k
+        return k
+
+    def get(self, context, key):
+        """Returns the rendered subexpression, or ``None``"""
+        with self._lock:
+            try:
+                s = self.rendered.pop((context, key))
+            except KeyError:
+                self.misses += 1
+                return None
+            self.rendered[(context, key)] = s  # most recently used
+            self.hits += 1
+        return s
+
+    def set(self, context, key, s):
+        with self._lock:
+            self.rendered[(context, key)] = s
+            if len(self.rendered) > self.maxsize:
+                self.rendered.popitem(last=False)
+                self.evictions += 1
+
+    def collect(self):
+        """Forget the structural keys if they outgrow the rendered
+        subexpressions. Called between formulas; keys already computed by
+        other threads stay valid (keys are never reused)"""
+        with self._lock:
+            if len(self.structures) > 4 * self.maxsize:
+                self.structures.clear()
+                self.rendered.clear()
+
+    def clear(self):
+        """Empty the memo and reset the statistics"""
+        with self._lock:
+            self.rendered.clear()
+            self.structures.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Returns a dictionary with the number of ``hits``, ``misses`` and
+        ``evictions``, the ``hit_rate``, and the ``size`` of the memo"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self.rendered),
+        }
+
+    def __len__(self):
+        return len(self.rendered)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Find the formulas of a Python source file
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import ast
+
+# Nodes that can be part of a formula
+formula_nodes = (
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Call,
+    ast.Name,
+    ast.Constant,
+    ast.Compare,
+    ast.ListComp,
+    ast.comprehension,
+    ast.expr_context,
+    ast.operator,
+    ast.unaryop,
+    ast.cmpop,
+)
+
+
+def is_formula(node):
+    """Returns ``True`` if ``node`` is a mathematical expression: numbers,
+    names, operators and function calls only"""
+    for n in ast.walk(node):
+        if not isinstance(n, formula_nodes):
+            return False
+        if isinstance(n, ast.Constant) and (
+            isinstance(n.value, bool) or not isinstance(n.value, (int, float))
+        ):
+            return False
+        if isinstance(n, ast.Call) and (n.keywords or not isinstance(n.func, ast.Name)):
+            return False
+    return True
+
+
+class FormulaFinder(ast.NodeVisitor):
+    """Collect the formulas of a module: assignments, ``return`` expressions
+    and comparisons, with the qualified name of the function (or class) they
+    are defined in.
+
+    Formulas are stored in :attr:`formulas` as ``(name, kind, node)`` tuples,
+    where kind is one of ``'assign'``, ``'return'``, ``'compare'``. Module
+    level formulas are named ``'<module>'``.
+
+    With ``nested=False``, the bodies of functions and classes are skipped:
+    visit the statements of a function to get its own formulas only.
+
+    Examples
+    --------
+
+    ::
+
+        finder = FormulaFinder()
+        finder.visit(ast.parse(source))
+        finder.formulas
+
+    """
+
+    def __init__(self, nested=True):
+        super(FormulaFinder, self).__init__()
+        self.nested = nested
+        self.scope = []
+        self.formulas = []
+
+    def add(self, kind, node):
+        self.formulas.append((".".join(self.scope) or "<module>", kind, node))
+
+    def visit_scope(self, n):
+        if not self.nested:
+            return
+        self.scope.append(n.name)
+        self.generic_visit(n)
+        self.scope.pop()
+
+    visit_FunctionDef = visit_scope
+    visit_AsyncFunctionDef = visit_scope
+    visit_ClassDef = visit_scope
+
+    def visit_Lambda(self, n):
+        pass
+
+    def visit_Assign(self, n):
+        if (
+            len(n.targets) == 1
+            and isinstance(n.targets[0], ast.Name)
+            and is_formula(n.value)
+        ):
+            self.add("assign", n)
+
+    def visit_AnnAssign(self, n):
+        if n.value is not None and isinstance(n.target, ast.Name):
+            self.visit_Assign(
+                ast.copy_location(ast.Assign(targets=[n.target], value=n.value), n)
+            )
+
+    def visit_Return(self, n):
+        # Note: returning a single variable is not a formula
+        if (
+            n.value is not None
+            and not isinstance(n.value, ast.Name)
+            and is_formula(n.value)
+        ):
+            self.add("return", n.value)
+
+    def visit_Compare(self, n):
+        if is_formula(n):
+            self.add("compare", n)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+``%%py2tex`` cell magic for IPython / Jupyter
+
+Load it in a notebook with::
+
+    %load_ext pytexit
+
+then render all the formulas of a cell as one aligned block::
+
+    %%py2tex
+    k = A*T**n
+    r = k*exp(-E_a/(R*T))
+
+Options: ``-x`` / ``--exec`` also runs the cell, ``--output compact``
+changes the LaTeX output, ``-p`` / ``--print`` also prints the LaTeX source.
+
+Each statement is cached: when the cell runs again, only the statements that
+changed are converted.
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import ast
+import shlex
+from collections import OrderedDict
+
+from .cache import canonical
+from .pytexit import py2tex, tex_outputs
+
+
+def align(s):
+    """Put the alignment mark ``&`` before the first ``=`` of a converted
+    formula (outside of groups and parenthesis)"""
+    depth = 0
+    for i, c in enumerate(s):
+        if c in "{(":
+            depth += 1
+        elif c in "})":
+            depth -= 1
+        elif c == "=" and depth == 0 and s[i - 1 : i] not in ("<", ">", "!"):
+            return s[:i] + "&" + s[i:]
+    return "&" + s
+
+
+class CellRenderer(object):
+    """Render the formulas of a cell as a LaTeX ``aligned`` block, converting
+    each distinct statement once
+
+    Parameters
+    ----------
+
+    maxsize: int
+        maximum number of statements kept in the cache. The least recently
+        used are evicted first.
+
+    Other Parameters
+    ----------------
+
+    kwargs: dict
+        default options of :func:`~pytexit.pytexit.py2tex`
+
+    """
+
+    def __init__(self, maxsize=10000, **kwargs):
+        self.maxsize = maxsize
+        self.options = kwargs
+        self.cache = OrderedDict()
+        self.rendered = 0  # statements converted by the last call
+
+    def statements(self, cell):
+        """Formulas of a cell: assignments and expressions (except strings).
+        Yields ``(node, source)``"""
+        tree = ast.parse(cell)
+        for node in tree.body:
+            if isinstance(node, ast.Assign):
+                yield node, ast.get_source_segment(cell, node)
+            elif isinstance(node, ast.Expr) and not (
+                isinstance(node.value, ast.Constant)
+                and isinstance(node.value.value, str)
+            ):
+                yield node, ast.get_source_segment(cell, node)
+
+    def convert(self, source, **options):
+        """Converted line of a statement, from the cache if possible"""
+        key = (canonical(source), tuple(sorted(options.items())))
+        try:
+            line = self.cache.pop(key)
+        except KeyError:
+            s = py2tex(
+                source,
+                print_latex=False,
+                print_formula=False,
+                tex_enclosure="",
+                **options
+            )
+            line = align(s) if "=" in s else "&" + s
+            self.rendered += 1
+        self.cache[key] = line  # most recently used
+        if len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+        return line
+
+    def __call__(self, cell, **kwargs):
+        """Returns the LaTeX ``aligned`` block of the formulas of ``cell``
+
+        Parameters
+        ----------
+
+        cell: str
+            Python code
+
+        Other Parameters
+        ----------------
+
+        kwargs: dict
+            options of :func:`~pytexit.pytexit.py2tex`
+
+        """
+        options = dict(self.options, **kwargs)
+        if options.get("output", "tex") not in tex_outputs:
+            raise ValueError(
+                "Only LaTeX outputs can be aligned: {0}".format(tex_outputs)
+            )
+        self.rendered = 0
+        lines = [self.convert(source, **options) for _, source in self.statements(cell)]
+        return "\\begin{aligned}\n" + "\\\\\n".join(lines) + "\n\\end{aligned}"
+
+
+def magic_parser():
+    parser = argparse.ArgumentParser(prog="%%py2tex", add_help=False)
+    parser.add_argument("-x", "--exec", action="store_true", dest="execute")
+    parser.add_argument("-p", "--print", action="store_true", dest="print_latex")
+    parser.add_argument("--output", choices=tex_outputs, default="tex")
+    return parser
+
+
+def load_ipython_extension(ipython):
+    """Register the ``%%py2tex`` cell magic (``%load_ext pytexit``)"""
+    from IPython.display import Latex
+
+    renderer = CellRenderer()
+    parser = magic_parser()
+
+    def py2tex_magic(line, cell):
+        """Render the formulas of the cell as one aligned LaTeX block
+
+        Usage: ``%%py2tex [-x] [-p] [--output {tex,compact}]``
+
+        -x, --exec: also run the cell. -p, --print: also print the LaTeX
+        source.
+        """
+        args = parser.parse_args(shlex.split(line))
+        if args.execute:
+            ipython.run_cell(cell)
+        s = renderer(cell, output=args.output)
+        if args.print_latex:
+            print(s)
+        return Latex("$$" + s + "$$")
+
+    ipython.register_magic_function(
+        py2tex_magic, magic_kind="cell", magic_name="py2tex"
+    )
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Memory report of conversions and caches, to size workers
+
+Opt-in: nothing is traced unless :func:`~pytexit.memory.memory_report` is
+called. It converts a batch of formulas one pipeline stage at a time
+(preprocess, parse, visit, simplify) under :mod:`tracemalloc`, and reports
+for each stage the peak memory, and the memory retained by its outputs. It
+also reports the size of the caches, and the largest results::
+
+    from pytexit.memory import memory_report, format_memory_report
+
+    report = memory_report(exprs, memo=SubexpressionMemo())
+    print(format_memory_report(report))
+
+or in a Terminal::
+
+    py2tex --memory-report formulas.txt
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import ast
+import inspect
+import sys
+import tracemalloc
+from collections import OrderedDict
+
+from .pytexit import (
+    _function_cache,
+    finish_render,
+    formula_node,
+    preprocess_formula,
+    py2tex,
+    visitors,
+)
+
+stages = ["preprocess", "parse", "visit", "simplify"]
+
+_visitor_options = [
+    "dummy_var",
+    "upperscript",
+    "lowerscript",
+    "verbose",
+    "simplify_multipliers",
+    "simplify_fractions",
+    "simplify_ints",
+    "tex_multiplier",
+    "simplify_output",
+    "tex_enclosure",
+]
+
+
+def sizeof(obj, seen=None):
+    """Size in bytes of ``obj`` and of the containers, strings and numbers it
+    references (dicts, lists, tuples, sets). Objects referenced twice are
+    counted once. Classes are not counted."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, type):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += sizeof(k, seen) + sizeof(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for v in obj:
+            size += sizeof(v, seen)
+    return size
+
+
+def cache_sizes(memo=None, cache=None):
+    """Size in bytes of the caches: converted Python ``functions``, the
+    subexpression ``memo`` and the ``disk`` cache, if given (size of the
+    stored conversions, on disk)"""
+    sizes = OrderedDict()
+    sizes["functions"] = sizeof([dict(c) for c in _function_cache.values()])
+    if memo is not None:
+        with memo._lock:
+            sizes["memo"] = sizeof(memo.rendered) + sizeof(memo.structures)
+    if cache is not None:
+        sizes["disk"] = cache.size()
+    return sizes
+
+
+def memory_report(exprs, output="tex", top=10, **kwargs):
+    """Convert ``exprs`` one pipeline stage at a time, and report the memory
+    used by each stage
+
+    Parameters
+    ----------
+
+    exprs: list of str
+        formulas
+
+    output: str
+        one of the keys of :data:`~pytexit.pytexit.visitors`
+
+    top: int
+        number of largest results reported
+
+    Other Parameters
+    ----------------
+
+    kwargs: dict
+        options of the visitor (see :func:`~pytexit.pytexit.py2tex`),
+        ``memo`` (its size is reported) and ``cache`` (a
+        :class:`~pytexit.cache.DiskCache`: only its size is reported,
+        conversions are not read from it)
+
+    Returns
+    -------
+
+    dict with:
+
+    - ``formulas``: number of formulas converted
+    - ``stages``: for each stage, the ``peak`` memory used during the stage,
+      and the memory ``retained`` by its outputs (ex: the parsed trees), in
+      bytes. ``peak`` is ``None`` before Python 3.9, where
+      :func:`tracemalloc.reset_peak` is not available
+    - ``results``: memory retained by all the results, in bytes
+    - ``caches``: see :func:`~pytexit.memory.cache_sizes`
+    - ``largest``: the ``top`` largest results of distinct formulas,
+      ``(bytes, formula)``
+
+    Notes
+    -----
+
+    With ``memo``, its entries are kept by the visitors and not counted in
+    the stages; see ``caches``.
+
+    The stages are the steps of :func:`~pytexit.pytexit.py2tex`:
+    :func:`~pytexit.pytexit.preprocess_formula`,
+    :func:`~pytexit.pytexit.formula_node`, then the visit and
+    :func:`~pytexit.pytexit.finish_render` steps of
+    :func:`~pytexit.pytexit.render`. All the formulas go through a stage
+    before the next stage starts: peaks and retained memory are those of the
+    batch. The parsed trees are dropped
+    after the ``visit`` stage, as in :func:`~pytexit.pytexit.py2tex`. Tracing
+    slows conversions down several times.
+
+    """
+    if output not in visitors:
+        raise ValueError("Unexpected output: {0}".format(output))
+    cache = kwargs.pop("cache", None)
+    memo = kwargs.get("memo")
+    # options of the visitor, with the defaults of py2tex
+    options = {
+        name: parameter.default
+        for name, parameter in inspect.signature(py2tex).parameters.items()
+        if name in _visitor_options
+    }
+    options.update(kwargs)
+    simplify_output = options.pop("simplify_output")
+    tex_enclosure = options.pop("tex_enclosure")
+    root = visitors[output](**options)
+    exprs = list(exprs)
+
+    # the steps of py2tex and render, one stage at a time
+    def preprocess(exprs):
+        return [preprocess_formula(e, simplify_output=simplify_output) for e in exprs]
+
+    def parse(exprs):
+        return [formula_node(ast.parse(expr)) for expr in exprs]
+
+    def visit(nodes):
+        return [visitors[output](**options).visit(n) for n in nodes]
+
+    def finish(visited):
+        return [
+            finish_render(
+                s,
+                root,
+                output=output,
+                simplify_output=simplify_output,
+                tex_enclosure=tex_enclosure,
+            )
+            for s in visited
+        ]
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    reset_peak = getattr(tracemalloc, "reset_peak", None)  # Python >= 3.9
+    report = OrderedDict(formulas=len(exprs), stages=OrderedDict())
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        data = exprs
+        for stage, function in zip(stages, [preprocess, parse, visit, finish]):
+            if reset_peak is not None:
+                reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            inputs, data = data, function(data)
+            after, peak = tracemalloc.get_traced_memory()
+            report["stages"][stage] = OrderedDict(
+                # without reset_peak, the peak would be that of all the
+                # previous stages
+                peak=peak - before if reset_peak is not None else None,
+                retained=after - before,
+            )
+            del inputs  # ex: the trees are dropped after the visit
+        results = data
+        report["results"] = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    report["caches"] = cache_sizes(memo=memo, cache=cache)
+    distinct = dict(zip(exprs, results))
+    largest = sorted(((sys.getsizeof(s), e) for e, s in distinct.items()), reverse=True)
+    report["largest"] = largest[:top]
+    return report
+
+
+def format_size(size):
+    """Human readable size (ex: ``'1.5 MB'``)"""
+    if abs(size) < 1024:
+        return "{0} B".format(size)
+    for unit in ["kB", "MB", "GB"]:
+        size /= 1024
+        if abs(size) < 1024:
+            break
+    return "{0:.1f} {1}".format(size, unit)
+
+
+def format_memory_report(report):
+    """Text table of a :func:`~pytexit.memory.memory_report`"""
+    lines = ["{0} formulas".format(report["formulas"]), ""]
+    lines.append("{0:<12}{1:>12}{2:>12}".format("stage", "peak", "retained"))
+    for stage, memory in report["stages"].items():
+        lines.append(
+            "{0:<12}{1:>12}{2:>12}".format(
+                stage,
+                format_size(memory["peak"]) if memory["peak"] is not None else "-",
+                format_size(memory["retained"]),
+            )
+        )
+    lines.append("{0:<12}{1:>24}".format("results", format_size(report["results"])))
+    lines += ["", "caches"]
+    for name, size in report["caches"].items():
+        lines.append("  {0:<10}{1:>12}".format(name, format_size(size)))
+    lines += ["", "largest results"]
+    for size, expr in report["largest"]:
+        if len(expr) > 60:
+            expr = expr[:57] + "..."
+        lines.append("  {0:>10}  {1}".format(format_size(size), expr))
+    return "\n".join(lines)
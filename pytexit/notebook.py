@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+"""
+Formula appendices of Jupyter notebooks
+
+Each notebook (``.ipynb``) is read once, each code cell is parsed once, and
+its assignments (and the formulas of the functions it defines, see
+:func:`~pytexit.pytexit.module2tex`) are converted. One fragment is written
+per notebook, in LaTeX or Markdown. Notebooks are converted in parallel, and
+notebooks that did not change since the last scan are skipped.
+
+Examples
+--------
+
+::
+
+    from pytexit.notebook import scan_notebooks
+    scan_notebooks(["analysis/"], "appendices/", processes=4)
+
+or in a Terminal::
+
+    py2tex --notebooks analysis/ -o appendices/ --processes 4
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import functools
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+
+from .build import appendix, write_atomic
+from .pytexit import module2tex, tex_outputs
+
+fragment_formats = {"tex": ".tex", "markdown": ".md"}
+
+# IPython syntax that is not Python: line magics, shell commands (also
+# assigned: 'files = !ls'), help
+_ipython_line = re.compile(r"^\s*(?:[\w.,\s]+=\s*)?[%!]|^\s*\?|^\s*[\w.]+\?\??\s*$")
+
+
+def _bracket_depth(line, depth=0):
+    """Depth of the brackets opened at the end of ``line``, starting at
+    ``depth`` (outside strings and comments)"""
+    quote = None
+    for c in line:
+        if quote:
+            if c == quote:
+                quote = None
+        elif c in "'\"":
+            quote = c
+        elif c == "#":
+            break
+        elif c in "([{":
+            depth += 1
+        elif c in ")]}":
+            depth = max(depth - 1, 0)
+    return depth
+
+
+def blank_ipython(source):
+    """Blank the IPython lines of a cell (line magics, shell commands, help),
+    at the start of statements only: not in brackets or after a ``\\``
+    continuation. Line numbers are kept"""
+    lines, depth, continued = [], 0, False
+    for line in source.split("\n"):
+        if depth == 0 and not continued and _ipython_line.match(line):
+            line = ""
+        else:
+            depth = _bracket_depth(line, depth)
+        continued = line.rstrip().endswith("\\")
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def ipython2python(source):
+    """Python code of a cell. Uses the input transformer of IPython if
+    installed (``files = !ls`` -> ``files = get_ipython().getoutput('ls')``),
+    else the IPython lines are blanked, see
+    :func:`~pytexit.notebook.blank_ipython`. Line numbers are kept"""
+    try:
+        from IPython.core.inputtransformer2 import TransformerManager
+    except ImportError:
+        return blank_ipython(source)
+    try:
+        return TransformerManager().transform_cell(source)
+    except Exception:  # left to the Python parser
+        return blank_ipython(source)
+
+
+def _without_outputs(pairs):
+    """JSON object without cell outputs and attachments"""
+    return {k: v for k, v in pairs if k not in ("outputs", "attachments")}
+
+
+def notebook_cells(path):
+    """Code cells of a notebook: yields ``(number, source)``, numbered from
+    1 in the order of the notebook. Cell magics (``%%time``...) are skipped,
+    and the IPython syntax of the other cells is replaced, see
+    :func:`~pytexit.notebook.ipython2python`
+
+    Notes
+    -----
+
+    The notebook is not streamed: the standard library has no incremental
+    JSON parser, and a new dependency isn't worth it since cells must be in
+    memory to be parsed anyway. The file is decoded in one go, but the cell
+    outputs and attachments (ex: embedded images) are dropped as soon as they
+    are decoded, so they are never held in memory all together.
+
+    """
+    with io.open(path, encoding="utf-8") as f:
+        notebook = json.load(f, object_pairs_hook=_without_outputs)
+    if "cells" in notebook:  # nbformat 4
+        cells = [(c, "source") for c in notebook["cells"]]
+    else:  # nbformat 3
+        cells = [
+            (c, "input")
+            for worksheet in notebook.get("worksheets", [])
+            for c in worksheet["cells"]
+        ]
+    number = 0
+    for cell, field in cells:
+        if cell.get("cell_type") != "code":
+            continue
+        number += 1
+        source = cell.get(field, "")
+        if isinstance(source, list):
+            source = "".join(source)
+        if source.lstrip().startswith("%%"):
+            continue
+        yield number, ipython2python(source)
+
+
+def notebook2tex(path, **kwargs):
+    """Convert the formulas of the code cells of a notebook
+
+    Parameters
+    ----------
+
+    path: str
+        ``.ipynb`` file
+
+    Other Parameters
+    ----------------
+
+    kwargs: dict
+        see :func:`~pytexit.pytexit.module2tex`
+
+    Returns
+    -------
+
+    list of dict, see :func:`~pytexit.pytexit.module2tex`. The ``name`` is
+    the cell (ex: ``'cell 3'``, ``'cell 3: rate'`` for the formulas of a
+    function ``rate``), and ``lineno`` is the line in the cell. Cells that
+    can't be parsed have one formula with an ``error``.
+
+    """
+    formulas = []
+    for number, source in notebook_cells(path):
+        cell = "cell {0}".format(number)
+        if not source.strip():
+            continue
+        try:
+            cell_formulas = module2tex(source=source, **kwargs)
+        except SyntaxError as err:
+            cell_formulas = [
+                {
+                    "name": "<module>",
+                    "lineno": err.lineno or 0,
+                    "kind": "cell",
+                    "source": source,
+                    "output": None,
+                    "error": str(err),
+                }
+            ]
+        for formula in cell_formulas:
+            if formula["name"] == "<module>":
+                formula["name"] = cell
+            else:
+                formula["name"] = cell + ": " + formula["name"]
+            formulas.append(formula)
+    return formulas
+
+
+def markdown_appendix(formulas, title=None):
+    """Write formulas as a Markdown fragment, grouped by cell. See
+    :func:`~pytexit.build.appendix`"""
+    lines = []
+    if title is not None:
+        lines += ["## {0}".format(title), ""]
+    name = None
+    for f in formulas:
+        if f["name"] != name:
+            name = f["name"]
+            if name:
+                lines += ["### {0}".format(name), ""]
+        if f["output"] is None:
+            lines += [
+                "<!-- line {0}: could not be converted: {1} -->".format(
+                    f["lineno"], f.get("error")
+                ),
+                "",
+            ]
+            continue
+        lines += ["$$", f["output"], "$$", ""]
+    return "\n".join(lines)
+
+
+def _convert_notebook(path, format="tex", **kwargs):
+    """Fragment of a notebook (in a worker process). Returns ``(path,
+    number of formulas, fragment, error)``. A notebook that can't be read
+    gets a fragment with its error"""
+    error = None
+    try:
+        formulas = notebook2tex(path, tex_enclosure="", **kwargs)
+        count = len(formulas)
+    except Exception as err:  # malformed notebook: the others are converted
+        error = "{0}: {1}".format(type(err).__name__, err)
+        formulas = [
+            {
+                "name": "",
+                "lineno": 0,
+                "kind": "notebook",
+                "source": path,
+                "output": None,
+                "error": error,
+            }
+        ]
+        count = 0
+    if format == "markdown":
+        fragment = markdown_appendix(formulas, title=path)
+    else:
+        fragment = appendix(formulas, title=path)
+    return path, count, fragment, error
+
+
+def find_notebooks(paths):
+    """Notebooks of ``paths`` (files, or directories searched recursively,
+    except hidden directories such as ``.ipynb_checkpoints``)"""
+    notebooks = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for name in sorted(files):
+                    if name.lower().endswith(".ipynb"):
+                        notebooks.append(os.path.join(root, name))
+        else:
+            notebooks.append(path)
+    return notebooks
+
+
+def fragment_names(notebooks, format="tex"):
+    """Name of the fragment of each notebook: its name, with a short hash of
+    its path if several notebooks have the same name"""
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in notebooks]
+    names = {}
+    for path, stem in zip(notebooks, stems):
+        if stems.count(stem) > 1:
+            stem += "-" + hashlib.sha1(path.encode("utf-8")).hexdigest()[:8]
+        names[path] = stem + fragment_formats[format]
+    return names
+
+
+def scan_notebooks(
+    paths,
+    output_dir,
+    format="tex",
+    processes=None,
+    output="tex",
+    verbose=False,
+    **kwargs
+):
+    """Write the formula appendix of each notebook, converting only the
+    notebooks that changed since the last scan
+
+    Parameters
+    ----------
+
+    paths: list of str
+        notebooks, or directories searched recursively
+
+    output_dir: str
+        where the fragments are written, one per notebook, with a manifest
+        of the content hash of each notebook
+
+    format: ``'tex'`` or ``'markdown'``
+        format of the fragments
+
+    processes: int, or ``None``
+        if given, notebooks are converted in parallel in ``processes`` worker
+        processes, the largest first
+
+    output: ``'tex'`` or ``'compact'``
+        see :func:`~pytexit.pytexit.py2tex`
+
+    Other Parameters
+    ----------------
+
+    kwargs: dict
+        conversion options, see :func:`~pytexit.pytexit.module2tex`.
+        Changing them converts all the notebooks again.
+
+    Returns
+    -------
+
+    dict, with the lists of ``converted``, ``skipped`` (unchanged) and
+    ``removed`` notebooks, the number of ``formulas`` converted, and the
+    ``errors`` of the notebooks that could not be read (``{path: error}``).
+    These are converted again at the next scan.
+
+    """
+    from . import __version__
+
+    if format not in fragment_formats:
+        raise ValueError("Unexpected format: {0}".format(format))
+    if output not in tex_outputs:
+        raise ValueError(
+            "Unexpected output: {0}. Use one of {1}".format(output, tex_outputs)
+        )
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    options = dict(kwargs, output=output, format=format, version=__version__)
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    try:
+        with io.open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (IOError, ValueError):
+        manifest = {}
+    previous = manifest.get("notebooks", {})
+    if manifest.get("options") != options:
+        previous = {}
+
+    report = {
+        "converted": [],
+        "skipped": [],
+        "removed": [],
+        "formulas": 0,
+        "errors": {},
+    }
+    notebooks = find_notebooks(paths)
+    names = fragment_names(notebooks, format=format)
+    entries, changed = {}, []
+    for path in notebooks:
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        entry = previous.get(path)
+        fragment = os.path.join(output_dir, names[path])
+        if (
+            entry
+            and entry["hash"] == digest
+            and entry["fragment"] == names[path]
+            and os.path.exists(fragment)
+        ):
+            report["skipped"].append(path)
+            entries[path] = entry
+        else:
+            changed.append(path)
+            entries[path] = {"hash": digest, "fragment": names[path]}
+
+    # The largest notebooks first, so that no worker is left alone with them
+    changed.sort(key=os.path.getsize, reverse=True)
+    convert = functools.partial(
+        _convert_notebook, format=format, output=output, **kwargs
+    )
+    if processes is None or len(changed) < 2:
+        results = map(convert, changed)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(convert, changed)
+    try:
+        for path, count, fragment, error in results:
+            write_atomic(os.path.join(output_dir, names[path]), fragment)
+            entries[path]["formulas"] = count
+            report["converted"].append(path)
+            report["formulas"] += count
+            if error is not None:
+                report["errors"][path] = error
+                entries[path]["hash"] = None  # read again at the next scan
+            if verbose:
+                print("{0}: {1}".format(path, error or "{0} formulas".format(count)))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    order = {path: i for i, path in enumerate(notebooks)}
+    report["converted"].sort(key=order.get)
+
+    # Notebooks that are gone, or renamed fragments
+    kept = set(entry["fragment"] for entry in entries.values())
+    for path, entry in manifest.get("notebooks", {}).items():
+        if path not in entries:
+            report["removed"].append(path)
+        fragment = os.path.join(output_dir, entry["fragment"])
+        if entry["fragment"] not in kept and os.path.exists(fragment):
+            os.remove(fragment)
+
+    write_atomic(
+        manifest_path,
+        json.dumps({"options": options, "notebooks": entries}, indent=1),
+    )
+    return report
@@ -8,37 +8,79 @@ Convert a Python expression in a LaTeX formula
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import ast
+import functools
+import inspect
+import multiprocessing
+import os
 import sys
+import threading
+import weakref
 
 import six
 
 try:
+    from pytexit.core.compact import CompactVisitor
     from pytexit.core.core import (
         LatexVisitor,
         preprocessing,
+        preprocessing_ast,
+        preprocessing_many,
         replace_scientific,
         simplify,
+        source_lines,
+        source_segment,
         uprint,
     )
-    from pytexit.core.docx import WordVisitor
-    from pytexit.core.fortran import for2py
+    from pytexit.core.cost import balance, estimate_cost
+    from pytexit.core.docx import DocxWriter, OMMLVisitor, WordVisitor
+    from pytexit.core.fortran import (
+        assignment2py,
+        for2py,
+        read_assignments,
+        split_logical_if,
+    )
+    from pytexit.core.guard import FormulaRejected
+    from pytexit.core.mathml import MathMLVisitor
+    from pytexit.core.source import FormulaFinder
 except:  # if run locally as a script
+    from core.compact import CompactVisitor
     from core.core import (
         LatexVisitor,
         preprocessing,
+        preprocessing_ast,
+        preprocessing_many,
         replace_scientific,
         simplify,
+        source_lines,
+        source_segment,
         uprint,
     )
-    from core.docx import WordVisitor
-    from core.fortran import for2py
-try:
-    import IPython.display
-except:
-    pass
-
+    from core.cost import balance, estimate_cost
+    from core.docx import DocxWriter, OMMLVisitor, WordVisitor
+    from core.fortran import (
+        assignment2py,
+        for2py,
+        read_assignments,
+        split_logical_if,
+    )
+    from core.guard import FormulaRejected
+    from core.mathml import MathMLVisitor
+    from core.source import FormulaFinder
 PRINT_FORMULA, PRINT_LATEX = True, True
 
+# Backends available with py2tex(output=...)
+visitors = {
+    "tex": LatexVisitor,
+    "compact": CompactVisitor,
+    "word": WordVisitor,
+    "mathml": MathMLVisitor,
+    "omml": OMMLVisitor,
+}
+# Backends that produce LaTeX formulas (enclosed with ``tex_enclosure``)
+tex_outputs = ["tex", "compact"]
+# Backends that produce XML (enclosed in their root element)
+xml_outputs = ["mathml", "omml"]
+
 
 def py2tex(
     expr,
@@ -55,26 +97,44 @@ def py2tex(
     simplify_fractions=False,
     simplify_ints=True,
     simplify_multipliers=True,
+    memo=None,
+    cache=None,
+    budget=None,
+    guard=None,
+    preprocess=True,
 ):
     """Return the LaTeX expression of a Python formula
 
     Parameters
     ----------
-    expr: string
-        a Python expression
+    expr: string, or function
+        a Python expression. If a function (or lambda), its intermediate
+        assignments and return expressions are converted. See
+        :func:`~pytexit.pytexit.function2tex`
 
     print_latex: boolean
-        if True, prints the latex expression in the console
+        if True, prints the latex expression in the console. If ``None``,
+        the global ``PRINT_LATEX`` is used.
 
     print_formula: boolean
-        if True, prints the formula expression in the console
+        if True, prints the formula expression in the console. If ``None``,
+        the global ``PRINT_FORMULA`` is used.
 
     dummy_var: string
         dummy variable displayed in integrals
 
-    output: 'tex' / 'word'
-        if 'tex', output latex formula. If word, output a Word MathTex formula
-        (may be a little different)
+    output: 'tex' / 'compact' / 'word' / 'mathml' / 'omml', or list of them
+        if 'tex', output latex formula. If 'compact', output the shortest
+        equivalent latex formula (plain parenthesis, no redundant braces),
+        for instance for client-side renderers such as KaTeX. If word, output
+        a Word MathTex formula (may be a little different). If 'mathml',
+        output a Presentation MathML ``<math>`` element. If 'omml', output an
+        Office Math ``<m:oMath>`` element (see :func:`~pytexit.pytexit.py2docx`).
+        If a list, the formula is parsed only once and a dictionary
+        ``{output: formula}`` is returned. Ex::
+
+            py2tex('sqrt(x)', output=['tex', 'word'])
+            >>> {'tex': '$$\\sqrt{x}$$', 'word': '\\sqrt(x)'}
 
     tex_enclosure: string
         enclosure for latex formula.
@@ -124,12 +184,43 @@ def py2tex(
         See :class:`~pytexit.core.core.LatexVisitor` for more information.
         Default ``True``
 
+    memo: :class:`~pytexit.core.memo.SubexpressionMemo`
+        if given, subexpressions already rendered in previous formulas (with
+        the same options) are reused. Share one memo across a batch of
+        formulas. Ignored for functions (see
+        :func:`~pytexit.pytexit.function2tex`, which has its own cache).
+        Default ``None``
+
+    cache: :class:`~pytexit.cache.DiskCache`
+        if given, conversions are read from / stored in this persistent cache,
+        shared by all the processes that use the same file. Ignored for
+        functions. Default ``None``
+
+    budget: :class:`~pytexit.core.budget.RenderBudget`
+        if given, limits the nodes visited, output length and time of the
+        rendering, for untrusted input. Raises
+        :class:`~pytexit.core.budget.BudgetExceeded` (a ``ValueError``) as
+        soon as the budget is exceeded. Ignored for functions. Default
+        ``None``
+
+    guard: :class:`~pytexit.core.guard.FormulaGuard`
+        if given, the formula is checked before it is parsed (length, bracket
+        depth, tokens, keywords, names). Raises
+        :class:`~pytexit.core.guard.FormulaRejected` (a ``ValueError``) if it
+        is rejected. Ignored for functions. Default ``None``
+
+    preprocess: bool
+        if ``False``, the formula was already pre-processed (unicode names,
+        module calls, scientific notation), for instance by
+        :func:`~pytexit.core.core.preprocessing_many` for a whole batch.
+        Default ``True``
 
     Returns
     -------
 
     returns the latex expression in raw text, to be used in your reports or
-    to display in an IPython notebook
+    to display in an IPython notebook. If ``output`` is a list, returns a
+    dictionary of expressions.
 
     Notes
     -----
@@ -141,6 +232,12 @@ def py2tex(
     You can also change the global variables ``pytexit.PRINT_FORMULA`` or ``pytexit.PRINT_LATEX``
     to avoid passing them as parameters every time you call the function.
 
+    Thread safety: ``py2tex`` can be called from many threads at once. Each
+    call creates its own visitor, and the shared caches (functions,
+    ``memo``, ``cache``) are guarded by locks. Printed formulas are written
+    one line at a time. Visitors themselves are not thread-safe: don't share
+    one (``render(visitor=...)``) between threads.
+
     See Also
     --------
 
@@ -159,80 +256,627 @@ def py2tex(
 
     """
 
-    # Check print globals
-    if PRINT_FORMULA is None:
+    # Check print globals (read once: the call doesn't depend on changes
+    # made meanwhile by other threads)
+    if print_formula is None:
         print_formula = PRINT_FORMULA
-    if PRINT_LATEX is None:
+    if print_latex is None:
         print_latex = PRINT_LATEX
 
-    # Check inputs
+    # Check outputs
+    outputs = [output] if isinstance(output, six.string_types) else list(output)
+    for o in outputs:
+        if o not in visitors:
+            raise ValueError("Unexpected output: {0}".format(o))
+
+    options = dict(
+        simplify_output=simplify_output,
+        tex_enclosure=tex_enclosure,
+        dummy_var=dummy_var,
+        upperscript=upperscript,
+        lowerscript=lowerscript,
+        verbose=verbose,
+        simplify_multipliers=simplify_multipliers,
+        simplify_fractions=simplify_fractions,
+        simplify_ints=simplify_ints,
+        tex_multiplier=tex_multiplier,
+    )
+
+    if inspect.isfunction(expr) or inspect.ismethod(expr):
+        # Python function: convert its body
+        results = {o: function2tex(expr, output=o, **options) for o in outputs}
+
+    else:
+        # Check inputs
+        try:
+            if sys.version_info > (3,):
+                assert isinstance(expr, str)
+            else:
+                assert isinstance(expr, (str, six.text_type))
+        except AssertionError:
+            raise ValueError("Input must be a string or a function")
+
+        if guard is not None:
+            verdict = guard.check(expr)
+            if not verdict:
+                raise FormulaRejected(verdict)
+
+        results = None
+        if cache is not None:
+            key_options = dict(options, output=outputs)
+            if not preprocess:
+                key_options["preprocess"] = False
+            key = cache.key("py2tex", expr, key_options)
+            results = cache.get(key)
+
+        if results is None and preprocess:
+            expr = preprocess_formula(expr, simplify_output=simplify_output)
+
+        if results is None:
+            # Parse (once, whatever the number of outputs)
+            node = formula_node(ast.parse(expr))
+
+            results = {
+                o: render(node, output=o, memo=memo, budget=budget, **options)
+                for o in outputs
+            }
+
+            if cache is not None:
+                cache.set(key, results)
+
+    # Output
+    for o in outputs:
+        if print_latex and o in tex_outputs:
+            display_latex(results[o])
+
+        if print_formula:
+            uprint(results[o])
+
+    if isinstance(output, six.string_types):
+        return results[output]
+    return results
+
+
+def display_latex(s):
+    """Display a LaTeX formula if running in IPython / Jupyter. IPython is
+    not imported otherwise"""
+    IPython = sys.modules.get("IPython")
+    if IPython is None or IPython.get_ipython() is None:
+        return
     try:
-        if sys.version_info > (3,):
-            assert isinstance(expr, str)
-        else:
-            assert isinstance(expr, (str, six.text_type))
-    except AssertionError:
-        raise ValueError("Input must be a string")
+        from IPython.display import Latex, display
+
+        display(Latex(s))
+    except Exception:
+        pass
 
-    expr = preprocessing(expr)  # removes unicode, module calls, etc.
 
-    # replace scientific notation with power of 10 (this needs to be done in
-    # preprocessing since the ast parser will replace 1e3 with 1000.0)
+def preprocess_formula(expr, simplify_output=True):
+    """Preprocess a formula before it is parsed: removes unicode, module
+    calls, etc. (see :func:`~pytexit.core.core.preprocessing`)"""
+    expr = preprocessing(expr)
+
+    # replace scientific notation with power of 10 (this needs to be done
+    # in preprocessing since the ast parser will replace 1e3 with 1000.0)
     if simplify_output:
         expr = replace_scientific(expr)
 
-    # Parse
-    pt = ast.parse(expr)
-    if output == "tex":  # LaTex output
-        Visitor = LatexVisitor(
-            dummy_var=dummy_var,
-            upperscript=upperscript,
-            lowerscript=lowerscript,
-            verbose=verbose,
-            simplify_multipliers=simplify_multipliers,
-            simplify_fractions=simplify_fractions,
-            simplify_ints=simplify_ints,
-            tex_multiplier=tex_multiplier,
-        )
-    elif output == "word":  # Word output
-        Visitor = WordVisitor(
-            dummy_var=dummy_var,
-            upperscript=upperscript,
-            lowerscript=lowerscript,
-            verbose=verbose,
-            simplify_multipliers=simplify_multipliers,
-            simplify_fractions=simplify_fractions,
-            simplify_ints=simplify_ints,
-            tex_multiplier=tex_multiplier,
-        )
-    else:
-        raise ValueError("Unexpected output: {0}".format(output))
+    return expr
+
+
+def formula_node(pt):
+    """Returns the node to render from a parsed formula"""
     if isinstance(pt.body[0], ast.Expr):
         # To deal with cases such as 'x=something'
-        # TODO : one single command to start the visit?
-        s = Visitor.visit(pt.body[0].value)
+        return pt.body[0].value
     else:  # For Compare / Assign expressions
-        s = Visitor.visit(pt.body[0])
+        return pt.body[0]
+
+
+def render(
+    node, output="tex", simplify_output=True, tex_enclosure="$$", visitor=None, **kwargs
+):
+    """Render an already parsed formula with the visitor of ``output``
+
+    Parameters
+    ----------
+
+    node: ast.AST
+        parsed formula. See :func:`~pytexit.pytexit.formula_node`
+
+    output: str
+        one of the keys of :data:`~pytexit.pytexit.visitors`
+
+    Other Parameters
+    ----------------
+
+    visitor: visitor instance
+        if given, ``visitor`` is used (and ``kwargs`` ignored). Used to render
+        many formulas with one visitor.
+
+    kwargs: dict
+        forwarded to the visitor. See :class:`~pytexit.core.core.LatexVisitor`
+
+    """
+
+    Visitor = visitor if visitor is not None else visitors[output](**kwargs)
+    return finish_render(
+        Visitor.visit(node),
+        Visitor,
+        output=output,
+        simplify_output=simplify_output,
+        tex_enclosure=tex_enclosure,
+    )
+
+
+def finish_render(s, visitor, output="tex", simplify_output=True, tex_enclosure="$$"):
+    """Simplify and enclose ``s``, the string returned by ``visitor.visit``.
+    Last step of :func:`~pytexit.pytexit.render`"""
 
     # Simplify if asked for
-    if simplify_output:
-        s = simplify(s)
+    if simplify_output and output not in xml_outputs:
+        s = visitor.simplify(s)
 
-    if output == "tex":
+    if output in tex_outputs:
         s = tex_enclosure + s + tex_enclosure
+    elif output in xml_outputs:
+        s = visitor.math(s)
 
-    # Output
-    if print_latex and output == "tex":
+    return s
+
+
+def py2docx(exprs, path, source_paragraph=False, **kwargs):
+    """Write Python formulas as native equations of a Word ``.docx`` document
+
+    Formulas are converted to Office Math (OMML) one at a time and streamed to
+    the document, so that memory use stays flat whatever the number of
+    equations.
+
+    Parameters
+    ----------
+
+    exprs: iterable of str
+        Python formulas. Can be a generator.
+
+    path: str or file-like object
+        output ``.docx`` file
+
+    Other Parameters
+    ----------------
+
+    source_paragraph: boolean
+        if ``True``, also write each Python formula in a paragraph before its
+        equation.
+
+    kwargs: dict
+        forwarded to :func:`~pytexit.pytexit.py2tex`. Formulas are not printed
+        unless ``print_formula=True``.
+
+    Examples
+    --------
+
+    ::
+
+        py2docx(["Re_x=(rho*v*x)/mu", "sqrt(2*pi*k*T_e/m_e)"], "report.docx")
+
+    See Also
+    --------
+
+    :class:`~pytexit.core.docx.DocxWriter`
+
+    """
+
+    kwargs.update({"output": "omml", "print_latex": False})
+    kwargs.setdefault("print_formula", False)
+
+    with DocxWriter(path) as doc:
+        for expr in exprs:
+            doc.add(
+                py2tex(expr, **kwargs),
+                text=expr if source_paragraph else None,
+            )
+
+
+# Conversions of functions: {code object: {options: result}}
+_function_cache = weakref.WeakKeyDictionary()
+_function_cache_lock = threading.Lock()
+
+
+def _is_lambda_of(node, code):
+    """Returns ``True`` if the ``lambda`` node was compiled to ``code``"""
+
+    if hasattr(code, "co_positions"):  # Python >= 3.11
+        body = node.body
+        span = (body.lineno, body.end_lineno, body.col_offset, body.end_col_offset)
+        return span in set(code.co_positions())
+    # compare the constants and names of the compiled node. Variables of
+    # enclosing functions are global names once the node is compiled alone
+    compiled = compile(ast.Expression(body=node), "<lambda>", "eval")
+    compiled = [c for c in compiled.co_consts if inspect.iscode(c)][0]
+    return (compiled.co_consts, set(compiled.co_names)) == (
+        code.co_consts,
+        set(code.co_names) | set(code.co_freevars),
+    )
+
+
+def function2tex(
+    func,
+    output="tex",
+    tex_enclosure="$$",
+    simplify_output=True,
+    dummy_var="u",
+    tex_multiplier=r"\times",
+    upperscript="ˆ",
+    lowerscript="_",
+    verbose=False,
+    simplify_fractions=False,
+    simplify_ints=True,
+    simplify_multipliers=True,
+):
+    """Convert the body of a Python function
+
+    The source of the function is read with :mod:`inspect`, and its
+    intermediate assignments and return expressions are converted. A return
+    expression is written as ``name(args)=expression``. For a ``lambda``, only
+    its expression is converted.
+
+    Results are cached for each code object (``func.__code__``): converting
+    the same function again costs a dictionary lookup.
+
+    Parameters
+    ----------
+
+    func: function, method or lambda
+        must be defined in a source file (or notebook cell) that
+        :func:`inspect.getsource` can read
+
+    output: str
+        see :func:`~pytexit.pytexit.py2tex`
+
+    Other Parameters
+    ----------------
+
+    see :func:`~pytexit.pytexit.py2tex`
+
+    Returns
+    -------
+
+    the converted formulas, one per line
+
+    Examples
+    --------
+
+    ::
+
+        def rate(T):
+            k = A * T**n
+            return k * exp(-E_a / (R * T))
+
+        py2tex(rate)
+        >>> $$k=A T^n$$
+        >>> $$\\operatorname{rate}\\left(T\\right)=k e^{\\frac{-E_a}{R T}}$$
+
+    """
+
+    func = getattr(func, "__func__", func)  # methods
+    code = func.__code__
+    kwargs = dict(
+        dummy_var=dummy_var,
+        upperscript=upperscript,
+        lowerscript=lowerscript,
+        verbose=verbose,
+        simplify_multipliers=simplify_multipliers,
+        simplify_fractions=simplify_fractions,
+        simplify_ints=simplify_ints,
+        tex_multiplier=tex_multiplier,
+    )
+    key = (output, tex_enclosure, simplify_output) + tuple(sorted(kwargs.items()))
+    with _function_cache_lock:
         try:
-            IPython.display.display(IPython.display.Latex(s))
-        except:
+            return _function_cache[code][key]
+        except KeyError:
             pass
 
-    if print_formula:
-        uprint(s)
+    # parse the whole file (or notebook cell): the function may start on a
+    # continuation line, and its nodes are found by their position
+    lines, _ = inspect.findsource(func)
+    source = "".join(lines)
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        raise ValueError("Cannot parse the source of {0}".format(func.__name__))
+
+    args = code.co_varnames[: code.co_argcount]
+    if func.__name__ == "<lambda>":
+        lambdas = [
+            n
+            for n in ast.walk(tree)
+            if isinstance(n, ast.Lambda)
+            and n.lineno == code.co_firstlineno
+            and tuple(a.arg for a in n.args.args) == args
+        ]
+        if len(lambdas) > 1:
+            # several lambdas on the same line
+            lambdas = [n for n in lambdas if _is_lambda_of(n, code)]
+        if len(lambdas) != 1:
+            raise ValueError("Cannot find the source of {0}".format(func))
+        nodes = [
+            preprocessing_ast(
+                lambdas[0].body, source=source, scientific=simplify_output
+            )
+        ]
+    else:
+        definitions = [
+            n
+            for n in ast.walk(tree)
+            if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))
+            and n.name == func.__name__
+            and code.co_firstlineno
+            in [n.lineno] + [d.lineno for d in n.decorator_list[:1]]
+        ]
+        if not definitions:
+            raise ValueError("Cannot find the source of {0}".format(func))
+        definition = preprocessing_ast(
+            definitions[0], source=source, scientific=simplify_output
+        )
+        # formulas of the function itself, not of nested functions or classes
+        finder = FormulaFinder(nested=False)
+        for statement in definition.body:
+            finder.visit(statement)
+        nodes = []
+        for _, kind, node in finder.formulas:
+            if kind == "assign":
+                nodes.append(node)
+            elif kind == "return":
+                # name(args) = expression
+                call = ast.Call(
+                    func=ast.Name(id=func.__name__, ctx=ast.Load()),
+                    args=[ast.Name(id=a, ctx=ast.Load()) for a in args if a != "self"],
+                    keywords=[],
+                )
+                nodes.append(ast.Assign(targets=[call], value=node))
+
+    Visitor = visitors[output](**kwargs)
+    s = "\n".join(
+        render(
+            node,
+            output=output,
+            simplify_output=simplify_output,
+            tex_enclosure=tex_enclosure,
+            visitor=Visitor,
+        )
+        for node in nodes
+    )
+
+    with _function_cache_lock:
+        _function_cache.setdefault(code, {})[key] = s
     return s
 
 
+def ast2tex(
+    node,
+    output="tex",
+    tex_enclosure="$$",
+    simplify_output=True,
+    source=None,
+    dummy_var="u",
+    tex_multiplier=r"\times",
+    upperscript="ˆ",
+    lowerscript="_",
+    verbose=False,
+    simplify_fractions=False,
+    simplify_ints=True,
+    simplify_multipliers=True,
+):
+    """Convert already parsed Python formulas
+
+    Unlike :func:`~pytexit.pytexit.py2tex`, the formula doesn't go through the
+    string preprocessing and parsing: module prefixes and unicode names are
+    removed on the tree (see :func:`~pytexit.core.core.preprocessing_ast`),
+    and the tree is rendered directly. ``node`` is not modified.
+
+    Parameters
+    ----------
+
+    node: ast.AST, or list of ast.AST
+        an expression (``ast.expr``), a statement (``ast.stmt``), or a parsed
+        ``ast.Module`` / ``ast.Expression``
+
+    output: str
+        see :func:`~pytexit.pytexit.py2tex`
+
+    source: str
+        source code ``node`` was parsed from, if available. Required to write
+        numbers in scientific notation as powers of 10 (the parsed tree has
+        lost the original notation)
+
+    Other Parameters
+    ----------------
+
+    see :func:`~pytexit.pytexit.py2tex`
+
+    Returns
+    -------
+
+    the converted formula; or a list of converted formulas if ``node`` is a
+    list or a Module.
+
+    Examples
+    --------
+
+    ::
+
+        tree = ast.parse("x = np.sqrt(2*pi*k*T_e/m_e)")
+        ast2tex(tree.body[0])
+        >>> $$x=\\sqrt{\\frac{2\\pi k T_e}{m_e}}$$
+
+    """
+
+    if isinstance(node, (list, tuple)):
+        nodes = list(node)
+    elif isinstance(node, (ast.Module, ast.Interactive)):
+        nodes = node.body
+    else:
+        nodes = None
+
+    if output not in visitors:
+        raise ValueError("Unexpected output: {0}".format(output))
+    Visitor = visitors[output](
+        dummy_var=dummy_var,
+        upperscript=upperscript,
+        lowerscript=lowerscript,
+        verbose=verbose,
+        simplify_multipliers=simplify_multipliers,
+        simplify_fractions=simplify_fractions,
+        simplify_ints=simplify_ints,
+        tex_multiplier=tex_multiplier,
+    )
+
+    results = []
+    for n in nodes if nodes is not None else [node]:
+        if isinstance(n, (ast.Expr, ast.Expression)):
+            n = n.value if isinstance(n, ast.Expr) else n.body
+        n = preprocessing_ast(n, source=source, scientific=simplify_output)
+        results.append(
+            render(
+                n,
+                output=output,
+                simplify_output=simplify_output,
+                tex_enclosure=tex_enclosure,
+                visitor=Visitor,
+            )
+        )
+
+    if nodes is None:
+        return results[0]
+    return results
+
+
+def module2tex(
+    path=None,
+    output="tex",
+    tex_enclosure="$$",
+    simplify_output=True,
+    dummy_var="u",
+    tex_multiplier=r"\times",
+    upperscript="ˆ",
+    lowerscript="_",
+    verbose=False,
+    simplify_fractions=False,
+    simplify_ints=True,
+    simplify_multipliers=True,
+    known=None,
+    source=None,
+):
+    """Convert all the formulas of a Python module
+
+    The module is parsed once; assignments, ``return`` expressions and
+    comparisons of every function are found (see
+    :class:`~pytexit.core.source.FormulaFinder`) and rendered with a single
+    visitor.
+
+    Parameters
+    ----------
+
+    path: str
+        ``.py`` file
+
+    output: str
+        see :func:`~pytexit.pytexit.py2tex`
+
+    Other Parameters
+    ----------------
+
+    known: dict
+        conversions already made with the same options (ex: by a previous
+        build), ``{(name, kind, source): output}``. These formulas are not
+        rendered again. See :mod:`~pytexit.build`
+
+    source: str
+        Python source code, converted instead of the ``path`` file
+
+    see :func:`~pytexit.pytexit.py2tex`
+
+    Returns
+    -------
+
+    list of dict, one per formula, with keys:
+
+    - ``name``: qualified name of the function the formula is defined in
+      (``'<module>'`` for module-level formulas)
+    - ``lineno``: line number
+    - ``kind``: ``'assign'``, ``'return'`` or ``'compare'``
+    - ``source``: Python source of the formula
+    - ``output``: converted formula
+
+    Examples
+    --------
+
+    ::
+
+        for f in module2tex("model.py"):
+            print(f["name"], f["lineno"], f["output"])
+
+        module2tex(source="k = A*T**n")
+
+    See Also
+    --------
+
+    :func:`~pytexit.pytexit.py2tex`
+
+    """
+
+    if (path is None) == (source is None):
+        raise ValueError("Give either a path or a source")
+    if source is None:
+        with open(path, "rb") as f:
+            source = f.read().decode("utf-8")
+
+    if output not in visitors:
+        raise ValueError("Unexpected output: {0}".format(output))
+
+    tree = ast.parse(source)
+    tree = preprocessing_ast(tree, source=source, scientific=simplify_output)
+    finder = FormulaFinder()
+    finder.visit(tree)
+
+    Visitor = visitors[output](
+        dummy_var=dummy_var,
+        upperscript=upperscript,
+        lowerscript=lowerscript,
+        verbose=verbose,
+        simplify_multipliers=simplify_multipliers,
+        simplify_fractions=simplify_fractions,
+        simplify_ints=simplify_ints,
+        tex_multiplier=tex_multiplier,
+    )
+
+    lines = source_lines(source)
+    formulas = []
+    for name, kind, node in finder.formulas:
+        segment = source_segment(lines, node)
+        s = known.get((name, kind, segment)) if known else None
+        if s is None:
+            s = render(
+                node,
+                output=output,
+                simplify_output=simplify_output,
+                tex_enclosure=tex_enclosure,
+                visitor=Visitor,
+            )
+        formulas.append(
+            {
+                "name": name,
+                "lineno": node.lineno,
+                "kind": kind,
+                "source": segment,
+                "output": s,
+            }
+        )
+
+    return formulas
+
+
 def for2tex(a, **kwargs):
     """Converts FORTRAN formula to Python Formula
 
@@ -259,16 +903,295 @@ def for2tex(a, **kwargs):
     See Also
     --------
 
-    :func:`~pytexit.core.fortran.for2py`, :func:`~pytexit.pytexit.py2tex`
+    :func:`~pytexit.core.fortran.for2py`, :func:`~pytexit.pytexit.py2tex`,
+    :func:`~pytexit.pytexit.forfile2tex`
 
     """
 
-    from pytexit import py2tex
-
     return py2tex(for2py(a), **kwargs)
 
 
-def multi2tex(a):
+def forfile2tex(
+    path,
+    fixed_form=None,
+    output="tex",
+    tex_enclosure="$$",
+    simplify_output=True,
+    dummy_var="u",
+    tex_multiplier=r"\times",
+    upperscript="ˆ",
+    lowerscript="_",
+    verbose=False,
+    simplify_fractions=False,
+    simplify_ints=True,
+    simplify_multipliers=True,
+    known=None,
+):
+    """Convert all the assignments of a FORTRAN source file
+
+    The file is read as a stream (continuation lines are joined, comments
+    removed, see :func:`~pytexit.core.fortran.read_assignments`) and all
+    assignments are converted with a single visitor.
+
+    Parameters
+    ----------
+
+    path: str
+        ``.f`` / ``.f90`` file
+
+    fixed_form: bool, or ``None``
+        fixed (FORTRAN 77) or free form (FORTRAN 90) source. If ``None``,
+        guessed from the file extension.
+
+    output: str
+        see :func:`~pytexit.pytexit.py2tex`
+
+    Other Parameters
+    ----------------
+
+    known: dict
+        see :func:`~pytexit.pytexit.module2tex`
+
+    see :func:`~pytexit.pytexit.py2tex`
+
+    Returns
+    -------
+
+    list of dict, one per assignment, with keys:
+
+    - ``name``: subroutine / function / program the assignment is defined in
+    - ``lineno``: line number
+    - ``kind``: ``'assign'``
+    - ``source``: FORTRAN statement
+    - ``output``: converted formula, or ``None`` if the statement could not
+      be converted
+    - ``error``: error message if the statement could not be converted
+    - ``condition``: for a logical IF (``IF (c) x = ...``), its condition
+      converted to Python. The assignment only is converted in ``output``.
+
+    See Also
+    --------
+
+    :func:`~pytexit.pytexit.for2tex`, :func:`~pytexit.pytexit.module2tex`
+
+    """
+
+    if output not in visitors:
+        raise ValueError("Unexpected output: {0}".format(output))
+
+    Visitor = visitors[output](
+        dummy_var=dummy_var,
+        upperscript=upperscript,
+        lowerscript=lowerscript,
+        verbose=verbose,
+        simplify_multipliers=simplify_multipliers,
+        simplify_fractions=simplify_fractions,
+        simplify_ints=simplify_ints,
+        tex_multiplier=tex_multiplier,
+    )
+
+    formulas = []
+    for name, lineno, statement in read_assignments(path, fixed_form=fixed_form):
+        formula = {
+            "name": name,
+            "lineno": lineno,
+            "kind": "assign",
+            "source": statement,
+            "output": None,
+        }
+        logical_if = split_logical_if(statement)
+        if logical_if is not None:
+            formula["condition"] = for2py(logical_if[0]).strip()
+        s = known.get((name, "assign", statement)) if known else None
+        if s is not None:
+            formula["output"] = s
+            formulas.append(formula)
+            continue
+        try:
+            expr = preprocess_formula(
+                assignment2py(statement), simplify_output=simplify_output
+            )
+            formula["output"] = render(
+                formula_node(ast.parse(expr)),
+                output=output,
+                simplify_output=simplify_output,
+                tex_enclosure=tex_enclosure,
+                visitor=Visitor,
+            )
+        except Exception as err:  # reported, the other statements are converted
+            formula["error"] = "{0}: {1}".format(type(err).__name__, err)
+        formulas.append(formula)
+
+    return formulas
+
+
+# Formulas pre-processed together by column2tex, if not in parallel
+_column_chunksize = 10000
+
+
+def _column_item2tex(expr, **kwargs):
+    """Convert one formula of a column. Missing values are kept"""
+    if expr is None or expr != expr:  # None, NaN
+        return expr
+    return py2tex(expr, **kwargs)
+
+
+def _column_chunk2tex(exprs, **kwargs):
+    """Convert a chunk of formulas of a column (in a worker process, if in
+    parallel). The formulas of the chunk are pre-processed together"""
+    if kwargs.pop("preprocess", True):
+        strings = [i for i, e in enumerate(exprs) if isinstance(e, six.string_types)]
+        preprocessed = preprocessing_many(
+            [exprs[i] for i in strings],
+            scientific=kwargs.get("simplify_output", True),
+        )
+        exprs = list(exprs)
+        for i, expr in zip(strings, preprocessed):
+            exprs[i] = expr
+    return [_column_item2tex(expr, preprocess=False, **kwargs) for expr in exprs]
+
+
+def _column_categories(converted):
+    """Distinct conversions of a column, and the index of each conversion
+    among them. Different formulas can have the same conversion (ex:
+    ``'a**2'``, ``'(a)**2'``): categories must be unique"""
+    categories, index, remap = [], {}, []
+    for c in converted:
+        if c not in index:
+            index[c] = len(categories)
+            categories.append(c)
+        remap.append(index[c])
+    return categories, remap
+
+
+def column2tex(values, processes=None, **kwargs):
+    """Convert a column of Python formulas, converting each distinct formula
+    only once
+
+    Parameters
+    ----------
+
+    values: pandas Series, NumPy array, or sequence of str
+        formulas. Missing values (``None``, ``NaN``) are kept as is.
+
+    processes: int, or ``None``
+        if given, the distinct formulas are converted in parallel, in
+        ``processes`` worker processes, in chunks balanced by their estimated
+        cost (see :func:`~pytexit.core.cost.balance`). Only worth it for many
+        thousands of distinct formulas.
+
+    Other Parameters
+    ----------------
+
+    kwargs: dict
+        forwarded to :func:`~pytexit.pytexit.py2tex`. Formulas are not printed
+        unless ``print_formula=True`` or ``print_latex=True``.
+
+    Returns
+    -------
+
+    same type as ``values``:
+
+    - a pandas Series is returned as a categorical Series: only the distinct
+      formulas are stored, with one integer code per row.
+    - a NumPy array is returned as an object array, whose rows reference the
+      distinct formulas.
+    - other sequences are returned as a list.
+
+    With a list of outputs (``output=['tex', 'word']``), a pandas Series is
+    returned as a DataFrame, with one categorical column per output. Other
+    values hold a dictionary ``{output: formula}`` per row.
+
+    Examples
+    --------
+
+    ::
+
+        df["latex"] = column2tex(df["formula"])
+
+    See Also
+    --------
+
+    :func:`~pytexit.pytexit.py2tex`
+
+    """
+
+    kwargs.setdefault("print_latex", False)
+    kwargs.setdefault("print_formula", False)
+
+    def convert_all(uniques):
+        if processes is None or len(uniques) < 2:
+            out = []
+            for i in range(0, len(uniques), _column_chunksize):
+                chunk = uniques[i : i + _column_chunksize]
+                out.extend(_column_chunk2tex(chunk, **kwargs))
+            return out
+        # Chunks of about the same estimated cost, the most expensive first,
+        # so that no worker is left with all the long formulas
+        costs = [estimate_cost(u) if isinstance(u, str) else 0 for u in uniques]
+        chunks = balance(costs, 4 * processes)
+        pool = multiprocessing.Pool(processes)
+        try:
+            converted = pool.map(
+                functools.partial(_column_chunk2tex, **kwargs),
+                [[uniques[i] for i in chunk] for chunk in chunks],
+                chunksize=1,
+            )
+        finally:
+            pool.close()
+            pool.join()
+        out = [None] * len(uniques)
+        for chunk, results in zip(chunks, converted):
+            for i, result in zip(chunk, results):
+                out[i] = result
+        return out
+
+    if hasattr(values, "factorize"):  # pandas Series
+        import numpy as np
+        import pandas as pd
+
+        codes, uniques = pd.factorize(values)  # missing values have code -1
+        converted = convert_all(list(uniques))
+
+        def categorical(converted, name):
+            categories, remap = _column_categories(converted)
+            remap = np.array(remap + [-1])
+            return pd.Series(
+                pd.Categorical.from_codes(remap[codes], categories),
+                index=values.index,
+                name=name,
+            )
+
+        output = kwargs.get("output", "tex")
+        if isinstance(output, six.string_types):
+            return categorical(converted, values.name)
+        # dictionaries can't be categories: one column per output
+        return pd.DataFrame(
+            {o: categorical([c[o] for c in converted], o) for o in output},
+            index=values.index,
+            columns=list(output),
+        )
+
+    if hasattr(values, "dtype"):  # NumPy array
+        shape = values.shape
+        values = values.ravel()
+    uniques = {}
+    for v in values:
+        if v is not None and v == v and v not in uniques:
+            uniques[v] = None
+    uniques = dict(zip(uniques, convert_all(list(uniques))))
+    out = [uniques.get(v, v) if v is not None and v == v else v for v in values]
+
+    if hasattr(values, "dtype"):  # NumPy array
+        import numpy as np
+
+        array = np.empty(len(out), dtype=object)
+        array[:] = out
+        return array.reshape(shape)
+    return out
+
+
+def multi2tex(a, **kwargs):
     """Converts a string with multiple Python formulas separated by new-line characters to LaTeX
 
     Parameters
@@ -276,6 +1199,12 @@ def multi2tex(a):
 
     a: str
         Multi-line Python formula
+
+    Other Parameters
+    ----------------
+
+    kwargs: dict
+        forwarded to :func:`~pytexit.pytexit.py2tex` (ex: ``cache``)
     
     Returns
     --------
@@ -291,10 +1220,16 @@ def multi2tex(a):
     """
     
     code_arr = a.split('\n')
+    if kwargs.pop("preprocess", True):
+        # pre-process all the lines at once
+        code_arr = preprocessing_many(
+            code_arr, scientific=kwargs.get("simplify_output", True)
+        )
+    kwargs["preprocess"] = False
     tex_arr = [""] * len(code_arr)
     
     for i in range(len(code_arr)):
-        tex_arr[i] = py2tex(code_arr[i])
+        tex_arr[i] = py2tex(code_arr[i], **kwargs)
         
     output = '\n'.join(tex_arr)
     
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Sphinx extension: convert Python formulas at build time
+
+Add it to the extensions of ``conf.py``, with a math renderer::
+
+    extensions = ["sphinx.ext.mathjax", "pytexit.sphinxext"]
+
+then write formulas in Python, in a directive (one formula per line; several
+formulas are aligned on their ``=`` sign)::
+
+    .. py2tex::
+
+        k = A*T**n*exp(-E_a/(R*T))
+        r = k*c_A*c_B
+
+or inline, with the role: ``:py2tex:`sqrt(2*pi*k*T_e/m_e)```.
+
+Options of the directive: ``:output: compact`` for a shorter LaTeX output,
+``:label:`` to reference the equation, ``:nowrap:``. The ``pytexit_options``
+configuration value sets default options of
+:func:`~pytexit.pytexit.py2tex` (ex: ``{"simplify_fractions": True}``).
+
+Conversions are stored in the build environment, keyed by the canonical
+formula (see :func:`~pytexit.cache.canonical`) and the options: incremental
+builds only convert new or changed formulas. The extension is safe for
+parallel builds (``sphinx-build -j N``).
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from docutils import nodes
+from docutils.parsers.rst import directives
+from sphinx.util.docutils import SphinxDirective
+
+from .cache import canonical
+from .magic import align
+from .pytexit import py2tex, tex_outputs
+
+# Bump when conversions stored in the build environment become invalid
+ENV_VERSION = 1
+
+
+def current_docname(env):
+    """Name of the document being read"""
+    if hasattr(env, "current_document"):  # Sphinx >= 8.2
+        return env.current_document.docname
+    return env.docname
+
+
+def conversions(env):
+    """Conversions of the build environment: ``{key: latex}``"""
+    if not hasattr(env, "pytexit_conversions"):
+        env.pytexit_conversions = {}
+        env.pytexit_used = {}  # docname -> set of keys
+    return env.pytexit_conversions
+
+
+def convert(env, expr, **options):
+    """LaTeX of a formula, from the build environment if already converted"""
+    from . import __version__
+
+    options = dict(env.config.pytexit_options, **options)
+    key = (canonical(expr), tuple(sorted(options.items())), __version__)
+    stored = conversions(env)
+    latex = stored.get(key)
+    if latex is None:
+        latex = py2tex(
+            expr, print_latex=False, print_formula=False, tex_enclosure="", **options
+        )
+        stored[key] = latex
+    env.pytexit_used.setdefault(current_docname(env), set()).add(key)
+    return latex
+
+
+class Py2TexDirective(SphinxDirective):
+    """``.. py2tex::`` directive: a block of Python formulas, one per line"""
+
+    has_content = True
+    required_arguments = 0
+    optional_arguments = 1
+    final_argument_whitespace = True
+    option_spec = {
+        "output": lambda arg: directives.choice(arg, tex_outputs),
+        "label": directives.unchanged,
+        "nowrap": directives.flag,
+    }
+
+    def run(self):
+        exprs = list(self.arguments) + [line for line in self.content if line.strip()]
+        options = {}
+        if "output" in self.options:
+            options["output"] = self.options["output"]
+        try:
+            lines = [convert(self.env, expr, **options) for expr in exprs]
+        except (SyntaxError, ValueError) as err:
+            raise self.error("py2tex: can't convert formula: {0}".format(err))
+        if len(lines) > 1:
+            latex = "\\begin{aligned}\n" + "\\\\\n".join(map(align, lines))
+            latex += "\n\\end{aligned}"
+        else:
+            latex = lines[0] if lines else ""
+
+        node = nodes.math_block(
+            latex,
+            latex,
+            docname=current_docname(self.env),
+            number=None,
+            label=self.options.get("label"),
+            nowrap="nowrap" in self.options,
+        )
+        self.add_name(node)
+        self.set_source_info(node)
+        result = [node]
+        if node["label"]:
+            # numbered and referenced like a math directive
+            domain = self.env.get_domain("math")
+            domain.note_equation(
+                current_docname(self.env), node["label"], location=node
+            )
+            node["number"] = domain.get_equation_number_for(node["label"])
+            node_id = nodes.make_id("equation-" + node["label"])
+            target = nodes.target("", "", ids=[node_id])
+            self.state.document.note_explicit_target(target)
+            result.insert(0, target)
+        return result
+
+
+def py2tex_role(name, rawtext, text, lineno, inliner, options=None, content=None):
+    """``:py2tex:`formula``` role: an inline Python formula"""
+    env = inliner.document.settings.env
+    try:
+        latex = convert(env, text)
+    except (SyntaxError, ValueError) as err:
+        msg = inliner.reporter.error(
+            "py2tex: can't convert formula {0!r}: {1}".format(text, err), line=lineno
+        )
+        problem = inliner.problematic(rawtext, rawtext, msg)
+        return [problem], [msg]
+    return [nodes.math(rawtext, latex)], []
+
+
+def purge_doc(app, env, docname):
+    """A document is read again: forget which conversions it used. The
+    conversions are kept, so that unchanged formulas are not converted
+    again"""
+    conversions(env)
+    env.pytexit_used.pop(docname, None)
+
+
+def merge_info(app, env, docnames, other):
+    """Merge the conversions of a parallel reader"""
+    conversions(env).update(conversions(other))
+    for docname in docnames:
+        if docname in other.pytexit_used:
+            env.pytexit_used[docname] = other.pytexit_used[docname]
+
+
+def prune(app, env):
+    """Drop the conversions no document uses anymore"""
+    stored = conversions(env)
+    used = set()
+    for keys in env.pytexit_used.values():
+        used |= keys
+    for key in set(stored) - used:
+        del stored[key]
+    return []
+
+
+def setup(app):
+    from . import __version__
+
+    app.add_config_value("pytexit_options", {}, "env")
+    app.add_directive("py2tex", Py2TexDirective)
+    app.add_role("py2tex", py2tex_role)
+    app.connect("env-purge-doc", purge_doc)
+    app.connect("env-merge-info", merge_info)
+    app.connect("env-updated", prune)
+    return {
+        "version": __version__,
+        "env_version": ENV_VERSION,
+        "parallel_read_safe": True,
+        "parallel_write_safe": True,
+    }
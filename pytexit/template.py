@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Formula templates: convert a formula once, render it many times with
+numeric values substituted for some of its variables
+
+Examples
+--------
+
+::
+
+    from pytexit import compile_template
+
+    t = compile_template("E = m*c**2", ["m"])
+    t.render({"m": 2})
+    >>> $$E=2c^2$$
+    t.render_many({"m": [1, 2, 3]})
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import ast
+import re
+
+import six
+
+from .core.core import preprocessing, replace_scientific
+from .pytexit import formula_node, render, visitors, xml_outputs
+
+
+class _Substitute(ast.NodeTransformer):
+    """Replace the placeholder variables with sentinel numbers"""
+
+    def __init__(self, sentinels):
+        super(_Substitute, self).__init__()
+        self.sentinels = sentinels
+
+    def visit_Name(self, n):
+        if n.id in self.sentinels:
+            return ast.copy_location(ast.Constant(value=self.sentinels[n.id]), n)
+        return n
+
+
+def sentinel(i):
+    """Number that stands for the i-th placeholder during the conversion. It
+    is rendered as a number (the visitor places it as it would place the
+    values), but can't be confused with the rest of the formula"""
+    return float("7.{0:03d}31e-222".format(i))
+
+
+class FormulaTemplate(object):
+    """A formula converted once, with placeholders for some of its variables.
+    Created by :func:`~pytexit.template.compile_template`
+
+    Rendering only formats the values and joins them with the fixed parts of
+    the converted formula.
+
+    Negative values are enclosed in parenthesis when needed (ex: after an
+    operator, or as the base of a power). Note that the values are not
+    simplified the way :func:`~pytexit.pytexit.py2tex` simplifies numbers
+    written in the formula.
+
+    """
+
+    def __init__(self, parts, slots, output="tex", precision=None):
+        self.parts = parts
+        self.slots = slots
+        self.output = output
+        self.precision = precision
+        self.variables = sorted(set(name for _, name, _ in slots))
+
+    def format(self, value, protect=False):
+        """Write a number
+
+        Parameters
+        ----------
+
+        value: number
+
+        protect: bool
+            if ``True``, enclose negative numbers in parenthesis
+        """
+        value = float(value)
+        if value.is_integer() and abs(value) < 1e16:
+            s = "%d" % value
+        elif self.precision is not None:
+            s = "%.*g" % (self.precision, value)
+        else:
+            s = repr(value)
+
+        if self.output in xml_outputs:
+            return s
+
+        if "e" in s:  # scientific notation -> power of 10
+            mantissa, exponent = s.split("e")
+            exponent = "%d" % int(exponent)
+            if self.output == "word":
+                s = "{0}\\cdot10^({1})".format(mantissa, exponent)
+            elif float(mantissa) == 1.0:
+                s = "{10}^{%s}" % exponent
+            else:
+                s = "%s\\times{10}^{%s}" % (mantissa, exponent)
+
+        if protect and value < 0:
+            if self.output == "tex":
+                s = r"\left({0}\right)".format(s)
+            else:
+                s = "({0})".format(s)
+        return s
+
+    def render(self, values=None, **kwargs):
+        """Render the formula with the values of the placeholder variables
+
+        Parameters
+        ----------
+
+        values: dict
+            ``{variable: number}``. Values can also be given as keywords.
+
+        """
+        if values is None:
+            values = kwargs
+        elif kwargs:
+            values = dict(values, **kwargs)
+        out = list(self.parts)
+        for index, name, protect in self.slots:
+            out[index] = self.format(values[name], protect)
+        return "".join(out)
+
+    def render_many(self, values):
+        """Render the formula for many sets of values
+
+        Parameters
+        ----------
+
+        values: dict of sequences, or sequence of dicts
+            ``{variable: [numbers]}`` (ex: a dictionary of NumPy arrays, or a
+            pandas DataFrame), or ``[{variable: number}]``
+
+        Returns
+        -------
+
+        list of str
+
+        """
+        if isinstance(values, dict) or hasattr(values, "columns"):
+            columns = [values[name] for name in self.variables]
+            rows = (dict(zip(self.variables, row)) for row in zip(*columns))
+        else:
+            rows = values
+        return [self.render(row) for row in rows]
+
+    def __repr__(self):
+        return "<FormulaTemplate {0!r} ({1})>".format(
+            "".join(p if p is not None else "{%s}" % n for p, n in self._named()),
+            ", ".join(self.variables),
+        )
+
+    def _named(self):
+        names = {index: name for index, name, _ in self.slots}
+        return [(p, names.get(i)) for i, p in enumerate(self.parts)]
+
+
+def _is_protected(before, after):
+    """Returns ``True`` if a negative number placed between ``before`` and
+    ``after`` needs parenthesis"""
+    if after.startswith(("^", "}^")):  # base of a power
+        return True
+    before = before.rstrip()
+    if not before.strip("$") or before.endswith(("=", "(", "{", ",", "<", ">")):
+        return False
+    return True
+
+
+def compile_template(
+    expr,
+    variables,
+    output="tex",
+    precision=None,
+    tex_enclosure="$$",
+    simplify_output=True,
+    dummy_var="u",
+    tex_multiplier=r"\times",
+    upperscript="ˆ",
+    lowerscript="_",
+    verbose=False,
+    simplify_fractions=False,
+    simplify_ints=True,
+    simplify_multipliers=True,
+):
+    """Convert a formula once, with placeholders for some of its variables
+
+    Parameters
+    ----------
+
+    expr: str
+        Python formula
+
+    variables: list of str
+        names of the variables that will be replaced with numbers
+
+    output: str
+        see :func:`~pytexit.pytexit.py2tex`
+
+    precision: int, or ``None``
+        number of significant digits of the values. If ``None``, values are
+        written in full.
+
+    Other Parameters
+    ----------------
+
+    see :func:`~pytexit.pytexit.py2tex`
+
+    Returns
+    -------
+
+    :class:`~pytexit.template.FormulaTemplate`
+
+    Examples
+    --------
+
+    ::
+
+        t = compile_template("Re_x=(rho*v*x)/mu", ["v", "x"])
+        t.render({"v": 2.5, "x": 0.1})
+        >>> $$Re_x=\\frac{\\rho 2.5\\times0.1}{\\mu}$$
+
+    """
+
+    if isinstance(variables, six.string_types):
+        variables = [variables]
+    if output not in visitors:
+        raise ValueError("Unexpected output: {0}".format(output))
+
+    expr = preprocessing(expr)
+    if simplify_output:
+        expr = replace_scientific(expr)
+    node = formula_node(ast.parse(expr))
+
+    sentinels = {name: sentinel(i) for i, name in enumerate(variables)}
+    node = _Substitute(sentinels).visit(node)
+
+    s = render(
+        node,
+        output=output,
+        simplify_output=simplify_output,
+        tex_enclosure=tex_enclosure,
+        dummy_var=dummy_var,
+        upperscript=upperscript,
+        lowerscript=lowerscript,
+        verbose=verbose,
+        simplify_multipliers=simplify_multipliers,
+        simplify_fractions=simplify_fractions,
+        simplify_ints=simplify_ints,
+        tex_multiplier=tex_multiplier,
+    )
+
+    # Split the converted formula around the placeholders
+    names = {str(v): k for k, v in sentinels.items()}
+    split = re.split("({0})".format("|".join(map(re.escape, names))), s)
+    parts, slots = [], []
+    for i, p in enumerate(split):
+        if i % 2 == 0:
+            parts.append(p)
+        else:
+            parts.append(None)
+            protect = output not in xml_outputs and _is_protected(
+                split[i - 1], split[i + 1]
+            )
+            slots.append((len(parts) - 1, names[p], protect))
+
+    return FormulaTemplate(parts, slots, output=output, precision=precision)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Test the asyncio API
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from pytexit import py2tex
+from pytexit.aio import apy2tex, apy2tex_many
+from pytexit.test.test_compact import corpus
+
+
+def test_apy2tex(verbose=True, **kwargs):
+
+    expected = [py2tex(expr, print_latex=False, print_formula=False) for expr in corpus]
+
+    async def run():
+        assert await apy2tex(corpus[0]) == expected[0]
+        assert await apy2tex_many(corpus, concurrency=2) == expected
+        with ProcessPoolExecutor(2) as executor:
+            assert await apy2tex_many(corpus, executor=executor) == expected
+        # errors
+        out = await apy2tex_many(["a+", "a"], return_exceptions=True)
+        assert isinstance(out[0], SyntaxError) and out[1] == "$$a$$"
+        # not only strings
+        out = await apy2tex_many([lambda x: x**2, "a"])
+        assert out == ["$$x^2$$", "$$a$$"]
+
+    asyncio.run(run())
+
+
+class SlowExecutor(ThreadPoolExecutor):
+    """Thread pool of slow conversions, that counts the conversions running
+    at once"""
+
+    def __init__(self, *args, **kwargs):
+        super(SlowExecutor, self).__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.running = self.peak = 0
+
+    def submit(self, fn, *args, **kwargs):
+        def run():
+            with self.lock:
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            try:
+                time.sleep(0.05)
+                return fn(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.running -= 1
+
+        return super(SlowExecutor, self).submit(run)
+
+
+def test_apy2tex_bounded(verbose=True, **kwargs):
+    """Conversions that time out keep their slot until they end"""
+
+    async def run():
+        with SlowExecutor(4) as executor:
+            out = await apy2tex_many(
+                corpus[:4],
+                executor=executor,
+                concurrency=1,
+                timeout=0.01,
+                return_exceptions=True,
+            )
+            assert all(isinstance(r, asyncio.TimeoutError) for r in out)
+        return executor.peak
+
+    assert asyncio.run(run()) == 1
+
+
+def test_apy2tex_responsive(verbose=True, **kwargs):
+    """The loop keeps running while formulas are converted, and conversions
+    can be cancelled"""
+
+    exprs = corpus * 20
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(None)
+            await asyncio.sleep(0.001)
+
+    async def run():
+        t = asyncio.ensure_future(ticker())
+        await apy2tex_many(exprs, concurrency=2)
+        # cancellation
+        task = asyncio.ensure_future(apy2tex_many(exprs * 10, concurrency=1))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        else:
+            raise AssertionError("not cancelled")
+        t.cancel()
+
+    asyncio.run(run())
+    if verbose:
+        print("{0} ticks".format(len(ticks)))
+    assert len(ticks) > 5
+
+
+if __name__ == "__main__":
+
+    test_apy2tex()
+    test_apy2tex_bounded()
+    test_apy2tex_responsive()
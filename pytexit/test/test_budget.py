@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Test the rendering budget
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from pytexit import BudgetExceeded, RenderBudget, py2tex
+from pytexit.test.test_compact import corpus
+
+
+def nested_divisions(n):
+    """A formula whose rendering time doubles with each division"""
+    expr = "x"
+    for _ in range(n):
+        expr = "({0})/a".format(expr)
+    return expr
+
+
+def test_budget(verbose=True, **kwargs):
+
+    # usual formulas fit in a reasonable budget
+    budget = RenderBudget(max_nodes=1000, max_length=1000, max_time=1)
+    for expr in corpus:
+        assert py2tex(expr, print_latex=False, budget=budget) == py2tex(
+            expr, print_latex=False
+        )
+
+    expr = nested_divisions(30)
+    for limit, budget in [
+        ("max_nodes", RenderBudget(max_nodes=10000)),
+        ("max_time", RenderBudget(max_time=0.01)),
+        ("max_length", RenderBudget(max_length=50)),
+    ]:
+        try:
+            py2tex(expr, print_latex=False, budget=budget)
+        except BudgetExceeded as err:
+            if verbose:
+                print(err)
+            assert err.limit == limit
+            assert err.used["time"] < 1
+            assert isinstance(err, ValueError)
+        else:
+            raise AssertionError("budget not exceeded")
+
+    try:
+        py2tex("a+b+c", print_latex=False, budget=RenderBudget(max_nodes=3))
+    except BudgetExceeded as err:
+        assert err.used["nodes"] == 4
+    else:
+        raise AssertionError("budget not exceeded")
+
+
+if __name__ == "__main__":
+
+    test_budget()
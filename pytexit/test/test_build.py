@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Test the incremental build of LaTeX appendices
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from pytexit.build import build, watch, write_atomic
+from pytexit.cli import main
+
+sources = {
+    "list.txt": "a = b**2\n# comment\nx/(a+b)\n",
+    "model.py": "def f(T):\n    k = A*T**n\n    return k*exp(-E/T)\n",
+    "rates.f": "      subroutine r(T)\n      k = 1.0d-2*dexp(-1d3/T)\n      end\n",
+}
+
+
+def write(path, text):
+    with io.open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def read(path):
+    with io.open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_build(verbose=True, **kwargs):
+
+    tmp = tempfile.mkdtemp()
+    try:
+        src = os.path.join(tmp, "src")
+        os.makedirs(src)
+        for name, text in sources.items():
+            write(os.path.join(src, name), text)
+        out = os.path.join(tmp, "appendix.tex")
+
+        report = build([src], out)
+        assert len(report["converted"]) == 3 and report["rendered"] == 5
+        document = read(out)
+        if verbose:
+            print(document)
+        assert "a=b^2" in document and r"k={10}^{-2}e^{" in document
+
+        # nothing changed
+        report = build([src], out)
+        assert report["converted"] == [] and len(report["reused"]) == 3
+        assert read(out) == document
+
+        # only the new formula is rendered
+        write(os.path.join(src, "list.txt"), sources["list.txt"] + "y = sqrt(z)\n")
+        report = build([src], out)
+        assert report["converted"] == [os.path.join(src, "list.txt")]
+        assert report["rendered"] == 1 and report["formulas"] == 6
+        assert r"y=\sqrt{z}" in read(out)
+
+        # options changed: everything is converted again
+        report = build([src], out, output="compact")
+        assert len(report["converted"]) == 3 and report["rendered"] == 6
+
+        # removed source
+        os.remove(os.path.join(src, "rates.f"))
+        report = build([src], out, output="compact")
+        assert report["removed"] == [os.path.join(src, "rates.f")]
+        assert "subroutine" not in read(out) and "rates.f" not in read(out)
+
+        # LaTeX outputs only
+        try:
+            build([src], out, output="mathml")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("mathml appendix")
+
+        # command line
+        assert main(["--build", src, "-o", out]) == 0
+        assert read(out).startswith(r"\section*{")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_write_atomic(verbose=True, **kwargs):
+    """Written files keep their permissions"""
+
+    if os.name == "nt":
+        return
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "appendix.tex")
+        write(os.path.join(tmp, "default"), "")  # default permissions
+        write_atomic(path, "a")
+        assert read(path) == "a"
+        assert os.stat(path).st_mode == os.stat(os.path.join(tmp, "default")).st_mode
+        os.chmod(path, 0o640)
+        write_atomic(path, "b")
+        assert read(path) == "b"
+        assert os.stat(path).st_mode & 0o777 == 0o640
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_watch(verbose=True, **kwargs):
+    """A burst of changes gives a single build"""
+
+    tmp = tempfile.mkdtemp()
+    reports = []
+    done = threading.Event()
+    try:
+        path = os.path.join(tmp, "list.txt")
+        out = os.path.join(tmp, "appendix.tex")
+        write(path, "a = b**2\n")
+
+        thread = threading.Thread(
+            target=watch,
+            args=([path], out),
+            kwargs=dict(
+                interval=0.05, debounce=0.2, callback=reports.append, stop=done.is_set
+            ),
+        )
+        thread.start()
+        try:
+            while not reports:
+                time.sleep(0.01)
+            for i in range(5):  # burst of saves
+                write(path, "a = b**2\n" + "".join("x_%d = 1\n" % j for j in range(i)))
+                time.sleep(0.05)
+            deadline = time.time() + 10
+            while len(reports) < 2 and time.time() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.5)
+        finally:
+            done.set()
+            thread.join()
+
+        if verbose:
+            print(reports)
+        assert len(reports) == 2
+        assert reports[1]["rendered"] == 4  # x_0..x_3; a = b**2 is known
+        assert "x_3=1" in read(out)
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_watch_errors(verbose=True, **kwargs):
+    """A failed build doesn't stop watching"""
+
+    tmp = tempfile.mkdtemp()
+    reports = []
+    done = threading.Event()
+    try:
+        path = os.path.join(tmp, "list.txt")
+        out = os.path.join(tmp, "appendix.tex")
+        with open(path, "wb") as f:
+            f.write(b"a = b\xff\n")  # not UTF-8
+
+        thread = threading.Thread(
+            target=watch,
+            args=([path], out),
+            kwargs=dict(
+                interval=0.05, debounce=0.1, callback=reports.append, stop=done.is_set
+            ),
+        )
+        thread.start()
+        try:
+            time.sleep(0.3)
+            assert thread.is_alive() and not reports
+            write(path, "a = b**2\n")
+            deadline = time.time() + 10
+            while not reports and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            done.set()
+            thread.join()
+
+        assert len(reports) == 1
+        assert "a=b^2" in read(out)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+
+    test_build()
+    test_write_atomic()
+    test_watch()
+    test_watch_errors()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Test the fault-tolerant bulk conversion
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from pytexit.bulk import run_bulk
+
+# Runs a bulk job in another process, and kills it (without any cleanup)
+# after `limit` conversions, or when it converts the formula 'boom'
+crashing_job = """
+import os, sys
+import pytexit.bulk
+
+convert = pytexit.bulk.py2tex
+count = [0]
+
+def py2tex(expr, **kwargs):
+    count[0] += 1
+    if expr == "boom" or count[0] > int(sys.argv[3]):
+        os._exit(1)
+    return convert(expr, **kwargs)
+
+pytexit.bulk.py2tex = py2tex
+pytexit.bulk.run_bulk(sys.argv[1], sys.argv[2], checkpoint_every=5)
+"""
+
+
+def run_crashing_job(source, output_file, limit=10**6):
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env["PYTHONPATH"] = root + os.pathsep + env.get("PYTHONPATH", "")
+    return subprocess.call(
+        [sys.executable, "-c", crashing_job, source, output_file, str(limit)], env=env
+    )
+
+
+def read_records(path):
+    with io.open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_bulk(verbose=True, **kwargs):
+
+    tmp = tempfile.mkdtemp()
+    try:
+        source = os.path.join(tmp, "formulas.txt")
+        exprs = ["x_{0} = a**{0}/b".format(i) for i in range(40)]
+        exprs[3] = "# comment"
+        exprs[7] = "x = (a"
+        with io.open(source, "w", encoding="utf-8") as f:
+            f.write("\n".join(exprs) + "\n")
+
+        reference = os.path.join(tmp, "reference.jsonl")
+        report = run_bulk(source, reference, checkpoint_every=5)
+        assert report == {"converted": 38, "errors": 1, "resumed": 0, "total": 40}
+        records = read_records(reference)
+        assert [r["line"] for r in records] == [i for i in range(1, 41) if i != 4]
+        assert records[6]["formula"] == "x = (a"
+        assert records[6]["error"].startswith("SyntaxError")
+        # done: nothing to do again
+        assert run_bulk(source, reference, checkpoint_every=5)["converted"] == 0
+
+        # killed after 12 conversions: resumed from the last checkpoint
+        out = os.path.join(tmp, "out.jsonl")
+        assert run_crashing_job(source, out, limit=12) != 0
+        report = run_bulk(source, out, checkpoint_every=5)
+        if verbose:
+            print(report)
+        assert report["resumed"] == 10 and report["total"] == 40
+        assert read_records(out) == records
+
+        # another job can't resume this one
+        try:
+            run_bulk(source, out, output="compact")
+        except ValueError as err:
+            if verbose:
+                print(err)
+        else:
+            raise AssertionError("resumed with other options")
+        os.remove(out + ".checkpoint")
+        try:
+            run_bulk(source, out)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("output overwritten")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_bulk_poison(verbose=True, **kwargs):
+    """A formula that kills the job every time is found, and skipped"""
+
+    tmp = tempfile.mkdtemp()
+    try:
+        source = os.path.join(tmp, "formulas.txt")
+        exprs = ["x_{0} = a**{0}/b".format(i) for i in range(20)]
+        exprs[12] = "boom"
+        with io.open(source, "w", encoding="utf-8") as f:
+            f.write("\n".join(exprs) + "\n")
+
+        out = os.path.join(tmp, "out.jsonl")
+        runs = 1
+        while run_crashing_job(source, out) != 0:
+            runs += 1
+            assert runs < 10
+        if verbose:
+            print("{0} runs".format(runs))
+        records = read_records(out)
+        assert [r["line"] for r in records] == list(range(1, 21))
+        assert "stopped the job" in records[12]["error"]
+        assert all("latex" in r for r in records[:12] + records[13:])
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+
+    test_bulk()
+    test_bulk_poison()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Test the persistent cache of conversions
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from pytexit import for2tex, multi2tex, py2tex
+from pytexit.cache import DiskCache, canonical, parse_size
+from pytexit.test.test_compact import corpus
+
+
+def _convert_all(path):
+    cache = DiskCache(path)
+    out = [py2tex(expr, print_latex=False, cache=cache) for expr in corpus]
+    cache.close()
+    return out
+
+
+def test_cache(verbose=True, **kwargs):
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "cache.sqlite")
+        cache = DiskCache(path)
+
+        expected = [py2tex(expr, print_latex=False) for expr in corpus]
+        for _ in range(2):
+            assert [
+                py2tex(expr, print_latex=False, cache=cache) for expr in corpus
+            ] == expected
+        assert cache.hits == len(corpus) and cache.misses == len(corpus)
+
+        # options and whitespace
+        assert py2tex("a*2", print_latex=False, cache=cache) == "$$2a$$"
+        assert py2tex("a * 2", print_latex=False, cache=cache) == "$$2a$$"
+        assert cache.hits == len(corpus) + 1
+        assert (
+            py2tex("a*2", print_latex=False, simplify_multipliers=False, cache=cache)
+            == r"$$a\times2$$"
+        )
+        assert py2tex("a*2", output=["tex", "word"], cache=cache) == py2tex(
+            "a*2", output=["tex", "word"]
+        )
+        assert for2tex("x=1.0d-2*T", cache=cache) == for2tex("x=1.0d-2*T")
+        assert multi2tex("a=1\nb=2", cache=cache) == multi2tex("a=1\nb=2")
+        assert canonical(" a  *\t2 ") == "a*2"
+        assert canonical("not  x") == "not x"
+
+        # persistence, and concurrent processes
+        cache.close()
+        pool = multiprocessing.Pool(2)
+        try:
+            assert pool.map(_convert_all, [path] * 4) == [expected] * 4
+        finally:
+            pool.close()
+            pool.join()
+
+        # size-based eviction
+        cache = DiskCache(path)
+        if verbose:
+            print(cache.info())
+        size = cache.size()
+        assert cache.prune(size) == 0
+        assert cache.prune(size // 2) > 0
+        assert cache.size() <= size // 2
+        cache.clear()
+        assert len(cache) == 0
+        cache.close()
+    finally:
+        shutil.rmtree(directory)
+
+    assert parse_size("50M") == 50000000
+    assert parse_size("1.5kB") == 1500
+
+
+if __name__ == "__main__":
+
+    test_cache()
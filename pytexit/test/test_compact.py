@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Test the compact LaTeX output
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import re
+
+from pytexit import py2tex
+from pytexit.core.compact import builtin_operators, is_enclosed
+from pytexit.pytexit import uprint
+
+corpus = [
+    r"Re_x=(rho*v*x)/mu",
+    r"2*sqrt(2*pi*k*T_e/m_e)*(DeltaE/(k*T_e))**2*a_0**2",
+    r"f(x**2/y**3)",
+    r"arctanh(x/sqrt(x))",
+    r"quad(f,0,np.inf)",
+    r"1<2<a<=5",
+    r"np.std([f(i) for i in range(21)])",
+    r"np.sum([i**2 for i in range(1,101)])==338350",
+    r"(a**b)**c",
+    r"-x**2",
+    r"-(x**2+y**2)",
+    r"-(x+y)**2",
+    r"(3/4)" + "/" + "(8/15)",
+    r"a-(b-(c-d))",
+    r"a=(x+y)-(x-y)",
+    r"b=-(3*x-2*y)",
+    r"x/(a+b)**2",
+    r"max(a, b)",
+    r"sqrt(x)+sqrt(2)",
+    r"k_i__1_i__2ˆj__1ˆj__2",
+    r"5*25**2/4",
+    r"log(2)+cos(x)*exp(a+b)",
+    r"x**10+y**z",
+]
+
+
+# TeX tokens: control words, control symbols, characters (spaces ignored)
+_tex_token = re.compile(r"\\[a-zA-Z]+|\\.|\S")
+
+
+def normalize(s):
+    """Reduce a LaTeX formula to a list of tokens where equivalent outputs
+    compare equal: delimiter sizing, braces around a single token (``x^{2}``
+    and ``x^2``) and spaces are ignored. Other braces are kept: ``x^{10}`` and
+    ``x^10`` differ"""
+    s = s.replace(r"\left", "").replace(r"\right", "")
+    for op in builtin_operators:
+        s = s.replace(r"\operatorname{%s}" % op, "\\" + op)
+    tokens = _tex_token.findall(s)
+    while True:
+        out, i = [], 0
+        while i < len(tokens):
+            if tokens[i : i + 3 : 2] == ["{", "}"] and tokens[i + 1] not in "{}":
+                out.append(tokens[i + 1])
+                i += 3
+            else:
+                out.append(tokens[i])
+                i += 1
+        if out == tokens:
+            return tokens
+        tokens = out
+
+
+def test_compact_equivalent(verbose=True, **kwargs):
+    """Compact and normal output are semantically equivalent, and compact
+    output is never longer"""
+
+    size_tex, size_compact = 0, 0
+    for expr in corpus:
+        s = py2tex(expr, print_latex=False, print_formula=False)
+        c = py2tex(expr, output="compact", print_latex=False, print_formula=False)
+        if verbose:
+            uprint(s)
+            uprint(c)
+        assert normalize(s) == normalize(c)
+        assert len(c) <= len(s)
+        size_tex += len(s)
+        size_compact += len(c)
+
+    if verbose:
+        print(
+            "Compact output: {0} chars instead of {1} ({2:.0f}% saved)".format(
+                size_compact, size_tex, 100 * (1 - size_compact / size_tex)
+            )
+        )
+    assert size_compact < size_tex
+
+
+def test_compact_output(verbose=True, **kwargs):
+
+    assert py2tex("x/(a+b)**2", output="compact") == r"$$\frac x{(a+b)^2}$$"
+    assert py2tex("1/2", output="compact") == r"$$\frac12$$"
+    assert py2tex("max(a, b)", output="compact") == r"$$\max(a, b)$$"
+    # parenthesis around tall constructs are still sized:
+    assert (
+        py2tex("(DeltaE/(k*T_e))**2", output="compact")
+        == r"$$\left(\frac{\Delta E}{k T_e}\right)^2$$"
+    )
+    # subscripts keep their group:
+    assert py2tex("a_0**2", output="compact") == r"$${a_0}^2$$"
+    # as the LaTeX output, no parenthesis around numbers
+    assert py2tex("log(2)", output="compact") == r"$$\ln2$$"
+    assert py2tex("log(x)", output="compact") == r"$$\ln(x)$$"
+    assert py2tex("x**10", output="compact") == r"$$x^{10}$$"
+
+    # braces are compared, unless around a single token
+    assert normalize("x^{2}") == normalize("x^2")
+    assert normalize("x^{10}") != normalize("x^10")
+    assert normalize(r"\frac{x}{\left(a+b\right)^2}") == normalize(r"\frac x{(a+b)^2}")
+
+    assert is_enclosed("(a+b)")
+    assert not is_enclosed("(a)+(b)")
+
+
+if __name__ == "__main__":
+
+    test_compact_equivalent()
+    test_compact_output()
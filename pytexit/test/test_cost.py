@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Test the estimation of rendering costs, and the scheduling of batches
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from timeit import timeit
+
+from pytexit import column2tex, estimate_cost, py2tex
+from pytexit.core.cost import balance, calibrate, cost_features, largest_first
+from pytexit.test.test_budget import nested_divisions
+from pytexit.test.test_compact import corpus
+
+
+def long_sum(n):
+    return "+".join("a_{0}".format(i) for i in range(n))
+
+
+def test_cost_features(verbose=True, **kwargs):
+
+    assert cost_features("a+b") == {
+        "work": 3,
+        "tokens": 3,
+        "chars": 2,
+        "divisions": 0,
+    }
+    # both terms of a division are rendered twice
+    assert cost_features("a/b")["work"] == 5
+    # ... and nested divisions double the cost at each level
+    works = [cost_features(nested_divisions(n))["work"] for n in range(1, 8)]
+    if verbose:
+        print(works)
+    assert all(w2 > 1.9 * w1 for w1, w2 in zip(works, works[1:]))
+    # unbalanced formulas are estimated anyway
+    assert cost_features("(a+b")["tokens"] == 4
+    assert cost_features("a+b)")["tokens"] == 4
+
+
+def test_estimate_cost(verbose=True, **kwargs):
+    """Estimates rank formulas by their rendering cost"""
+
+    exprs = ["x", corpus[1], long_sum(50), nested_divisions(10)]
+    costs = [estimate_cost(expr) for expr in exprs]
+    if verbose:
+        for expr, cost in zip(exprs, costs):
+            print("{0:8.0f}µs estimated: {1}".format(cost, expr[:30]))
+    assert largest_first(costs) == [3, 2, 1, 0]
+    assert all(cost > 0 for cost in costs)
+    # the estimate grows with the work of the formula
+    assert estimate_cost(long_sum(100)) > estimate_cost(long_sum(50))
+
+
+def test_balance(verbose=True, **kwargs):
+
+    costs = [1, 9, 2, 8, 3, 7, 4, 6, 5, 5]
+    chunks = balance(costs, 5)
+    assert sorted(i for chunk in chunks for i in chunk) == list(range(len(costs)))
+    assert [sum(costs[i] for i in chunk) for chunk in chunks] == [10] * 5
+    # one expensive item gets a chunk of its own
+    chunks = balance([100, 1, 1, 1, 1], 2)
+    assert chunks == [[0], [1, 2, 3, 4]]
+    # no empty chunks
+    assert balance([1, 2], 8) == [[1], [0]]
+    assert balance([], 4) == []
+
+
+def test_column_scheduling(verbose=True, **kwargs):
+    """Parallel conversions of a skewed column give the serial result"""
+
+    exprs = corpus + [nested_divisions(8), long_sum(100)] + corpus
+    assert column2tex(exprs, processes=2) == column2tex(exprs)
+
+
+def benchmark_estimate_cost(verbose=True):
+    """Estimates rank formulas like their actual rendering times, and are
+    within a factor 3 of them up to the speed of this machine"""
+
+    exprs = ["x", corpus[1], long_sum(50), nested_divisions(10)]
+    costs = [estimate_cost(expr) for expr in exprs]
+    times = [
+        timeit(lambda: py2tex(expr, print_latex=False), number=5) / 5 * 1e6
+        for expr in exprs
+    ]
+    if verbose:
+        for expr, cost, t in zip(exprs, costs, times):
+            print("{0:8.0f}µs estimated, {1:8.0f}µs: {2}".format(cost, t, expr[:30]))
+    assert largest_first(costs) == largest_first(times) == [3, 2, 1, 0]
+    # default coefficients are fitted on one machine: compare the estimates up
+    # to a common speed factor, geometric mean of the time / estimate ratios
+    ratios = [t / cost for cost, t in zip(costs[1:], times[1:])]
+    speed = (ratios[0] * ratios[1] * ratios[2]) ** (1 / 3)
+    for cost, t in zip(costs[1:], times[1:]):
+        assert t / 3 < speed * cost < 3 * t
+
+
+def benchmark_calibration(verbose=True):
+    """Fit the cost coefficients on this machine"""
+
+    from pytexit.core.cost import cost_coefficients
+
+    exprs = list(corpus)
+    exprs += [nested_divisions(n) for n in range(1, 12)]
+    exprs += [long_sum(n) for n in (5, 50, 200)]
+    coefficients = calibrate(exprs)
+    print("default:   ", cost_coefficients)
+    print("calibrated:", {k: round(v, 2) for k, v in coefficients.items()})
+
+
+if __name__ == "__main__":
+
+    test_cost_features()
+    test_estimate_cost()
+    test_balance()
+    test_column_scheduling()
+    benchmark_estimate_cost()
+    benchmark_calibration()
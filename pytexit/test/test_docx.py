@@ -7,7 +7,11 @@ Created on Tue May  1 12:13:09 2018
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from pytexit import py2tex
+import io
+import zipfile
+from xml.etree import ElementTree
+
+from pytexit import py2docx, py2tex
 from pytexit.pytexit import uprint
 
 
@@ -42,6 +46,44 @@ def test_py2tex_wordoutput(verbose=True, **kwargs):
             assert expr_docx[i] == s
 
 
+def test_py2tex_ommloutput(verbose=True, **kwargs):
+    """Convert Python expression to Office Math"""
+
+    s = py2tex(r"sqrt(x)/2", output="omml")
+    assert s == (
+        '<m:oMath xmlns:m="http://schemas.openxmlformats.org/officeDocument/2006/math">'
+        "<m:f><m:num>"
+        '<m:rad><m:radPr><m:degHide m:val="1"/></m:radPr><m:deg/>'
+        "<m:e><m:r><m:t>x</m:t></m:r></m:e></m:rad>"
+        "</m:num><m:den><m:r><m:t>2</m:t></m:r></m:den></m:f>"
+        "</m:oMath>"
+    )
+
+
+def test_py2docx(verbose=True, **kwargs):
+    """Write a .docx with many equations"""
+
+    m = "{http://schemas.openxmlformats.org/officeDocument/2006/math}"
+
+    exprs = [
+        r"2*sqrt(2*pi*k*T_e/m_e)*(DeltaE/(k*T_e))**2*a_0**2",
+        r"Re_x=(rho*v*x)/mu",
+        r"np.sum([i**2 for i in range(1,101)])==338350",
+        r"quad(f,0,np.inf)",
+        r"k_i__1_i__2ˆj__1ˆj__2",
+    ]
+    f = io.BytesIO()
+    py2docx((e for e in exprs * 100), f, source_paragraph=True)
+
+    with zipfile.ZipFile(f) as archive:
+        assert "[Content_Types].xml" in archive.namelist()
+        document = ElementTree.fromstring(archive.read("word/document.xml"))
+    equations = list(document.iter(m + "oMath"))
+    assert len(equations) == len(exprs) * 100
+
+
 if __name__ == "__main__":
 
     test_py2tex_wordoutput()
+    test_py2tex_ommloutput()
+    test_py2docx()
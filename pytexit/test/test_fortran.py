@@ -6,7 +6,13 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from pytexit import for2py, for2tex
+import io
+import os
+import shutil
+import tempfile
+
+from pytexit import for2py, for2tex, forfile2tex
+from pytexit.core.fortran import iter_statements
 
 
 def test_for2py(verbose=True, *args, **kwargs):
@@ -33,7 +39,116 @@ def test_for2tex(verbose=True, *args, **kwargs):
     )
 
 
+def test_for2py_operators(verbose=True, *args, **kwargs):
+
+    assert for2py("DEXP(-E/T) + dsqrt(x)*dlog10(y)") == "exp(-E/T) + sqrt(x)*log10(y)"
+    assert for2py("a .and. b .OR. c") == "a  and  b  or  c"
+    assert for2py("a.ge.1d05") == "a>=1e5"
+    assert for2py("26500.D0") == "26500."
+    assert for2py("x2d0") == "x2d0"  # variable names are not modified
+
+
+def test_iter_statements(verbose=True, *args, **kwargs):
+
+    fixed = [
+        "C     comment",
+        "      K(1) = 2.8D-11*DEXP(-26500.D0",
+        "     &       /T)",
+        "      X = 1 ! comment",
+    ]
+    assert list(iter_statements(fixed, fixed_form=True)) == [
+        (2, "K(1) = 2.8D-11*DEXP(-26500.D0/T)"),
+        (4, "X = 1"),
+    ]
+    free = ["k = a * &  ! comment", "  ! comment", "    b", "x = 1; y = 2"]
+    assert list(iter_statements(free)) == [
+        (1, "k = a *  b"),
+        (4, "x = 1"),
+        (4, "y = 2"),
+    ]
+
+
+def test_forfile2tex(verbose=True, *args, **kwargs):
+
+    source = """
+      SUBROUTINE RATES(T, K)
+      DOUBLE PRECISION T, K(10)
+      K(1) = 2.8D-11*DEXP(-(26500.D0 - 0.5D0*1.97D0*11600.D0)
+     &       /T_gas)
+      IF (T .GT. 300.D0) K(3) = 0.D0
+      DO 10 I = 1, 10
+   10 CONTINUE
+      END
+"""
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "rates.f")
+        with io.open(path, "w") as f:
+            f.write(source)
+
+        formulas = forfile2tex(path)
+        if verbose:
+            print(formulas)
+        assert len(formulas) == 2
+        assert formulas[0]["name"] == "RATES"
+        assert formulas[0]["lineno"] == 4
+        assert formulas[0]["output"] == (
+            "$$K_1=2.8\\times{10}^{-11} e^{\\frac{-\\left(26500-0.5\\times"
+            + "1.97\\times11600\\right)}{T_{gas}}}$$"
+        )
+        # logical IF: the assignment is converted, the condition is kept
+        assert formulas[1]["lineno"] == 6
+        assert formulas[1]["output"] == "$$K_3=0$$"
+        assert formulas[1]["condition"] == "T > 300."
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_forfile2tex_blocks(verbose=True, *args, **kwargs):
+    """Closing a block doesn't end the subroutine"""
+
+    source = """
+subroutine rates(T, k)
+  real(8) :: T, k(10)
+  integer :: i
+  if (T > 300d0) then
+    k(1) = 0d0
+  end if
+  do i = 1, 10
+    k(i) = 1d0
+  enddo
+  k(2) = 2.8d-11*T
+  select case (i)
+  end select
+  k(4) = k(2)/T
+  x = (a
+end subroutine rates
+y = 1
+"""
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "rates.f90")
+        with io.open(path, "w") as f:
+            f.write(source)
+
+        formulas = forfile2tex(path)
+        if verbose:
+            print(formulas)
+        assert [f["lineno"] for f in formulas] == [6, 9, 11, 14, 15, 17]
+        assert [f["name"] for f in formulas] == ["rates"] * 5 + [""]
+        # errors are reported, and the next statements converted
+        assert formulas[4]["output"] is None
+        assert formulas[4]["error"].startswith("SyntaxError")
+        assert formulas[5]["output"] == "$$y=1$$"
+    finally:
+        shutil.rmtree(tmp)
+
+
 if __name__ == "__main__":
 
     test_for2py()
     test_for2tex()
+    test_for2py_operators()
+    test_iter_statements()
+    test_forfile2tex()
+    test_forfile2tex_blocks()
@@ -256,6 +256,196 @@ def test_multi():
     assert output == "$$x=4$$\n$$y=5$$"
 
 
+def test_print_globals(verbose=True, **kwargs):
+    """Formulas are printed according to the globals, unless overridden"""
+
+    import io
+    from contextlib import redirect_stdout
+
+    from pytexit import pytexit
+
+    def printed(**kwargs):
+        f = io.StringIO()
+        with redirect_stdout(f):
+            py2tex("x**2", **kwargs)
+        return f.getvalue()
+
+    assert printed() == "$$x^2$$\n"
+    assert printed(print_formula=False) == ""
+    saved = pytexit.PRINT_FORMULA
+    try:
+        pytexit.PRINT_FORMULA = False
+        assert printed() == ""
+        assert printed(print_formula=True) == "$$x^2$$\n"
+    finally:
+        pytexit.PRINT_FORMULA = saved
+
+
+def test_multiple_outputs(verbose=True, **kwargs):
+    """Several outputs rendered from a single parse"""
+
+    expr = r"2*sqrt(2*pi*k*T_e/m_e)*(DeltaE/(k*T_e))**2*a_0**2"
+    outputs = py2tex(expr, output=["tex", "word", "compact"], print_latex=False)
+
+    assert sorted(outputs) == ["compact", "tex", "word"]
+    for output in outputs:
+        assert outputs[output] == py2tex(expr, output=output, print_latex=False)
+
+
+def test_function_input(verbose=True, **kwargs):
+    """Convert Python functions and lambdas"""
+
+    from pytexit.pytexit import _function_cache, function2tex
+
+    def rate(T):
+        k = A * T**n
+        return k * np.exp(-E_a / (R * T))
+
+    assert py2tex(rate, print_latex=False) == (
+        "$$k=A T^n$$\n"
+        + r"$$\operatorname{rate}\left(T\right)=k e^{\frac{-E_a}{R T}}$$"
+    )
+    assert py2tex(lambda x: x**2 + 1e-3 * y) == r"$$x^2+{10}^{-3}y$$"
+
+    # Cached per code object
+    assert rate.__code__ in _function_cache
+    assert function2tex(rate) is function2tex(rate)
+
+    # lambdas with the same arguments on one line, or on a continuation line
+    f = lambda x: x**2; g = lambda x: x + 1  # noqa: E702
+    h = (
+        lambda x: 3 * x
+    )
+    assert py2tex(f) == "$$x^2$$"
+    assert py2tex(g) == "$$x+1$$"
+    assert py2tex(h) == "$$3x$$"
+
+    # only the formulas of the function itself, not of nested helpers
+    def outer(a):
+        def cube(b):
+            return b**3
+
+        c = 2 * a
+        return cube(c) + 1
+
+    assert py2tex(outer, print_latex=False) == (
+        "$$c=2a$$\n"
+        + r"$$\operatorname{outer}\left(a\right)=\operatorname{cube}\left(c\right)+1$$"
+    )
+
+
+def test_ast_input(verbose=True, **kwargs):
+    """Convert already parsed formulas"""
+
+    import ast
+
+    from pytexit import ast2tex
+
+    exprs = [
+        r"Re_x=(rho*v*x)/mu",
+        r"2*sqrt(2*pi*k*T_e/m_e)*(DeltaE/(k*T_e))**2*a_0**2",
+        r"quad(f,0,np.inf)",
+        r"np.sum([i**2 for i in range(1,101)])==338350",
+        r"scipy.integrate.quad(f,0,1)",
+        r"2.8e-11*np.exp(-E/T)",
+    ]
+    for expr in exprs:
+        tree = ast.parse(expr)
+        dump = ast.dump(tree)
+        s = ast2tex(tree.body[0], source=expr)
+        assert s == py2tex(expr, print_latex=False)
+        # the tree is not modified
+        assert ast.dump(tree) == dump
+
+    tree = ast.parse("\n".join(exprs))
+    assert ast2tex(tree.body, source="\n".join(exprs)) == [
+        py2tex(expr, print_latex=False) for expr in exprs
+    ]
+    assert ast2tex(ast.parse("np.exp(x)", mode="eval")) == "$$e^{x}$$"
+
+
+def test_column_input(verbose=True, **kwargs):
+    """Convert columns of formulas, each distinct formula once"""
+
+    from pytexit import column2tex
+
+    exprs = ["a**2", "x/y", None, "a**2", "(a)**2"]
+    expected = ["$$a^2$$", r"$$\frac{x}{y}$$", None, "$$a^2$$", "$$a^2$$"]
+    assert column2tex(exprs) == expected
+
+    # several outputs
+    from pytexit.pytexit import _column_categories
+
+    out = column2tex(exprs, output=["tex", "word"])
+    assert [o if o is None else o["tex"] for o in out] == expected
+    assert out[1]["word"] == py2tex("x/y", output="word", print_latex=False)
+    # categories of a pandas column, for each output
+    converted = column2tex(["a**2", "x/y", "(a)**2"], output=["tex", "word"])
+    for o in ["tex", "word"]:
+        categories, remap = _column_categories([c[o] for c in converted])
+        assert len(categories) == 2 and remap == [0, 1, 0]
+
+    try:
+        import numpy as np
+        import pandas as pd
+    except ImportError:
+        return
+
+    out = column2tex(np.array(exprs, dtype=object).reshape(5, 1))
+    assert out.shape == (5, 1) and list(out[:, 0]) == expected
+
+    series = pd.Series(exprs, name="formula")
+    out = column2tex(series)
+    if verbose:
+        print(out)
+    assert out.dtype == "category" and len(out.cat.categories) == 2
+    assert out.name == "formula"
+    assert out.isna().tolist() == [False, False, True, False, False]
+    assert out.dropna().tolist() == [e for e in expected if e is not None]
+    assert column2tex(series, processes=2).equals(out)
+
+    df = column2tex(series, output=["tex", "word"])
+    assert list(df.columns) == ["tex", "word"]
+    assert df["tex"].equals(out.rename("tex"))
+
+
+def test_batch_preprocessing(verbose=True, **kwargs):
+    """Pre-processing a batch at once is the same as formula by formula"""
+
+    from pytexit import multi2tex
+    from pytexit.core.core import (
+        preprocessing,
+        preprocessing_many,
+        replace_scientific,
+    )
+
+    exprs = [
+        " x = np.exp(-E_a/(R*T))*2.5e-3 ",
+        "y = numpy.sqrt(1e3*λ)",
+        "scipy.integrate.quad(f, 0, np.inf)",
+        "α÷β + lambdα",
+        "df.a*math.pi",
+        "1.0E+2 + 3e",
+        "",
+    ]
+    assert preprocessing_many(exprs) == [
+        replace_scientific(preprocessing(e)) for e in exprs
+    ]
+    assert preprocessing_many(exprs, scientific=False) == [
+        preprocessing(e) for e in exprs
+    ]
+    # formulas that can't be joined are pre-processed one by one
+    assert preprocessing_many(["a\x00b", "np.x"]) == ["a\x00b", "x"]
+
+    assert py2tex("x = exp(10**3)", print_latex=False, preprocess=False) == py2tex(
+        "x = np.exp(1e3)", print_latex=False
+    )
+    lines = "\n".join(exprs[:5])
+    assert multi2tex(lines, print_latex=False).split("\n") == [
+        py2tex(e, print_latex=False) for e in exprs[:5]
+    ]
+
+
 def run_all_tests(verbose=True, **kwargs):
 
     test_py2tex(verbose=verbose, **kwargs)
@@ -263,6 +453,12 @@ def run_all_tests(verbose=True, **kwargs):
     test_hardcoded_names(verbose=verbose, **kwargs)
     test_simplify_parser(verbose=verbose, **kwargs)
     test_multi()
+    test_print_globals(verbose=verbose, **kwargs)
+    test_multiple_outputs(verbose=verbose, **kwargs)
+    test_function_input(verbose=verbose, **kwargs)
+    test_ast_input(verbose=verbose, **kwargs)
+    test_column_input(verbose=verbose, **kwargs)
+    test_batch_preprocessing(verbose=verbose, **kwargs)
 
 
 if __name__ == "__main__":
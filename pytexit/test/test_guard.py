@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Test the pre-parse guard
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import ast
+import timeit
+
+from pytexit import FormulaGuard, FormulaRejected, py2tex
+from pytexit.test.test_compact import corpus
+
+
+def test_guard(verbose=True, **kwargs):
+
+    guard = FormulaGuard()
+    for expr in corpus:
+        verdict = guard.check(expr)
+        assert verdict, (expr, verdict)
+        assert verdict.reason is None
+
+    guard = FormulaGuard(max_length=100, max_depth=5, max_tokens=50)
+    for expr, reason in [
+        ("x" * 101, "too long"),
+        ("((((((a))))))", "too deeply nested"),
+        ("+".join("a" * 30), "too many tokens"),
+        ("f = lambda x: x", "keyword not allowed: lambda"),
+        ("import os", "keyword not allowed: import"),
+        ("open('file')", "strings are not allowed"),
+        ("a = 1; b = 2", "several statements"),
+        ("a = 1\nb = 2", "several statements"),
+        ("(a + b]", "unbalanced"),
+        ("(a + b", "unclosed"),
+        ("a $ b", "unexpected character"),
+        ("a × b", "unexpected character"),
+    ]:
+        verdict = guard.check(expr)
+        if verbose:
+            print(repr(expr[:20]), verdict)
+        assert not verdict
+        assert verdict.reason.startswith(reason), (expr, verdict)
+
+    # formulas can span several lines inside brackets, or continued lines
+    assert guard.check("x = (a +\n     b)")
+    assert guard.check("x = a + \\\n    b")
+    assert guard.check("x = a + \\\r\n    b")
+    assert not guard.check("x = a + \\ b")
+    # where it was rejected
+    assert guard.check("x = a + (b]").position == 10
+
+    guard = FormulaGuard(allowed_names={"x", "a", "b", "sqrt"})
+    assert guard.check("x = sqrt(a**2 + b**2)")
+    assert guard.check("x = exp(a)").reason == "name not allowed: exp"
+
+    # py2tex raises before parsing
+    try:
+        py2tex("(" * 1000 + "a" + ")" * 1000, print_latex=False, guard=FormulaGuard())
+    except FormulaRejected as err:
+        if verbose:
+            print(err)
+        assert isinstance(err, ValueError)
+        assert not err.verdict
+    else:
+        raise AssertionError("formula not rejected")
+    assert py2tex("x = 2*a", print_latex=False, guard=FormulaGuard()) == py2tex(
+        "x = 2*a", print_latex=False
+    )
+
+
+def test_guard_rejects_long(verbose=True, **kwargs):
+
+    guard = FormulaGuard()
+    verdict = guard.check("+".join(["a"] * 2400))
+    assert not verdict and verdict.reason.startswith("too many tokens")
+
+
+def benchmark_guard_speed(verbose=True):
+    """Rejecting a pathological formula is much faster than parsing it"""
+
+    guard = FormulaGuard()
+    expr = "+".join(["a"] * 2400)  # too many tokens
+    t_guard = min(timeit.repeat(lambda: guard.check(expr), number=100, repeat=3))
+    t_parse = min(timeit.repeat(lambda: ast.parse(expr), number=100, repeat=3))
+    if verbose:
+        print(
+            "guard: {0:.0f}µs, ast.parse: {1:.0f}µs".format(
+                t_guard / 100 * 1e6, t_parse / 100 * 1e6
+            )
+        )
+    assert t_guard < t_parse
+
+
+if __name__ == "__main__":
+
+    test_guard()
+    test_guard_rejects_long()
+    benchmark_guard_speed()
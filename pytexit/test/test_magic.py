@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Test the %%py2tex cell magic
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import subprocess
+import sys
+
+from pytexit.magic import CellRenderer, align
+
+cell = """import numpy as np
+'''A derivation'''
+k = A*T**n
+r = k*np.exp(-E_a/(R*T))
+a <= b
+"""
+
+
+def test_cell_renderer(verbose=True, **kwargs):
+
+    renderer = CellRenderer()
+    s = renderer(cell)
+    if verbose:
+        print(s)
+    assert s == "\n".join(
+        [
+            r"\begin{aligned}",
+            r"k&=A T^n\\",
+            r"r&=k e^{\frac{-E_a}{R T}}\\",
+            r"&a<=b",
+            r"\end{aligned}",
+        ]
+    )
+    assert renderer.rendered == 3
+
+    # only the changed statements are converted again
+    assert renderer(cell.replace("T**n", "T**m")) == s.replace("T^n", "T^m")
+    assert renderer.rendered == 1
+    assert renderer(cell.replace("k*np.exp", "k * np.exp")) == s
+    assert renderer.rendered == 0
+    renderer(cell, output="compact")
+    assert renderer.rendered == 3
+
+    assert align(r"f{\left(x=1\right)}=2") == r"f{\left(x=1\right)}&=2"
+
+
+def test_no_ipython_import(verbose=True, **kwargs):
+    """IPython is only imported when the extension is loaded"""
+    code = "import sys, pytexit; pytexit.py2tex('x'); print('IPython' in sys.modules)"
+    out = subprocess.check_output([sys.executable, "-c", code])
+    assert out.decode().strip().endswith("False")
+
+
+def test_magic(verbose=True, **kwargs):
+
+    try:
+        from IPython.testing.globalipapp import start_ipython
+    except ImportError:
+        return
+
+    ip = start_ipython()
+    ip.run_line_magic("load_ext", "pytexit")
+    latex = ip.run_cell_magic("py2tex", "--exec", "x = 2\ny = x**2")
+    assert latex.data == "$$\\begin{aligned}\nx&=2\\\\\ny&=x^2\n\\end{aligned}$$"
+    assert ip.user_ns["y"] == 4
+
+
+if __name__ == "__main__":
+
+    test_cell_renderer()
+    test_no_ipython_import()
+    test_magic()
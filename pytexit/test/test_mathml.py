@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Test the MathML output
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from timeit import timeit
+from xml.etree import ElementTree
+
+from pytexit import py2tex
+from pytexit.pytexit import uprint
+from pytexit.test.test_compact import corpus
+
+ns = "{http://www.w3.org/1998/Math/MathML}"
+
+
+def test_mathml_wellformed(verbose=True, **kwargs):
+    """All formulas of the corpus give a valid MathML tree"""
+
+    for expr in corpus:
+        s = py2tex(expr, output="mathml", print_latex=False, print_formula=False)
+        if verbose:
+            uprint(s)
+        root = ElementTree.fromstring(s)
+        assert root.tag == ns + "math"
+        # only MathML elements
+        assert all(e.tag.startswith(ns) for e in root.iter())
+        # no fallback to the generic visitor
+        assert root.find(".//" + ns + "mtext") is None
+
+
+def test_mathml_output(verbose=True, **kwargs):
+    def mathml(expr, **kwargs):
+        s = py2tex(expr, output="mathml", **kwargs)
+        return s[
+            len(
+                '<math xmlns="http://www.w3.org/1998/Math/MathML" display="block">'
+            ) : -len("</math>")
+        ]
+
+    # Identifiers (same formalism as LaTeX)
+    assert mathml("alpha") == "<mi>α</mi>"
+    assert (
+        mathml("T_e") == "<msub><mrow><mi>T</mi></mrow><mrow><mi>e</mi></mrow></msub>"
+    )
+    # Operators
+    assert mathml("1<=a") == "<mrow><mn>1</mn><mo>≤</mo><mi>a</mi></mrow>"
+    assert mathml("a*2") == "<mrow><mn>2</mn><mi>a</mi></mrow>"
+    assert (
+        mathml("2*4", tex_multiplier=r"\cdot")
+        == "<mrow><mn>2</mn><mo>·</mo><mn>4</mn></mrow>"
+    )
+    assert (
+        mathml("a-(b-c)")
+        == "<mrow><mi>a</mi><mo>-</mo><mrow><mo>(</mo><mrow><mi>b</mi><mo>-</mo><mi>c</mi></mrow><mo>)</mo></mrow></mrow>"
+    )
+    # Functions
+    assert mathml("sqrt(x)") == "<msqrt><mi>x</mi></msqrt>"
+    assert (
+        mathml("log(x)")
+        == "<mrow><mi>ln</mi><mrow><mo>(</mo><mi>x</mi><mo>)</mo></mrow></mrow>"
+    )
+
+
+def test_mathml_functions(verbose=True, **kwargs):
+    """Functions have the same names as in the LaTeX output"""
+
+    from pytexit.core.core import inverse_functions, prefix_functions
+
+    for func, name in list(prefix_functions.items()) + list(
+        inverse_functions.items()
+    ):
+        expr = "{0}(x)".format(func)
+        tex = py2tex(expr, print_latex=False, print_formula=False)
+        assert tex.startswith("$$" + name)
+        assert "<mi>{0}</mi>".format(name.lstrip("\\")) in py2tex(
+            expr, output="mathml", print_latex=False, print_formula=False
+        )
+
+
+def benchmark(number=200):
+    """Compare the MathML and the LaTeX backends on the test corpus"""
+
+    for output in ["tex", "mathml"]:
+        t = timeit(
+            lambda: [py2tex(expr, output=output, print_latex=False) for expr in corpus],
+            number=number,
+        )
+        print(
+            "{0:>6}: {1:.1f} us per formula".format(
+                output, t / number / len(corpus) * 1e6
+            )
+        )
+
+
+if __name__ == "__main__":
+
+    test_mathml_wellformed()
+    test_mathml_output()
+    test_mathml_functions()
+    benchmark()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Test the memoization of subexpressions across formulas
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import ast
+
+from pytexit import py2tex
+from pytexit.core.memo import SubexpressionMemo
+from pytexit.test.test_compact import corpus
+
+outputs = ["tex", "compact", "word", "mathml", "omml"]
+
+
+def test_memo_equivalent(verbose=True, **kwargs):
+    """Rendering with a memo gives the same output, whatever the backend,
+    even when subexpressions are evicted"""
+
+    for maxsize in [10, 10000]:
+        memo = SubexpressionMemo(maxsize=maxsize)
+        for _ in range(2):
+            for expr in corpus:
+                expected = py2tex(expr, output=outputs, print_latex=False)
+                assert py2tex(expr, output=outputs, print_latex=False, memo=memo) == (
+                    expected
+                )
+        if verbose:
+            print(maxsize, memo.stats())
+        assert len(memo) <= maxsize
+        assert memo.stats()["hits"] > 0
+    assert memo.stats()["evictions"] == 0
+
+    # options are part of the context
+    memo = SubexpressionMemo()
+    assert py2tex("2*a", memo=memo) == "$$2a$$"
+    assert py2tex("2*a", memo=memo, simplify_multipliers=False) == py2tex(
+        "2*a", simplify_multipliers=False
+    )
+
+
+def test_memo_structural_keys(verbose=True, **kwargs):
+    """Subtrees with the same structure have the same key, subtrees with
+    equal but differently rendered constants don't"""
+
+    memo = SubexpressionMemo()
+    a = ast.parse("sqrt(2*pi*k*T_e/m_e)").body[0].value
+    b = ast.parse("x*sqrt(2*pi*k*T_e/m_e)").body[0].value.right
+    assert memo.key(a, {}) == memo.key(b, {})
+    assert memo.key(ast.parse("1").body[0], {}) != memo.key(
+        ast.parse("1.0").body[0], {}
+    )
+
+    memo.clear()
+    py2tex("x*sqrt(2*pi*k*T_e/m_e)", memo=memo)
+    hits, misses = memo.hits, memo.misses
+    py2tex("y+sqrt(2*pi*k*T_e/m_e)", memo=memo)
+    # the whole sqrt(...) subtree is found at once
+    assert memo.hits == hits + 1
+    assert memo.misses == misses + 2  # y+sqrt(...), y
+
+
+if __name__ == "__main__":
+
+    test_memo_equivalent()
+    test_memo_structural_keys()
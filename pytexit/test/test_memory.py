@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Test the memory report
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+from pytexit.cli import main
+from pytexit.core.memo import SubexpressionMemo
+from pytexit.memory import format_memory_report, memory_report, sizeof, stages
+from pytexit.test.test_budget import nested_divisions
+from pytexit.test.test_compact import corpus
+
+
+def test_memory_report(verbose=True, **kwargs):
+
+    exprs = corpus * 20 + [nested_divisions(8)]
+    memo = SubexpressionMemo()
+    report = memory_report(exprs, top=3, memo=memo)
+    if verbose:
+        print(format_memory_report(report))
+
+    assert report["formulas"] == len(exprs)
+    assert list(report["stages"]) == stages
+    for memory in report["stages"].values():
+        assert memory["peak"] >= memory["retained"]
+    # the trees are much larger than the formulas, and are not retained
+    parse = report["stages"]["parse"]["retained"]
+    assert parse > 10 * report["stages"]["preprocess"]["retained"]
+    assert 0 < report["results"] < parse
+    assert report["caches"]["memo"] > 0 and "disk" not in report["caches"]
+    # distinct formulas, from the largest result
+    assert len(report["largest"]) == 3
+    assert report["largest"][0][1] == nested_divisions(8)
+    assert report["largest"][0][0] >= report["largest"][1][0]
+    # tracing is stopped
+    assert not tracemalloc.is_tracing()
+
+    # peaks are not measured before Python 3.9
+    report["stages"]["parse"]["peak"] = None
+    lines = format_memory_report(report).splitlines()
+    assert [l.split()[1] for l in lines if l.startswith("parse")] == ["-"]
+
+    # the MathML output is larger
+    mathml = memory_report(exprs, output="mathml")
+    assert mathml["results"] > report["results"]
+
+    assert sizeof({"a": [1, 2]}) > sizeof({}) + sizeof("a") + sizeof([])
+
+
+def test_memory_report_cli(verbose=True, **kwargs):
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "formulas.txt")
+        with io.open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(corpus) + "\n")
+        stdout = sys.stdout
+        sys.stdout = out = io.StringIO()
+        try:
+            assert main(["--memory-report", path]) == 0
+        finally:
+            sys.stdout = stdout
+        if verbose:
+            print(out.getvalue())
+        for stage in stages:
+            assert stage in out.getvalue()
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+
+    test_memory_report()
+    test_memory_report_cli()
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Test the notebook scanner
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from pytexit.notebook import blank_ipython, notebook2tex, scan_notebooks
+
+
+def write_notebook(path, cells):
+    notebook = {
+        "cells": [
+            dict(
+                {
+                    "cell_type": cell_type,
+                    "metadata": {},
+                    "source": source.splitlines(True),
+                },
+                **(
+                    {"outputs": [{"data": {"image/png": "iVBORw0KGgo="}}]}
+                    if cell_type == "code"
+                    else {}
+                )
+            )
+            for cell_type, source in cells
+        ],
+        "metadata": {},
+        "nbformat": 4,
+        "nbformat_minor": 5,
+    }
+    with io.open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(notebook, indent=1))
+
+
+def test_notebook2tex(verbose=True, **kwargs):
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "model.ipynb")
+        write_notebook(
+            path,
+            [
+                ("markdown", "# Model\n$x = 1$"),
+                ("code", "%matplotlib inline\nimport numpy as np\nv = sqrt(2*k*T/m)"),
+                ("code", "%%time\nx = 1/2"),
+                ("code", "def rate(T):\n    return A*exp(-E/(R*T))"),
+                ("code", "y = (a"),
+                ("code", "!pip install pytexit\nz = x**2"),
+            ],
+        )
+        formulas = notebook2tex(path, tex_enclosure="")
+        if verbose:
+            for f in formulas:
+                print(f["name"], f["lineno"], f["output"])
+        assert [(f["name"], f["lineno"]) for f in formulas] == [
+            ("cell 1", 3),
+            ("cell 3: rate", 2),
+            ("cell 4", 1),
+            ("cell 5", 2),
+        ]
+        assert formulas[0]["output"] == r"v=\sqrt{\frac{2k T}{m}}"
+        assert formulas[2]["output"] is None and "error" in formulas[2]
+        assert formulas[3]["output"] == "z=x^2"
+
+        # assigned magics and shell commands, '%' in brackets
+        write_notebook(
+            path,
+            [
+                (
+                    "code",
+                    "files = !ls\nt = %timeit f()\nk = 2*a\nr = (k*b\n     % n)",
+                ),
+            ],
+        )
+        formulas = notebook2tex(path, tex_enclosure="")
+        assert [(f["lineno"], f["output"]) for f in formulas] == [
+            (3, "k=2a"),
+            (4, r"r=\left(k b\right)\bmodn"),
+        ]
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_blank_ipython(verbose=True, **kwargs):
+    """IPython lines are blanked at the start of statements only"""
+
+    source = "\n".join(
+        [
+            "%matplotlib inline",
+            "files = !ls",
+            "a, b = %sx echo 1 2",
+            "x?",
+            "k = (2*a",
+            "     % n)",
+            "r = k \\",
+            "    % n",
+            "s = '(' + x",
+            "!pwd",
+            "y = x != 2",
+        ]
+    )
+    assert blank_ipython(source).split("\n") == [
+        "",
+        "",
+        "",
+        "",
+        "k = (2*a",
+        "     % n)",
+        "r = k \\",
+        "    % n",
+        "s = '(' + x",
+        "",
+        "y = x != 2",
+    ]
+
+
+def test_scan_notebooks(verbose=True, **kwargs):
+
+    tmp = tempfile.mkdtemp()
+    try:
+        src, out = os.path.join(tmp, "src"), os.path.join(tmp, "out")
+        os.makedirs(os.path.join(src, "sub"))
+        os.makedirs(os.path.join(src, ".ipynb_checkpoints"))
+        write_notebook(os.path.join(src, "a.ipynb"), [("code", "x = a/b")])
+        write_notebook(os.path.join(src, "b.ipynb"), [("code", "y = sqrt(c)")])
+        write_notebook(os.path.join(src, "sub", "a.ipynb"), [("code", "z = d**2")])
+        write_notebook(
+            os.path.join(src, ".ipynb_checkpoints", "a-checkpoint.ipynb"),
+            [("code", "x = 0")],
+        )
+
+        report = scan_notebooks([src], out, processes=2)
+        if verbose:
+            print(report)
+        assert len(report["converted"]) == 3 and report["formulas"] == 3
+        fragments = sorted(f for f in os.listdir(out) if f != "manifest.json")
+        assert len(fragments) == 3 and "b.tex" in fragments
+        with io.open(os.path.join(out, "b.tex"), encoding="utf-8") as f:
+            assert r"y=\sqrt{c}" in f.read()
+
+        # unchanged notebooks are skipped
+        write_notebook(os.path.join(src, "b.ipynb"), [("code", "y = c**3")])
+        report = scan_notebooks([src], out, processes=2)
+        assert report["converted"] == [os.path.join(src, "b.ipynb")]
+        assert len(report["skipped"]) == 2
+        with io.open(os.path.join(out, "b.tex"), encoding="utf-8") as f:
+            assert "y=c^3" in f.read()
+
+        # removed notebooks, and other options
+        os.remove(os.path.join(src, "sub", "a.ipynb"))
+        report = scan_notebooks([src], out, format="markdown")
+        assert len(report["converted"]) == 2 and len(report["removed"]) == 1
+        assert sorted(os.listdir(out)) == ["a.md", "b.md", "manifest.json"]
+        with io.open(os.path.join(out, "a.md"), encoding="utf-8") as f:
+            assert "$$\nx=\\frac{a}{b}\n$$" in f.read()
+
+        # LaTeX outputs only
+        try:
+            scan_notebooks([src], out, output="mathml")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("mathml fragments")
+
+        # malformed notebooks are reported, the others converted
+        with io.open(os.path.join(src, "c.ipynb"), "w", encoding="utf-8") as f:
+            f.write('{"cells": "not a list"}')
+        with io.open(os.path.join(src, "d.ipynb"), "w", encoding="utf-8") as f:
+            f.write("{")
+        write_notebook(os.path.join(src, "e.ipynb"), [("code", "w = e/f")])
+        report = scan_notebooks([src], out, processes=2)
+        if verbose:
+            print(report)
+        assert sorted(os.path.basename(p) for p in report["errors"]) == [
+            "c.ipynb",
+            "d.ipynb",
+        ]
+        assert len(report["converted"]) == 5 and report["formulas"] == 3
+        with io.open(os.path.join(out, "c.tex"), encoding="utf-8") as f:
+            assert "could not be converted: AttributeError" in f.read()
+        with io.open(os.path.join(out, "manifest.json"), encoding="utf-8") as f:
+            assert len(json.load(f)["notebooks"]) == 5
+        # and read again at the next scan
+        report = scan_notebooks([src], out)
+        assert len(report["errors"]) == 2 and len(report["skipped"]) == 3
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+
+    test_notebook2tex()
+    test_blank_ipython()
+    test_scan_notebooks()
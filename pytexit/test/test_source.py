@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Test the conversion of whole Python modules
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import ast
+import io
+import os
+import shutil
+import tempfile
+
+from pytexit import module2tex, py2tex
+from pytexit.cli import main
+from pytexit.core.core import source_lines, source_segment
+
+source = '''
+import numpy as np
+
+c = 2.99792458e8
+
+
+def rate(T_e, DeltaE):
+    """Arrhenius rate"""
+    k = 2.8e-11 * np.exp(-DeltaE / (k_B * T_e))
+    name = "not a formula"
+    if T_e > 300:
+        return k * 2
+    return k
+
+
+class Model:
+    def energy(self, m):
+        E: float = m * c**2
+        return E
+'''
+
+
+def test_module2tex(verbose=True, **kwargs):
+    """Formulas found in a module, and converted as with py2tex"""
+
+    formulas = module2tex(source=source)
+
+    if verbose:
+        for f in formulas:
+            print(f)
+
+    assert [(f["name"], f["lineno"], f["kind"]) for f in formulas] == [
+        ("<module>", 4, "assign"),
+        ("rate", 9, "assign"),
+        ("rate", 11, "compare"),
+        ("rate", 12, "return"),
+        ("Model.energy", 18, "assign"),
+    ]
+    for f in formulas:
+        expr = f["source"].replace(": float", "")
+        assert f["output"] == py2tex(expr, print_latex=False, print_formula=False)
+
+    # a source is never read as a path
+    tmp = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        os.chdir(tmp)
+        with io.open("e", "w", encoding="utf-8") as f:
+            f.write("x = 1\n")
+        assert module2tex(source="e") == []  # not the formulas of the file
+        assert module2tex(source="y = 2") == module2tex(source="y = 2\n")
+        assert module2tex("e")[0]["source"] == "x = 1"
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp)
+    try:
+        module2tex()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("no path nor source")
+
+
+def test_module2tex_cli(verbose=True, **kwargs):
+    """Write the formulas of a module in a LaTeX appendix"""
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "model.py")
+        with io.open(path, "w", encoding="utf-8") as f:
+            f.write(source)
+
+        out = os.path.join(tmp, "appendix.tex")
+        assert main(["--module", path, "-o", out]) == 0
+        with io.open(out, encoding="utf-8") as f:
+            tex = f.read()
+
+        if verbose:
+            print(tex)
+
+        assert r"\paragraph{Model.energy}" in tex
+        assert tex.count(r"\begin{equation}") == 5
+        assert "k=2.8\\times{10}^{-11} e^{\\frac{-\\Delta E}{k_B T_e}}" in tex
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_escape_tex(verbose=True, **kwargs):
+
+    from pytexit.build import escape_tex
+
+    assert escape_tex("~/a_b^2 <50% & {x}") == (
+        r"\textasciitilde{}/a\_b\textasciicircum{}2 \textless{}50\% \& \{x\}"
+    )
+    assert escape_tex("C:\\tmp") == r"C:\textbackslash{}tmp"
+
+
+def test_source_segment(verbose=True, **kwargs):
+    """Same segments as ast.get_source_segment, with the source split once"""
+
+    source = "é = 1\r\nx = (a +\r  β*2e3)\ny = 'ü'\n\x0cz = 1"
+    lines = source_lines(source)
+    for node in ast.walk(ast.parse(source)):
+        assert source_segment(lines, node) == ast.get_source_segment(source, node)
+
+
+if __name__ == "__main__":
+
+    test_module2tex()
+    test_module2tex_cli()
+    test_escape_tex()
+    test_source_segment()
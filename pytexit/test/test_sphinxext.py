@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Test the Sphinx extension
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+import os
+import shutil
+import tempfile
+
+conf = """
+extensions = ["sphinx.ext.mathjax", "pytexit.sphinxext"]
+"""
+
+index = """
+Rates
+=====
+
+.. toctree::
+
+   other
+
+.. py2tex::
+   :label: rate
+
+   k = A*T**n*exp(-E_a/(R*T))
+   r = k*c_A*c_B
+
+Inline: :py2tex:`sqrt(2*pi*k*T_e/m_e)`, see :eq:`rate`.
+"""
+
+other = """
+Other
+=====
+
+.. py2tex:: x = (a+b)/2
+
+.. py2tex::
+   :output: compact
+
+   y = (a**b)**c
+"""
+
+
+def write(path, text):
+    with io.open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def read(path):
+    with io.open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def sphinx_build(src, out, parallel=0):
+    from sphinx.application import Sphinx
+    from sphinx.util.docutils import docutils_namespace
+
+    warnings = io.StringIO()
+    with docutils_namespace():  # directives and roles of this build only
+        app = Sphinx(
+            src,
+            src,
+            os.path.join(out, "html"),
+            os.path.join(out, "doctrees"),
+            "html",
+            status=None,
+            warning=warnings,
+            parallel=parallel,
+        )
+        app.build()
+    assert warnings.getvalue() == "", warnings.getvalue()
+    return app
+
+
+def test_sphinxext(verbose=True, **kwargs):
+
+    try:
+        import sphinx  # noqa: F401
+    except ImportError:
+        return
+
+    import pytexit.sphinxext
+
+    tmp = tempfile.mkdtemp()
+    convert = pytexit.sphinxext.py2tex
+    converted = []
+
+    def counting_py2tex(expr, **kwargs):
+        converted.append(expr)
+        return convert(expr, **kwargs)
+
+    pytexit.sphinxext.py2tex = counting_py2tex
+    try:
+        src, out = os.path.join(tmp, "src"), os.path.join(tmp, "out")
+        os.makedirs(src)
+        write(os.path.join(src, "conf.py"), conf)
+        write(os.path.join(src, "index.rst"), index)
+        write(os.path.join(src, "other.rst"), other)
+
+        app = sphinx_build(src, out)
+        assert len(converted) == 5
+        html = read(os.path.join(out, "html", "index.html"))
+        if verbose:
+            print(app.env.pytexit_conversions)
+        assert r"k&amp;=A T^n e^{\frac{-E_a}{R T}}" in html
+        assert r"\sqrt{\frac{2\pi k T_e}{m_e}}" in html
+        assert 'id="equation-rate"' in html
+        assert r"y=(a^b)^c" in read(os.path.join(out, "html", "other.html"))
+
+        # incremental build: only the changed formula is converted
+        del converted[:]
+        write(os.path.join(src, "other.rst"), other.replace("(a+b)/2", "(a+b)/3"))
+        app = sphinx_build(src, out)
+        assert converted == ["x = (a+b)/3"]
+        assert len(app.env.pytexit_conversions) == 5  # the old one is dropped
+
+        # parallel build
+        pytexit.sphinxext.py2tex = convert
+        parallel = os.path.join(tmp, "parallel")
+        app = sphinx_build(src, parallel, parallel=2)
+        # conversions of the parallel readers are merged
+        assert len(app.env.pytexit_conversions) == 5
+        assert sorted(app.env.pytexit_used) == ["index", "other"]
+        for page in ["index.html", "other.html"]:
+            assert read(os.path.join(parallel, "html", page)) == read(
+                os.path.join(out, "html", page)
+            )
+    finally:
+        pytexit.sphinxext.py2tex = convert
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+
+    test_sphinxext()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Test the precompiled formula templates
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from pytexit import compile_template, py2tex
+from pytexit.pytexit import uprint
+
+
+def test_template_render(verbose=True, **kwargs):
+    """Rendering a template gives the same as converting the formula with the
+    values written in it"""
+
+    t = compile_template("E = m*c**2", ["m"])
+    assert t.render({"m": 2}) == r"$$E=2c^2$$"
+    assert t.render(m=2) == py2tex("E = 2*c**2", print_latex=False, print_formula=False)
+    assert t.render(m=1.5e-7) == r"$$E=1.5\times{10}^{-7}c^2$$"
+
+    t = compile_template("Re_x=(rho*v*x)/mu", ["v", "x"])
+    assert t.render({"v": 2.5, "x": 0.1}) == py2tex(
+        "Re_x=(rho*2.5*0.1)/mu", print_latex=False, print_formula=False
+    )
+    if verbose:
+        uprint(t)
+        uprint(t.render({"v": 2.5, "x": 0.1}))
+
+    # precision
+    t = compile_template("y = a*x", ["a"], precision=3)
+    assert t.render(a=3.14159) == r"$$y=3.14x$$"
+
+
+def test_template_negative(verbose=True, **kwargs):
+    """Negative values are enclosed in parenthesis only where needed"""
+
+    t = compile_template("y = a*x**2 + b", ["x", "b"])
+    assert t.render(x=3, b=1) == r"$$y={3}^2a+1$$"
+    assert t.render(x=-3, b=-1) == r"$$y={\left(-3\right)}^2a+\left(-1\right)$$"
+    t = compile_template("y = a", ["a"])
+    assert t.render(a=-1) == r"$$y=-1$$"
+
+    for output in ["compact", "word", "mathml", "omml"]:
+        s = compile_template("y = x**2/b", ["x"], output=output).render(x=-1.25)
+        if verbose:
+            uprint(s)
+        assert "-1.25" in s
+
+
+def test_template_render_many(verbose=True, **kwargs):
+
+    t = compile_template("y = a*x + b", ["a", "b"])
+    expected = [t.render(a=1, b=0), t.render(a=2, b=1)]
+    assert t.render_many({"a": [1, 2], "b": [0, 1]}) == expected
+    assert t.render_many([{"a": 1, "b": 0}, {"a": 2, "b": 1}]) == expected
+
+    try:
+        import numpy as np
+    except ImportError:
+        return
+    assert t.render_many({"a": np.array([1.0, 2.0]), "b": np.array([0, 1])}) == expected
+
+
+if __name__ == "__main__":
+
+    test_template_render()
+    test_template_negative()
+    test_template_render_many()
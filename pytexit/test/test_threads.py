@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Test concurrent conversions in many threads
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pytexit import py2tex
+from pytexit.core.memo import SubexpressionMemo
+from pytexit.test.test_compact import corpus
+
+outputs = ["tex", "compact", "word", "mathml", "omml"]
+
+
+def rate(T):
+    k = A * T**n
+    return k * exp(-E_a / (R * T))
+
+
+def convert_all(memo=None):
+    return [
+        py2tex(expr, output=outputs, print_latex=False, memo=memo) for expr in corpus
+    ] + [py2tex(rate, print_latex=False)]
+
+
+def test_threads_stress(verbose=True, threads=16, runs=64, **kwargs):
+    """Many threads converting at once, sharing a memo (with evictions) and
+    the function cache, give the same output as serial runs"""
+
+    expected = convert_all()
+    memo = SubexpressionMemo(maxsize=50)
+
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(
+            pool.map(lambda i: convert_all(memo if i % 2 else None), range(runs))
+        )
+
+    if verbose:
+        print(memo.stats())
+    assert all(r == expected for r in results)
+
+
+def benchmark_thread_scaling(verbose=True, n=2000, max_threads=8):
+    """Throughput of conversions in thread pools of increasing size
+
+    Conversions are pure Python: with the GIL, threads don't run faster
+    than one thread. On free-threaded CPython builds (3.13t+), throughput
+    grows with the number of threads.
+    """
+    exprs = (corpus * (n // len(corpus) + 1))[:n]
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    results = {}
+    threads = 1
+    while threads <= max_threads:
+        t0 = time.time()
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(lambda e: py2tex(e, print_latex=False), exprs))
+        results[threads] = n / (time.time() - t0)
+        if verbose:
+            print(
+                "{0} threads: {1:.0f} formulas/s{2}".format(
+                    threads, results[threads], "" if gil else " (free-threaded)"
+                )
+            )
+        threads *= 2
+    return results
+
+
+if __name__ == "__main__":
+
+    test_threads_stress()
+    benchmark_thread_scaling()